@@ -0,0 +1,141 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from commerce.models import InventorySnapshot, Order, OrderItem, Product, ProductDailySales, RollupWatermark, \
+    SellerDailySales, SubCategoryDailySales
+
+WATERMARK = 'daily_sales'
+BATCH_SIZE = 5000
+DEFAULT_SETTLE_SECONDS = 60
+
+# name -> (rollup model, its key field, the OrderItem value it is keyed by).
+# Sellers come from the item itself, so sales of since-deleted products
+# still count for their seller.
+ROLLUPS = {
+    'product': (ProductDailySales, 'product', 'product_id'),
+    'subcategory': (SubCategoryDailySales, 'subcategory', 'product__category_id'),
+    'seller': (SellerDailySales, 'seller', 'seller_id'),
+}
+
+
+def settle_seconds():
+    return getattr(settings, 'ANALYTICS_SETTLE_SECONDS', DEFAULT_SETTLE_SECONDS)
+
+
+def _fold(order_days, items):
+    """``{name: {(day, key): [order ids, units, revenue]}}`` for a batch of order items."""
+    totals = {name: defaultdict(lambda: [set(), 0, 0]) for name in ROLLUPS}
+    for item in items:
+        day = order_days[item['order_id']]
+        for name, (_, _, source) in ROLLUPS.items():
+            if item[source] is None:
+                # The product (or seller) was deleted; the other rollups still count the item.
+                continue
+            entry = totals[name][(day, item[source])]
+            entry[0].add(item['order_id'])
+            entry[1] += item['quantity']
+            entry[2] += item['price']
+    return totals
+
+
+def _merge(model, key_field, totals):
+    # Rows are added to, not replaced, so read the ones this batch touches first.
+    key_attname = f'{key_field}_id'
+    existing = {
+        (row.day, getattr(row, key_attname)): row
+        for row in model.objects.filter(
+            day__in={day for day, _ in totals}, **{f'{key_attname}__in': {key for _, key in totals}},
+        )
+    }
+    rows = []
+    for (day, key), (order_ids, units, revenue) in totals.items():
+        row = existing.get((day, key)) or model(day=day, **{key_attname: key})
+        row.orders += len(order_ids)
+        row.units += units
+        row.revenue += revenue
+        rows.append(row)
+    model.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['day', key_field], update_fields=['orders', 'units', 'revenue'],
+        batch_size=1000,
+    )
+
+
+def rollup(batch_size=BATCH_SIZE, settle=None, log=None):
+    """
+    Fold orders placed since the watermark into the daily sales tables.
+
+    Orders are read in id order, ``batch_size`` per transaction together
+    with the watermark move, so a run can stop at any point without
+    counting an order twice. Orders younger than ``settle`` seconds are
+    left for the next run, so one still committing with a lower id isn't
+    skipped. Returns the number of orders folded in.
+    """
+    log = log or (lambda message: None)
+    settled_before = timezone.now() - timedelta(seconds=settle_seconds() if settle is None else settle)
+    total = 0
+    while True:
+        with transaction.atomic():
+            watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+            orders = list(
+                Order.objects.filter(id__gt=watermark.last_order_id).order_by('id')
+                .values_list('id', 'ordered_at')[:batch_size]
+            )
+            full = len(orders) == batch_size
+            for index, (_, ordered_at) in enumerate(orders):
+                if ordered_at >= settled_before:
+                    orders, full = orders[:index], False
+                    break
+            if not orders:
+                break
+            order_days = {order_id: timezone.localdate(ordered_at) for order_id, ordered_at in orders}
+            items = OrderItem.objects.filter(order_id__in=order_days).values(
+                'order_id', 'quantity', 'price', *(source for _, _, source in ROLLUPS.values()),
+            )
+            for name, rows in _fold(order_days, items.iterator(chunk_size=batch_size)).items():
+                if rows:
+                    model, key_field, _ = ROLLUPS[name]
+                    _merge(model, key_field, rows)
+            watermark.last_order_id = orders[-1][0]
+            watermark.save(update_fields=['last_order_id', 'updated_at'])
+        total += len(orders)
+        log(f"{total} orders rolled up (through order {orders[-1][0]})")
+        if not full:
+            break
+    return total
+
+
+def snapshot_inventory(day=None):
+    """Record today's products, in-stock products, units and reserved units per subcategory."""
+    day = day or timezone.localdate()
+    stock = Product.objects.order_by().values('category_id').annotate(
+        products=Count('id'),
+        products_in_stock=Count('id', filter=Q(count__gt=0)),
+        units=Coalesce(Sum('count'), Value(0)),
+        reserved=Coalesce(Sum('reserved'), Value(0)),
+    )
+    InventorySnapshot.objects.bulk_create(
+        [
+            InventorySnapshot(
+                day=day, subcategory_id=row['category_id'], products=row['products'],
+                products_in_stock=row['products_in_stock'], units=row['units'], reserved=row['reserved'],
+            )
+            for row in stock
+        ],
+        update_conflicts=True, unique_fields=['day', 'subcategory'],
+        update_fields=['products', 'products_in_stock', 'units', 'reserved'], batch_size=1000,
+    )
+
+
+def rebuild(batch_size=BATCH_SIZE, settle=None, log=None):
+    """Empty the sales rollups and fold the whole order history back in, ``batch_size`` orders at a time."""
+    with transaction.atomic():
+        for model, _, _ in ROLLUPS.values():
+            model.objects.all().delete()
+        RollupWatermark.objects.filter(name=WATERMARK).delete()
+    return rollup(batch_size=batch_size, settle=settle, log=log)
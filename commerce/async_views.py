@@ -0,0 +1,137 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from commerce import reservations
+from commerce.cache import get_product_payload
+from commerce.checkout import InsufficientStock
+from commerce.conditional import aconditional, product_validators
+from commerce.instrumentation import query_budget
+from commerce.listings import filter_listings
+from commerce.models import Cart, Comment, Product, ProductListing, parse_pk
+from commerce.pagination import ProductKeysetPagination, CommentKeysetPagination
+from commerce.serializers import ProductListingSerializer, GetCartSerializer, CommentSerializer, \
+    ProductFilterSerializer
+from users.authentication import aauthenticate
+
+# ASGI-native counterparts of the hot views in commerce/views.py. Responses
+# match the sync endpoints; rows are read with the async ORM so an in-flight
+# request holds a coroutine rather than a worker thread.
+
+
+def as_drf_request(request):
+    return Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES])
+
+
+def async_login_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await aauthenticate(request)
+        except InvalidToken as e:
+            return JsonResponse(e.detail, status=e.status_code)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@query_budget(2)
+@require_GET
+@async_login_required
+async def products(request):
+    filters = ProductFilterSerializer(data=request.GET)
+    if not filters.is_valid():
+        return JsonResponse(filters.errors, status=400)
+    queryset = filter_listings(ProductListing.objects.all(), filters.validated_data)
+    paginator = ProductKeysetPagination()
+    page = await paginator.apaginate_queryset(queryset, as_drf_request(request))
+    return JsonResponse({
+        'next': paginator.get_next_link(),
+        'results': ProductListingSerializer(page, many=True).data,
+    })
+
+
+@query_budget(3)
+@require_GET
+@async_login_required
+@aconditional(product_validators)
+async def product_detail(request, pk):
+    # The same cached payload and validators as RetrieveProductAPIView.
+    try:
+        payload = await sync_to_async(get_product_payload)(pk)
+    except Http404:
+        return JsonResponse({'detail': 'No Product matches the given query.'}, status=404)
+    return JsonResponse(payload)
+
+
+@query_budget(1)
+@require_GET
+@async_login_required
+async def cart(request):
+    items = [
+        item async for item in Cart.objects.filter(user_id=request.user.pk).select_related('product', 'user')
+    ]
+    if not items:
+        return JsonResponse({"detail": "No items in the cart."}, status=404)
+    return JsonResponse(GetCartSerializer(items, many=True).data, safe=False)
+
+
+@csrf_exempt
+@require_POST
+@async_login_required
+async def add_cart_item(request):
+    data = as_drf_request(request).data
+    errors = {}
+    try:
+        quantity = int(data.get('quantity'))
+        if quantity < 1:
+            errors['quantity'] = ["Quantity must be at least 1."]
+    except (TypeError, ValueError):
+        errors['quantity'] = ["A valid integer is required."]
+    try:
+        product = await Product.objects.aget(pk=int(data.get('product_id')))
+    except (TypeError, ValueError):
+        errors['product_id'] = ["Incorrect type. Expected pk value."]
+    except Product.DoesNotExist:
+        errors['product_id'] = [f"Invalid pk \"{data.get('product_id')}\" - object does not exist."]
+    if errors:
+        return JsonResponse(errors, status=400)
+
+    try:
+        item = await sync_to_async(reservations.hold)(request.user, product, quantity)
+    except InsufficientStock as e:
+        return JsonResponse({
+            'message': 'Not enough stock to hold this quantity',
+            'available': e.shortages,
+        }, status=409)
+    return JsonResponse({
+        "detail": "Added to cart successfully.",
+        "cart": {'product_name': product.name, 'quantity': item.quantity, 'price': item.price},
+    }, status=201)
+
+
+@query_budget(2)
+@require_GET
+@async_login_required
+async def comments(request):
+    product_id = request.GET.get('id')
+    if not product_id:
+        return JsonResponse({"error": "Product ID is required."}, status=400)
+    product_id = parse_pk(product_id)
+    if product_id is None or not await Product.objects.filter(id=product_id).aexists():
+        return JsonResponse({"error": "Product not found."}, status=404)
+    queryset = Comment.objects.filter(product_id=product_id).select_related('user', 'product')
+    paginator = CommentKeysetPagination()
+    page = await paginator.apaginate_queryset(queryset, as_drf_request(request))
+    return JsonResponse({
+        'next': paginator.get_next_link(),
+        'results': CommentSerializer(page, many=True).data,
+    })
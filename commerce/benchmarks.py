@@ -0,0 +1,81 @@
+import statistics
+import time
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def _request(client, method, path, **kwargs):
+    response = getattr(client, method)(path, **kwargs)
+    if response.streaming:
+        # Streamed bodies are produced while they are read.
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, path, requests=100, method='get', rollback=False, **kwargs):
+    """
+    Issue ``requests`` calls through a test client; return latency and query-count stats.
+
+    With ``rollback`` each call runs in a transaction that is rolled back, so
+    writes can be repeated against the same data.
+    """
+    from contextlib import nullcontext
+
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    durations, queries, status_codes = [], [], set()
+    for _ in range(requests):
+        with transaction.atomic() if rollback else nullcontext():
+            with CaptureQueriesContext(connection) as captured:
+                duration, response = timed(_request, client, method, path, **kwargs)
+            if rollback:
+                transaction.set_rollback(True)
+        durations.append(duration)
+        queries.append(len(captured.captured_queries))
+        status_codes.add(response.status_code)
+    stats = summarize(durations)
+    stats['queries'] = round(statistics.fmean(queries), 2) if queries else 0
+    stats['status'] = sorted(status_codes)
+    return stats
+
+
+def api_client(user=None):
+    """An APIClient that passes host validation outside the test runner, authenticated as ``user``."""
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+
+    from users.tokens import UserRefreshToken
+
+    try:
+        setup_test_environment()
+    except RuntimeError:
+        # Already set up, e.g. when called from a test.
+        pass
+    client = APIClient()
+    if user is not None:
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {UserRefreshToken.for_user(user).access_token}')
+    return client
@@ -0,0 +1,199 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from rest_framework.renderers import JSONRenderer
+
+# Bump when the cached payload shape changes so old entries are never read.
+SCHEMA_VERSION = 2
+LOCK_TIMEOUT = 10
+WAIT_TIMEOUT = 2
+WAIT_INTERVAL = 0.02
+
+_stats = {'hits': 0, 'misses': 0, 'waits': 0, 'recomputes': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def get_cache():
+    return caches[getattr(settings, 'PRODUCT_CACHE_ALIAS', 'default')]
+
+
+def _version_key(pk):
+    return f'product:{SCHEMA_VERSION}:{pk}:version'
+
+
+def _cart_version_key(user_id):
+    return f'cart:{SCHEMA_VERSION}:{user_id}:version'
+
+
+def _category_tree_version_key():
+    return f'categories:{SCHEMA_VERSION}:version'
+
+
+def _version(cache, key):
+    version = cache.get(key)
+    if version is None:
+        # A fresh token rather than a counter, so an evicted version key can
+        # never come back as a number that still points at a stale payload.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def product_version(pk):
+    """The product's current cache version; it moves whenever invalidate_products() runs for it."""
+    return _version(get_cache(), _version_key(pk))
+
+
+def _compute(pk):
+    from commerce.models import Product
+    from commerce.serializers import ProductSerializer
+
+    try:
+        product = Product.objects.prefetch_related('images').get(pk=pk)
+    except Product.DoesNotExist:
+        raise Http404
+    return dict(ProductSerializer(product).data)
+
+
+def get_product_payload(pk):
+    """
+    Return the serialized ProductSerializer payload for ``pk`` via the cache.
+
+    On a miss only the caller that wins ``cache.add`` on the lock key hits the
+    database; concurrent misses poll for its result for up to WAIT_TIMEOUT
+    seconds before falling back to computing it themselves.
+    """
+    cache = get_cache()
+    key = f'product:{SCHEMA_VERSION}:{pk}:{_version(cache, _version_key(pk))}'
+    payload = cache.get(key)
+    if payload is not None:
+        _count('hits')
+        return payload
+
+    _count('misses')
+    lock_key = f'{key}:lock'
+    owns_lock = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not owns_lock:
+        _count('waits')
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            payload = cache.get(key)
+            if payload is not None:
+                return payload
+
+    _count('recomputes')
+    try:
+        payload = _compute(pk)
+        cache.set(key, payload, getattr(settings, 'PRODUCT_CACHE_TIMEOUT', 300))
+    finally:
+        if owns_lock:
+            cache.delete(lock_key)
+    return payload
+
+
+def invalidate_products(pks):
+    """Move the given products to a new cache version once the current transaction commits."""
+    pks = list(pks)
+
+    def bump():
+        cache = get_cache()
+        now = time.time_ns()
+        cache.set_many({_version_key(pk): now for pk in pks}, None)
+        with _stats_lock:
+            _stats['invalidations'] += len(pks)
+
+    transaction.on_commit(bump)
+
+
+def get_cart_summary(user_id):
+    """
+    ``{'lines', 'items', 'subtotal'}`` for a user's cart.
+
+    Computed with one aggregate query and cached under the user's cart
+    version until invalidate_carts() moves it, so a summary read before a
+    write commits can never be served after it.
+    """
+    from commerce.models import Cart
+
+    cache = get_cache()
+    key = f'cart:{SCHEMA_VERSION}:{user_id}:{_version(cache, _cart_version_key(user_id))}:summary'
+    summary = cache.get(key)
+    if summary is None:
+        summary = Cart.objects.filter(user_id=user_id).aggregate(
+            lines=Count('id'),
+            items=Coalesce(Sum('quantity'), Value(0)),
+            subtotal=Coalesce(Sum('price'), Value(0)),
+        )
+        cache.set(key, summary, getattr(settings, 'PRODUCT_CACHE_TIMEOUT', 300))
+    return summary
+
+
+def invalidate_carts(user_ids):
+    """Move the given users' cart summaries to a new cache version once the current transaction commits."""
+    user_ids = list(user_ids)
+
+    def bump():
+        now = time.time_ns()
+        get_cache().set_many({_cart_version_key(user_id): now for user_id in user_ids}, None)
+
+    transaction.on_commit(bump)
+
+
+def category_tree_version():
+    return _version(get_cache(), _category_tree_version_key())
+
+
+def _compute_category_tree():
+    from commerce.models import Category, SubCategory
+    from commerce.serializers import CategoryTreeSerializer
+
+    # Counts come from the facet buckets, a handful of rows per subcategory,
+    # rather than from Product.
+    subcategories = SubCategory.objects.order_by('name', 'id').annotate(
+        product_count=Coalesce(Sum('facets__count'), Value(0)),
+        in_stock_count=Coalesce(Sum('facets__count', filter=Q(facets__in_stock=True)), Value(0)),
+    )
+    categories = Category.objects.order_by('name').prefetch_related(
+        Prefetch('subcategories', queryset=subcategories),
+    )
+    return JSONRenderer().render(CategoryTreeSerializer(categories, many=True).data)
+
+
+def get_category_tree():
+    """
+    ``(version, body)`` for the whole category tree, ``body`` being the rendered JSON.
+
+    Built with two queries and cached as one blob under the tree's version
+    until invalidate_category_tree() moves it; the version doubles as the
+    ETag, so conditional requests don't touch the database at all.
+    """
+    cache = get_cache()
+    version = category_tree_version()
+    key = f'categories:{SCHEMA_VERSION}:{version}:tree'
+    body = cache.get(key)
+    if body is None:
+        body = _compute_category_tree()
+        cache.set(key, body, getattr(settings, 'CATEGORY_TREE_CACHE_TIMEOUT', 60 * 60))
+    return version, body
+
+
+def invalidate_category_tree():
+    """Move the category tree to a new cache version once the current transaction commits."""
+    transaction.on_commit(lambda: get_cache().set(_category_tree_version_key(), time.time_ns(), None))
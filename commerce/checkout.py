@@ -0,0 +1,132 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.db.models.functions import Now
+
+from commerce import facets, listings, sellers
+from commerce.cache import invalidate_carts, invalidate_products
+from commerce.models import Cart, Order, OrderItem, Product
+
+
+class EmptyCart(Exception):
+    pass
+
+
+class InsufficientStock(Exception):
+    def __init__(self, shortages):
+        # shortages: {product_id: available count}
+        self.shortages = shortages
+        super().__init__(f"Insufficient stock for products {sorted(shortages)}")
+
+
+def checkout(user, payment_method, user_location):
+    """
+    Turn the user's cart into an order in a single transaction.
+
+    Runs a fixed number of queries regardless of cart size: read and lock the
+    cart, lock its products (ordered by id, so concurrent checkouts always
+    lock in the same order and cannot deadlock), decrement stock with one
+    conditional UPDATE, insert the order and its items, and delete the lines
+    that were read.
+
+    Units the cart still holds count as available to it; the same UPDATE
+    converts them from reserved to sold.
+    """
+    with transaction.atomic():
+        quantities, held = defaultdict(int), defaultdict(int)
+        # Locked, and only these lines are deleted below, so a line a
+        # concurrent hold() adds is left in the cart with its hold intact.
+        line_ids = []
+        lines = Cart.objects.select_for_update().filter(user=user).values_list(
+            'id', 'product_id', 'quantity', 'reserved',
+        )
+        for line_id, product_id, quantity, reserved in lines:
+            line_ids.append(line_id)
+            quantities[product_id] += quantity
+            held[product_id] += reserved
+        if not quantities:
+            raise EmptyCart()
+
+        products = list(
+            Product.objects.select_for_update()
+            .filter(id__in=quantities)
+            .order_by('id')
+            .only('id', 'name', 'price', 'count', 'reserved', 'category_id', 'user_id')
+        )
+        shortages = {product_id: 0 for product_id in quantities.keys() - {product.id for product in products}}
+        shortages.update({
+            product.id: product.count - product.reserved + held[product.id] for product in products
+            if product.count - product.reserved + held[product.id] < quantities[product.id]
+        })
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        # The WHERE clause re-checks stock, so even on backends without row
+        # locks (SQLite) a concurrent checkout can never push count below zero.
+        in_stock = Q()
+        for product in products:
+            in_stock |= Q(id=product.id, count__gte=F('reserved') - held[product.id] + quantities[product.id])
+        updated = Product.objects.filter(in_stock).update(
+            count=Case(
+                *[When(id=product.id, then=F('count') - quantities[product.id]) for product in products],
+                default=F('count'),
+            ),
+            reserved=Case(
+                *[When(id=product.id, then=F('reserved') - held[product.id]) for product in products],
+                default=F('reserved'),
+            ),
+            # The product's ETag and the export's ?since= are built on updated_at.
+            updated_at=Now(),
+        )
+        if updated != len(products):
+            raise InsufficientStock({
+                product_id: count - reserved + held[product_id] for product_id, count, reserved in
+                Product.objects.filter(id__in=quantities).values_list('id', 'count', 'reserved')
+                if count - reserved + held[product_id] < quantities[product_id]
+            })
+
+        sold_out = Counter()
+        for product in products:
+            if product.count - quantities[product.id] <= 0:
+                sold_out[facets.facet_key(product.category_id, product.price, product.count)] -= 1
+                sold_out[facets.facet_key(product.category_id, product.price, 0)] += 1
+        facets.apply_deltas(sold_out)
+
+        sold = defaultdict(Counter)
+        for product in products:
+            counters = sold[product.user_id]
+            counters.subtract(sellers.stock_counters(product.count))
+            counters.update(sellers.stock_counters(product.count - quantities[product.id]))
+            counters['units_sold'] += quantities[product.id]
+            counters['revenue'] += product.price * quantities[product.id]
+        for counters in sold.values():
+            counters['orders'] += 1
+        sellers.apply_deltas(sold)
+
+        order = Order.objects.create(
+            user=user,
+            total_price=sum(product.price * quantities[product.id] for product in products),
+            payment_method=payment_method,
+            user_location=user_location,
+            status='pending',
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=product,
+                seller_id=product.user_id,
+                product_name=product.name,
+                unit_price=product.price,
+                quantity=quantities[product.id],
+                price=product.price * quantities[product.id],
+            )
+            for product in products
+        ])
+        Cart.objects.filter(pk__in=line_ids).delete()
+        invalidate_carts([user.pk])
+        # QuerySet.update() bypasses post_save, so drop cached detail payloads
+        # and refresh the listing rows here.
+        invalidate_products(quantities)
+        listings.refresh(quantities)
+    return order
@@ -0,0 +1,106 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When, Window
+from django.db.models.functions import Coalesce, Now, RowNumber
+from django.db.models.query import QuerySet
+
+
+def adjust_counts(deltas):
+    """Add ``{product_id: delta}`` to Product.comment_count, its listing row and its seller's counters."""
+    from commerce import listings, sellers
+    from commerce.models import Product
+
+    changed = [product_id for product_id, delta in deltas.items() if delta]
+    if not changed:
+        return
+    # One UPDATE for the whole batch. Bumping updated_at keeps the catalog's
+    # ETag in step with the count it shows.
+    Product.objects.filter(pk__in=changed).update(updated_at=Now(), comment_count=Case(
+        *[When(pk=product_id, then=F('comment_count') + deltas[product_id]) for product_id in changed],
+        default=F('comment_count'),
+        output_field=Product._meta.get_field('comment_count'),
+    ))
+    listings.refresh(changed)
+    sellers.count_comments(deltas)
+
+
+def deleted_with(origin, *models):
+    """Whether a delete signal's ``origin`` (an instance or queryset) is of one of ``models``."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, models)
+
+
+def deleted_with_parent(origin):
+    """
+    Whether a Comment delete is part of deleting its product or its author.
+
+    Those cascades settle the counters once per parent in pre_delete (see
+    uncount_deleted_product and uncount_deleted_user), so the per-comment
+    post_delete work is skipped.
+    """
+    from commerce.models import Product
+    from users.models import User
+
+    return deleted_with(origin, Product, User)
+
+
+def uncount_deleted_product(product):
+    """Take the comments of ``product``, about to be deleted, off its seller's counter."""
+    from commerce import sellers
+    from commerce.models import Comment
+
+    total = Comment.objects.filter(product_id=product.pk).count()
+    sellers.apply_deltas({product.user_id: {'comments': -total}})
+
+
+def uncount_deleted_user(user):
+    """Take the comments of ``user``, about to be deleted, off the products they were left on."""
+    from commerce.models import Comment
+
+    # The user's own products go in the same cascade, counters and all.
+    deltas = {
+        row['product_id']: -row['total']
+        for row in Comment.objects.filter(user_id=user.pk).exclude(product__user_id=user.pk)
+        .order_by().values('product_id').annotate(total=Count('id'))
+    }
+    adjust_counts(deltas)
+
+
+def rebuild_counts(product_model=None, comment_model=None):
+    """Recompute every product's comment_count in one UPDATE, e.g. after bulk-created comments."""
+    if product_model is None:
+        from commerce.models import Product as product_model
+    if comment_model is None:
+        from commerce.models import Comment as comment_model
+
+    counts = (
+        comment_model.objects.filter(product_id=OuterRef('pk'))
+        .order_by().values('product_id').annotate(total=Count('id')).values('total')
+    )
+    with transaction.atomic():
+        product_model.objects.update(comment_count=Coalesce(Subquery(counts), Value(0)))
+
+
+def latest_comments(product_ids, limit):
+    """
+    The newest ``limit`` comments of each product, as ``{product_id: [Comment, ...]}``.
+
+    One query: ROW_NUMBER() ranks each product's comment ids newest first off
+    the (product, created_at, id) index, and only the rows ranked within
+    ``limit`` are joined to their user and product.
+    """
+    from commerce.models import Comment
+
+    ranked = (
+        Comment.objects.filter(product_id__in=product_ids)
+        .annotate(rank=Window(
+            RowNumber(), partition_by=F('product_id'), order_by=(F('created_at').desc(), F('id').desc()),
+        ))
+        .filter(rank__lte=limit)
+        .values('pk')
+    )
+    grouped = {product_id: [] for product_id in product_ids}
+    for comment in Comment.objects.filter(pk__in=ranked).select_related('user', 'product'):
+        grouped[comment.product_id].append(comment)
+    for rows in grouped.values():
+        rows.sort(key=lambda comment: (comment.created_at, comment.id), reverse=True)
+    return grouped
@@ -0,0 +1,131 @@
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from commerce.cache import category_tree_version, product_version
+from commerce.models import Cart, Comment, Product, ProductListing, parse_pk
+
+
+def aggregate_validators(queryset, field='updated_at', extra=''):
+    """
+    Build (etag, last_modified) from MAX(field) and COUNT(*) of ``queryset``.
+
+    Returns (None, None) for an empty queryset so 404s are never turned into 304s.
+    """
+    result = queryset.aggregate(last_modified=Max(field), total=Count('pk'))
+    if not result['total']:
+        return None, None
+    last_modified = result['last_modified']
+    raw = f"{last_modified.isoformat()}:{result['total']}:{extra}"
+    return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest(), last_modified
+
+
+def _prepare(validators_result):
+    etag, last_modified = validators_result
+    etag = quote_etag(etag) if etag else None
+    last_modified = timegm(last_modified.utctimetuple()) if last_modified else None
+    return etag, last_modified
+
+
+def _not_modified(request, etag, last_modified):
+    if etag or last_modified:
+        return get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return None
+
+
+def _finish(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization', ))
+    return response
+
+
+def conditional(validators):
+    """
+    Answer If-None-Match / If-Modified-Since with a 304 before the view runs.
+
+    ``validators(request, *args, **kwargs)`` returns (etag, last_modified); the
+    view method is only called, and its body only serialized, when they don't match.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, last_modified = _prepare(validators(request, *args, **kwargs))
+            response = _not_modified(request, etag, last_modified)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            return _finish(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def aconditional(validators):
+    """conditional() for async function views; the validators run in a thread."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag, last_modified = _prepare(await sync_to_async(validators)(request, *args, **kwargs))
+            response = _not_modified(request, etag, last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return _finish(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def catalog_validators(request, *args, **kwargs):
+    return aggregate_validators(
+        ProductListing.objects.all(), field='refreshed_at', extra=request.META.get('QUERY_STRING', ''),
+    )
+
+
+def category_listing_validators(request, pk, *args, **kwargs):
+    return aggregate_validators(
+        ProductListing.objects.filter(category_id=pk), field='refreshed_at',
+        extra=request.META.get('QUERY_STRING', ''),
+    )
+
+
+def product_validators(request, pk, *args, **kwargs):
+    # The payload also nests images whose variants are filled in later;
+    # anything that changes it moves the product's cache version.
+    return aggregate_validators(Product.objects.filter(pk=pk), extra=product_version(pk))
+
+
+def cart_validators(request, *args, **kwargs):
+    return aggregate_validators(Cart.objects.filter(user_id=request.user.pk))
+
+
+def comments_validators(request, *args, **kwargs):
+    # Left to the view, which answers an unusable id with a 400 or 404.
+    product_id = parse_pk(request.query_params.get('id', ''))
+    if product_id is None:
+        return None, None
+    return aggregate_validators(Comment.objects.filter(product_id=product_id))
+
+
+def comments_batch_validators(request, *args, **kwargs):
+    ids = [parse_pk(part) for part in request.query_params.get('ids', '').split(',') if part.strip()]
+    if not ids or None in ids:
+        return None, None
+    return aggregate_validators(
+        Comment.objects.filter(product_id__in=ids), extra=request.META.get('QUERY_STRING', ''),
+    )
+
+
+def category_tree_etag(version):
+    return f'categories-{version}'
+
+
+def category_tree_validators(request, *args, **kwargs):
+    # The cached tree's version, so a 304 costs one cache read and no query.
+    return category_tree_etag(category_tree_version()), None
@@ -0,0 +1,67 @@
+import csv
+import json
+import zlib
+from itertools import chain
+
+from commerce.models import Product
+
+EXPORT_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'price': 'price',
+    'count': 'count',
+    'category_id': 'category_id',
+    'category_name': 'category__name',
+    'user_username': 'user__username',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+CHUNK_SIZE = 2000
+
+
+def export_rows(since=None, chunk_size=CHUNK_SIZE):
+    """Yield catalog rows as dicts, ordered by (updated_at, id), without caching the queryset."""
+    products = Product.objects.order_by('updated_at', 'id')
+    if since is not None:
+        products = products.filter(updated_at__gt=since)
+    for row in products.values_list(*EXPORT_FIELDS.values()).iterator(chunk_size=chunk_size):
+        row = dict(zip(EXPORT_FIELDS, row))
+        # Full microsecond precision so the last updated_at can be fed back as ?since=.
+        row['created_at'] = row['created_at'].isoformat()
+        row['updated_at'] = row['updated_at'].isoformat()
+        yield row
+
+
+def _batched(lines, chunk_size):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_ndjson(rows, chunk_size=CHUNK_SIZE):
+    lines = (json.dumps(row) + '\n' for row in rows)
+    for block in _batched(lines, chunk_size):
+        yield block.encode()
+
+
+class _LineBuffer:
+    def write(self, value):
+        return value
+
+
+def stream_gzip_csv(rows, chunk_size=CHUNK_SIZE):
+    writer = csv.DictWriter(_LineBuffer(), fieldnames=list(EXPORT_FIELDS))
+    # wbits=31 makes zlib emit a gzip container instead of a raw deflate stream.
+    compressor = zlib.compressobj(wbits=31)
+    lines = chain([writer.writeheader()], (writer.writerow(row) for row in rows))
+    for block in _batched(lines, chunk_size):
+        data = compressor.compress(block.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,165 @@
+from bisect import bisect_right
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, F, IntegerField, Value, When
+
+from commerce.cache import invalidate_category_tree
+
+# Lower bounds of each price band; band i covers [bounds[i], bounds[i + 1]).
+DEFAULT_PRICE_BANDS = (0, 50, 100, 500, 1000, 5000)
+
+
+def price_bands():
+    return tuple(getattr(settings, 'PRODUCT_PRICE_BANDS', DEFAULT_PRICE_BANDS))
+
+
+def price_band(price):
+    return max(bisect_right(price_bands(), price) - 1, 0)
+
+
+def band_range(band):
+    bounds = price_bands()
+    return bounds[band], bounds[band + 1] if band + 1 < len(bounds) else None
+
+
+def facet_key(subcategory_id, price, count):
+    return subcategory_id, price_band(price), count > 0
+
+
+def apply_deltas(deltas):
+    """Add ``{(subcategory_id, price_band, in_stock): delta}`` to the facet counts and the category tree."""
+    from commerce.models import ProductFacet
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # Only increments create buckets; a decrement always follows an earlier
+    # increment, and during a cascade delete the subcategory may be gone.
+    ProductFacet.objects.bulk_create([
+        ProductFacet(subcategory_id=subcategory_id, price_band=band, in_stock=in_stock, count=0)
+        for (subcategory_id, band, in_stock), delta in deltas.items() if delta > 0
+    ], ignore_conflicts=True)
+    for (subcategory_id, band, in_stock), delta in deltas.items():
+        ProductFacet.objects.filter(
+            subcategory_id=subcategory_id, price_band=band, in_stock=in_stock,
+        ).update(count=F('count') + delta)
+    invalidate_category_tree()
+
+
+def move(old_key, new_key):
+    """Move one product between buckets; either key may be None for a create or delete."""
+    deltas = Counter()
+    if old_key:
+        deltas[old_key] -= 1
+    if new_key:
+        deltas[new_key] += 1
+    apply_deltas(deltas)
+
+
+def price_band_expression():
+    bounds = price_bands()
+    return Case(
+        *[When(price__lt=bound, then=Value(band - 1)) for band, bound in enumerate(bounds) if band > 0],
+        default=Value(len(bounds) - 1),
+        output_field=IntegerField(),
+    )
+
+
+def rebuild(product_model=None, facet_model=None):
+    """Recompute every bucket with one GROUP BY over Product."""
+    if product_model is None:
+        from commerce.models import Product as product_model
+    if facet_model is None:
+        from commerce.models import ProductFacet as facet_model
+
+    rows = (
+        product_model.objects
+        .annotate(band=price_band_expression(), stocked=Case(
+            When(count__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField(),
+        ))
+        .values('category_id', 'band', 'stocked')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        facet_model.objects.all().delete()
+        facet_model.objects.bulk_create([
+            facet_model(
+                subcategory_id=row['category_id'], price_band=row['band'],
+                in_stock=row['stocked'], count=row['total'],
+            )
+            for row in rows
+        ], batch_size=1000)
+        invalidate_category_tree()
+
+
+def filter_products(queryset, params):
+    """Apply the listing's ``category``, ``subcategory``, ``price_band`` and ``in_stock`` filters."""
+    if params.get('category'):
+        queryset = queryset.filter(category__category_id=params['category'])
+    if params.get('subcategory'):
+        queryset = queryset.filter(category_id=params['subcategory'])
+    if params.get('price_band') is not None:
+        low, high = band_range(params['price_band'])
+        queryset = queryset.filter(price__gte=low)
+        if high is not None:
+            queryset = queryset.filter(price__lt=high)
+    if params.get('in_stock') is not None:
+        queryset = queryset.filter(count__gt=0) if params['in_stock'] else queryset.filter(count__lte=0)
+    return queryset
+
+
+def facet_counts(params):
+    """
+    Facet counts for the current filters, read from ProductFacet only.
+
+    Each dimension is counted with every other active filter applied but not
+    its own, so shoppers see how many results picking another value would give.
+    """
+    from commerce.models import ProductFacet
+
+    rows = list(ProductFacet.objects.filter(count__gt=0).values(
+        'subcategory_id', 'subcategory__name', 'subcategory__category_id', 'subcategory__category__name',
+        'price_band', 'in_stock', 'count',
+    ))
+
+    def matches(row, skip):
+        if skip != 'category' and params.get('category') and row['subcategory__category_id'] != params['category']:
+            return False
+        if skip != 'subcategory' and params.get('subcategory') and row['subcategory_id'] != params['subcategory']:
+            return False
+        if skip != 'price_band' and params.get('price_band') is not None and row['price_band'] != params['price_band']:
+            return False
+        if skip != 'in_stock' and params.get('in_stock') is not None and row['in_stock'] != params['in_stock']:
+            return False
+        return True
+
+    categories, subcategories, bands, stock = {}, {}, Counter(), Counter()
+    for row in rows:
+        if matches(row, 'category'):
+            entry = categories.setdefault(row['subcategory__category_id'], {
+                'id': row['subcategory__category_id'], 'name': row['subcategory__category__name'], 'count': 0,
+            })
+            entry['count'] += row['count']
+        if matches(row, 'subcategory'):
+            entry = subcategories.setdefault(row['subcategory_id'], {
+                'id': row['subcategory_id'], 'name': row['subcategory__name'],
+                'category_id': row['subcategory__category_id'], 'count': 0,
+            })
+            entry['count'] += row['count']
+        if matches(row, 'price_band'):
+            bands[row['price_band']] += row['count']
+        if matches(row, 'in_stock'):
+            stock[row['in_stock']] += row['count']
+
+    return {
+        'categories': sorted(categories.values(), key=lambda entry: entry['name']),
+        'subcategories': sorted(subcategories.values(), key=lambda entry: entry['name']),
+        'price_bands': [
+            {'band': band, 'min': band_range(band)[0], 'max': band_range(band)[1], 'count': bands[band]}
+            for band in sorted(bands)
+        ],
+        'in_stock': {'true': stock[True], 'false': stock[False]},
+    }
@@ -0,0 +1,79 @@
+from django.db import transaction
+
+from commerce.models import Order, OrderStatusChange
+
+# status -> the statuses an order may move to from it.
+TRANSITIONS = {
+    'pending': ('delivering', ),
+    'delivering': ('delivered', ),
+}
+CHUNK_SIZE = 1000
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+class _Raced(Exception):
+    """An order in the chunk changed status between the read and the update."""
+
+
+def previous_statuses(status):
+    return [current for current, targets in TRANSITIONS.items() if status in targets]
+
+
+def _transition_chunk(order_ids, status, expected, changed_by):
+    with transaction.atomic():
+        movable = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=order_ids, status__in=expected)
+            .order_by('id')
+            .values_list('id', 'status')
+        )
+        if not movable:
+            return []
+        # The WHERE re-checks the status, so an order moved concurrently on a
+        # backend without row locks is never moved twice.
+        updated = Order.objects.filter(
+            pk__in=[order_id for order_id, _ in movable], status__in=expected,
+        ).update(status=status)
+        if updated != len(movable):
+            raise _Raced()
+        OrderStatusChange.objects.bulk_create([
+            OrderStatusChange(order_id=order_id, from_status=current, to_status=status, changed_by_id=changed_by)
+            for order_id, current in movable
+        ])
+    return [order_id for order_id, _ in movable]
+
+
+def transition(order_ids, status, changed_by=None, chunk_size=CHUNK_SIZE):
+    """
+    Move ``order_ids`` to ``status`` wherever TRANSITIONS allows it, recording ``changed_by`` (a user id).
+
+    Works through ``chunk_size`` orders per transaction with one locking read,
+    one ``UPDATE ... WHERE status IN (<allowed>)`` and one bulk_create into
+    the status history, however many orders are passed. Returns
+    ``(moved_ids, skipped)`` where ``skipped`` maps every other id to its
+    current status, or None if there is no such order. Raises
+    InvalidTransition for a status nothing can move to.
+    """
+    expected = previous_statuses(status)
+    if not expected:
+        raise InvalidTransition(f"No order can move to {status!r}.")
+    order_ids = list(dict.fromkeys(order_ids))
+    moved = []
+    for start in range(0, len(order_ids), chunk_size):
+        chunk = order_ids[start:start + chunk_size]
+        while True:
+            try:
+                moved.extend(_transition_chunk(chunk, status, expected, changed_by))
+                break
+            except _Raced:
+                continue
+
+    moved_set = set(moved)
+    rest = [order_id for order_id in order_ids if order_id not in moved_set]
+    skipped = dict.fromkeys(rest)
+    for start in range(0, len(rest), chunk_size):
+        skipped.update(Order.objects.filter(pk__in=rest[start:start + chunk_size]).values_list('id', 'status'))
+    return moved, skipped
@@ -0,0 +1,216 @@
+import csv
+import json
+import time
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from commerce import facets, listings, search, sellers
+from commerce.cache import invalidate_products
+from commerce.models import Product, SubCategory
+
+PRODUCT_FIELDS = ('name', 'description', 'price', 'count')
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(filename, default='csv'):
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def iter_records(stream, fmt):
+    """Yield (line number, dict) from a text stream without reading it all into memory."""
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=2):
+            yield number, row
+        return
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield number, record if isinstance(record, dict) else {'__invalid__': 'Line is not a JSON object.'}
+
+
+class ProductImporter:
+    """
+    Create or update a seller's products from parsed records in batches.
+
+    Subcategories are resolved from an in-memory map loaded once, each batch
+    costs one lookup query for rows that carry an ``id``, one bulk_create and
+    one bulk_update, and the search index, facet counts, listing rows and
+    detail cache are refreshed per batch because bulk writes skip model signals.
+    """
+
+    def __init__(self, user, batch_size=DEFAULT_BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.ids = set()
+        self.by_name = {}
+        for pk, name in SubCategory.objects.values_list('id', 'name'):
+            key = name.strip().lower()
+            self.ids.add(pk)
+            # Subcategory names are only unique within a category; mark clashes
+            # so those rows have to give category_id instead.
+            self.by_name[key] = None if key in self.by_name else pk
+
+    def run(self, records):
+        """
+        Import ``records`` and return a report.
+
+        A file that can't be decoded or parsed stops the import; batches
+        already written stay, and the report's ``error`` says why it stopped.
+        """
+        started = time.perf_counter()
+        error = None
+        batch = []
+        try:
+            for number, record in records:
+                batch.append((number, record))
+                if len(batch) >= self.batch_size:
+                    self.write_batch(batch)
+                    batch = []
+        except UnicodeDecodeError:
+            error = "The file is not UTF-8 encoded text."
+        except csv.Error as e:
+            error = f"The file is not valid CSV: {e}."
+        else:
+            if batch:
+                self.write_batch(batch)
+        elapsed = time.perf_counter() - started
+        processed = self.created + self.updated + self.error_count
+        if error is None and not processed:
+            error = "The file has no product rows."
+        report = {
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'seconds': round(elapsed, 3),
+            'rows_per_sec': round(processed / elapsed, 1) if elapsed else None,
+        }
+        if error is not None:
+            report['error'] = error
+        return report
+
+    def add_error(self, number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': number, 'errors': errors})
+
+    def resolve_subcategory(self, record):
+        # Accept the same columns the catalog export writes: category_id, or
+        # the subcategory name as subcategory / category_name.
+        raw_id = record.get('category_id')
+        if raw_id not in (None, ''):
+            try:
+                pk = int(raw_id)
+            except (TypeError, ValueError):
+                return None
+            return pk if pk in self.ids else None
+        name = str(record.get('subcategory') or record.get('category_name') or '').strip().lower()
+        return self.by_name.get(name)
+
+    def clean(self, record):
+        if '__invalid__' in record:
+            return None, {'non_field_errors': [record['__invalid__']]}
+        errors = {}
+        values = {}
+        name = str(record.get('name') or '').strip()
+        if not name:
+            errors['name'] = ['This field is required.']
+        elif len(name) > Product._meta.get_field('name').max_length:
+            errors['name'] = ['Ensure this field has no more than 50 characters.']
+        values['name'] = name
+        values['description'] = str(record.get('description') or '')
+        for field, default in (('price', None), ('count', 0)):
+            raw = record.get(field)
+            if raw in (None, ''):
+                if default is None:
+                    errors[field] = ['This field is required.']
+                values[field] = default
+                continue
+            try:
+                values[field] = int(raw)
+            except (TypeError, ValueError):
+                errors[field] = ['A valid integer is required.']
+                continue
+            if values[field] < 0:
+                errors[field] = ['Ensure this value is greater than or equal to 0.']
+        values['category_id'] = self.resolve_subcategory(record)
+        if values['category_id'] is None:
+            errors['subcategory'] = ['Unknown or ambiguous subcategory.']
+        raw_id = record.get('id')
+        if raw_id not in (None, ''):
+            try:
+                values['id'] = int(raw_id)
+            except (TypeError, ValueError):
+                errors['id'] = ['A valid integer is required.']
+        return values, errors
+
+    def write_batch(self, batch):
+        cleaned = []
+        for number, record in batch:
+            values, errors = self.clean(record)
+            if errors:
+                self.add_error(number, errors)
+            else:
+                cleaned.append((number, values))
+
+        update_ids = [values['id'] for _, values in cleaned if 'id' in values]
+        existing = Product.objects.filter(user=self.user).in_bulk(update_ids) if update_ids else {}
+
+        to_create, to_update = [], []
+        deltas, stock = Counter(), defaultdict(Counter)
+        seen = set()
+        now = timezone.now()
+        for number, values in cleaned:
+            if 'id' not in values:
+                to_create.append(Product(user=self.user, **values))
+                continue
+            product = existing.get(values['id'])
+            if product is None:
+                self.add_error(number, {'id': ['Product not found.']})
+                continue
+            # A product listed twice in one batch is written once, with its
+            # last row's values, so its old counters come off only once.
+            if product.pk not in seen:
+                seen.add(product.pk)
+                deltas[facets.facet_key(product.category_id, product.price, product.count)] -= 1
+                stock[product.user_id].subtract(sellers.stock_counters(product.count))
+                product.updated_at = now
+                to_update.append(product)
+            for field, value in values.items():
+                setattr(product, field, value)
+
+        with transaction.atomic():
+            created = Product.objects.bulk_create(to_create)
+            if to_update:
+                Product.objects.bulk_update(to_update, PRODUCT_FIELDS + ('category_id', 'updated_at'))
+            for product in created + to_update:
+                deltas[facets.facet_key(product.category_id, product.price, product.count)] += 1
+                stock[product.user_id].update(sellers.stock_counters(product.count))
+            facets.apply_deltas(deltas)
+            sellers.apply_deltas(stock)
+            search.index_products([product.pk for product in created + to_update])
+            listings.refresh([product.pk for product in created + to_update])
+            invalidate_products([product.pk for product in to_update])
+
+        self.created += len(created)
+        self.updated += len(to_update)
+
+
+def import_products(stream, fmt, user, batch_size=DEFAULT_BATCH_SIZE):
+    return ProductImporter(user, batch_size=batch_size).run(iter_records(stream, fmt))
@@ -0,0 +1,298 @@
+import contextvars
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = (
+    ('http_request_duration_seconds', 'Wall time of the request inside Django.', DURATION_BUCKETS),
+    ('http_request_db_queries', 'Database queries issued per request.', QUERY_BUCKETS),
+    ('http_request_db_seconds', 'Time spent executing SQL per request.', DURATION_BUCKETS),
+    ('http_response_render_seconds', 'Time spent rendering the response body.', DURATION_BUCKETS),
+    ('http_response_size_bytes', 'Size of the response body.', SIZE_BUCKETS),
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """In-process metrics; each worker process exposes its own, summed by Prometheus."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.histograms = {name: {} for name, _, _ in HISTOGRAMS}
+        self.budget_exceeded = {}
+
+    def observe(self, labels, values):
+        with self.lock:
+            for name, _, buckets in HISTOGRAMS:
+                series = self.histograms[name].get(labels)
+                if series is None:
+                    series = self.histograms[name][labels] = Histogram(buckets)
+                series.observe(values[name])
+
+    def count_budget_exceeded(self, labels):
+        with self.lock:
+            self.budget_exceeded[labels] = self.budget_exceeded.get(labels, 0) + 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, help_text, buckets in HISTOGRAMS:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for labels, series in sorted(self.histograms[name].items()):
+                    label_text = _labels(labels)
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), series.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label_text}}} {series.sum}')
+                    lines.append(f'{name}_count{{{label_text}}} {series.count}')
+            name = 'http_query_budget_exceeded_total'
+            lines += [f'# HELP {name} Requests that issued more queries than their endpoint budget.',
+                      f'# TYPE {name} counter']
+            lines += [f'{name}{{{_labels(labels)}}} {count}' for labels, count in sorted(self.budget_exceeded.items())]
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    endpoint, method = labels
+    return f'endpoint="{_escape(endpoint)}",method="{_escape(method)}"'
+
+
+registry = Registry()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_started = None
+        self.render_seconds = 0.0
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def install(connection):
+    """Count this connection's queries toward whichever request is current in the calling context."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def start():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def query_budget(limit):
+    """Declare the most queries a function view may issue; class views set a ``query_budget`` attribute."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def budget_for(view):
+    budget = getattr(view, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view, 'view_class', None), 'query_budget', None)
+    return budget
+
+
+def endpoint_for(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.route
+
+
+def record(request, labels, stats, duration, size, raise_over_budget=True):
+    registry.observe(labels, {
+        'http_request_duration_seconds': duration,
+        'http_request_db_queries': stats.queries,
+        'http_request_db_seconds': stats.db_seconds,
+        'http_response_render_seconds': stats.render_seconds,
+        'http_response_size_bytes': size,
+    })
+    match = getattr(request, 'resolver_match', None)
+    budget = budget_for(match.func) if match else None
+    if budget is not None and stats.queries > budget:
+        registry.count_budget_exceeded(labels)
+        message = f'{request.method} {request.path} issued {stats.queries} queries; its budget is {budget}.'
+        if raise_over_budget and getattr(settings, 'QUERY_BUDGET_RAISE', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def _streamed(request, labels, stats, started, content):
+    # The body is produced after the view returns, so its queries and bytes
+    # are counted while the server pulls each chunk, and the request is
+    # recorded once the stream ends.
+    size, completed = 0, False
+    try:
+        while True:
+            token = _current.set(stats)
+            try:
+                chunk = next(content)
+            except StopIteration:
+                break
+            finally:
+                _current.reset(token)
+            size += len(chunk)
+            yield chunk
+        completed = True
+    finally:
+        # Don't raise into a stream the client already dropped.
+        record(request, labels, stats, time.perf_counter() - started, size, raise_over_budget=completed)
+
+
+async def _astreamed(request, labels, stats, started, content):
+    size, completed = 0, False
+    try:
+        while True:
+            token = _current.set(stats)
+            try:
+                chunk = await anext(content)
+            except StopAsyncIteration:
+                break
+            finally:
+                _current.reset(token)
+            size += len(chunk)
+            yield chunk
+        completed = True
+    finally:
+        record(request, labels, stats, time.perf_counter() - started, size, raise_over_budget=completed)
+
+
+def finish(request, response, stats, started):
+    labels = (endpoint_for(request), request.method)
+    if not response.streaming:
+        record(request, labels, stats, time.perf_counter() - started, len(response.content))
+    elif response.is_async:
+        response.streaming_content = _astreamed(request, labels, stats, started, aiter(response.streaming_content))
+    else:
+        response.streaming_content = _streamed(request, labels, stats, started, iter(response.streaming_content))
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record query count, SQL time, render time and response size per endpoint.
+
+    Runs natively under both WSGI and ASGI. Queries reach the current request
+    through a context variable, so ORM calls made via sync_to_async in the
+    async views are counted too. Streaming responses are recorded when their
+    body has been sent, including the queries run while producing it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop(token)
+        finish(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop(token)
+        finish(request, response, stats, started)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered by the handler right after this hook.
+        stats = _current.get()
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: _rendered(stats))
+        return response
+
+
+def _rendered(stats):
+    stats.render_seconds += time.perf_counter() - stats.render_started
+
+
+def metrics(request):
+    """
+    Prometheus exposition of this process's metrics.
+
+    Off unless METRICS_TOKEN is set; scrapers then send it as a bearer token.
+    """
+    from commerce.cache import cache_stats
+
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        raise Http404
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        response = HttpResponse('Invalid or missing metrics token.\n', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    lines = registry.render()
+    for key, value in sorted(cache_stats().items()):
+        name = f'product_cache_{key}_total'
+        lines += [f'# TYPE {name} counter', f'{name} {value}']
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,160 @@
+from django.db import transaction
+from django.db.models import F, JSONField, OuterRef, Subquery
+from django.db.models.functions import Now
+
+from commerce.facets import band_range
+
+# ProductListing field -> expression over Product.
+SOURCE_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'price': 'price',
+    'count': 'count',
+    'comment_count': 'comment_count',
+    'subcategory_id': 'category_id',
+    'subcategory_name': 'listing_subcategory_name',
+    'category_id': 'listing_category_id',
+    'category_name': 'listing_category_name',
+    'user_id': 'user_id',
+    'user_username': 'listing_user_username',
+    'image': 'listing_image',
+    'image_variants': 'listing_image_variants',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+COMPARED_FIELDS = tuple(name for name in SOURCE_FIELDS if name != 'id')
+CHUNK_SIZE = 1000
+
+
+def _models(product_model=None, image_model=None, listing_model=None):
+    from commerce.models import Product, ProductImage, ProductListing
+
+    return product_model or Product, image_model or ProductImage, listing_model or ProductListing
+
+
+def source_rows(queryset, image_model=None):
+    """Yield the ProductListing field values for each product in ``queryset``, read with one query."""
+    _, image_model, _ = _models(image_model=image_model)
+    first_image = image_model.objects.filter(product_id=OuterRef('pk')).exclude(image='').exclude(image=None) \
+        .order_by('id')
+    rows = queryset.annotate(
+        listing_subcategory_name=F('category__name'),
+        listing_category_id=F('category__category_id'),
+        listing_category_name=F('category__category__name'),
+        listing_user_username=F('user__username'),
+        listing_image=Subquery(first_image.values('image')[:1]),
+        listing_image_variants=Subquery(first_image.values('variants')[:1], output_field=JSONField()),
+    ).order_by('id').values_list(*SOURCE_FIELDS.values())
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        values = dict(zip(SOURCE_FIELDS, row))
+        values['image'] = values['image'] or ''
+        values['image_variants'] = values['image_variants'] or {}
+        yield values
+
+
+def _upsert(listing_model, rows):
+    listing_model.objects.bulk_create(
+        [listing_model(**row) for row in rows],
+        update_conflicts=True, unique_fields=['id'], update_fields=[*COMPARED_FIELDS, 'refreshed_at'],
+    )
+
+
+def refresh(product_ids):
+    """Rewrite the listing rows of ``product_ids`` from the source tables; rows of deleted products go."""
+    product_model, image_model, listing_model = _models()
+    product_ids = list(dict.fromkeys(product_ids))
+    for start in range(0, len(product_ids), CHUNK_SIZE):
+        chunk = product_ids[start:start + CHUNK_SIZE]
+        rows = list(source_rows(product_model.objects.filter(pk__in=chunk), image_model))
+        if rows:
+            _upsert(listing_model, rows)
+        if len(rows) < len(chunk):
+            remove(set(chunk) - {row['id'] for row in rows})
+
+
+def remove(product_ids):
+    _, _, listing_model = _models()
+    listing_model.objects.filter(pk__in=list(product_ids)).delete()
+
+
+def rename_subcategory(subcategory):
+    _, _, listing_model = _models()
+    listing_model.objects.filter(subcategory_id=subcategory.pk).update(
+        subcategory_name=subcategory.name, category_id=subcategory.category_id,
+        category_name=subcategory.category.name, refreshed_at=Now(),
+    )
+
+
+def rename_category(category):
+    _, _, listing_model = _models()
+    listing_model.objects.filter(category_id=category.pk).exclude(category_name=category.name).update(
+        category_name=category.name, refreshed_at=Now(),
+    )
+
+
+def rename_user(user):
+    _, _, listing_model = _models()
+    listing_model.objects.filter(user_id=user.pk).exclude(user_username=user.username).update(
+        user_username=user.username, refreshed_at=Now(),
+    )
+
+
+def rebuild(product_model=None, image_model=None, listing_model=None):
+    """Recreate every listing row from the source tables in CHUNK_SIZE batches."""
+    product_model, image_model, listing_model = _models(product_model, image_model, listing_model)
+    with transaction.atomic():
+        listing_model.objects.all().delete()
+        batch = []
+        for row in source_rows(product_model.objects.all(), image_model):
+            batch.append(listing_model(**row))
+            if len(batch) >= CHUNK_SIZE:
+                listing_model.objects.bulk_create(batch)
+                batch = []
+        listing_model.objects.bulk_create(batch)
+
+
+def diff(chunk_size=CHUNK_SIZE):
+    """
+    Compare every listing row with the source tables.
+
+    Yields ``(product_id, problem)`` for missing rows, rows of deleted
+    products and rows whose fields differ, reading both sides in id order.
+    """
+    product_model, image_model, listing_model = _models()
+    listed = listing_model.objects.order_by('id').values_list('id', *COMPARED_FIELDS).iterator(chunk_size=chunk_size)
+    expected = source_rows(product_model.objects.all(), image_model)
+    actual = next(listed, None)
+    for row in expected:
+        while actual is not None and actual[0] < row['id']:
+            yield actual[0], 'listed but the product no longer exists'
+            actual = next(listed, None)
+        if actual is None or actual[0] != row['id']:
+            yield row['id'], 'missing from the listing'
+            continue
+        stale = [
+            f'{name}: {value!r} != {row[name]!r}'
+            for name, value in zip(COMPARED_FIELDS, actual[1:]) if value != row[name]
+        ]
+        if stale:
+            yield row['id'], '; '.join(stale)
+        actual = next(listed, None)
+    while actual is not None:
+        yield actual[0], 'listed but the product no longer exists'
+        actual = next(listed, None)
+
+
+def filter_listings(queryset, params):
+    """The catalog's ``category``, ``subcategory``, ``price_band`` and ``in_stock`` filters on ProductListing."""
+    if params.get('category'):
+        queryset = queryset.filter(category_id=params['category'])
+    if params.get('subcategory'):
+        queryset = queryset.filter(subcategory_id=params['subcategory'])
+    if params.get('price_band') is not None:
+        low, high = band_range(params['price_band'])
+        queryset = queryset.filter(price__gte=low)
+        if high is not None:
+            queryset = queryset.filter(price__lt=high)
+    if params.get('in_stock') is not None:
+        queryset = queryset.filter(count__gt=0) if params['in_stock'] else queryset.filter(count__lte=0)
+    return queryset
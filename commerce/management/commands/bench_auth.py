@@ -0,0 +1,36 @@
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from commerce.benchmarks import api_client, measure
+from users.authentication import StatelessJWTAuthentication
+from users.models import User
+
+ENDPOINTS = ('/products/get/', '/products/cart/get/')
+
+
+class Command(BaseCommand):
+    help = "Compare queries and latency per request with database-backed vs. stateless JWT authentication."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="User to authenticate as; defaults to the first user.")
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        user = users.filter(username=options['username']).first() if options['username'] else users.first()
+        if user is None:
+            raise CommandError("No user to authenticate as.")
+
+        client = api_client(user)
+        for label, authentication in (('db lookup', JWTAuthentication), ('stateless', StatelessJWTAuthentication)):
+            with mock.patch.object(APIView, 'authentication_classes', [authentication]):
+                for path in ENDPOINTS:
+                    measure(client, path, requests=5)  # warm up
+                    stats = measure(client, path, requests=options['requests'])
+                    self.stdout.write(
+                        f"{label:>10} {path:<22} queries {stats['queries']:<5} "
+                        f"p50 {stats['p50_ms']}ms  p95 {stats['p95_ms']}ms  status {stats['status']}"
+                    )
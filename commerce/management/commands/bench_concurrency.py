@@ -0,0 +1,135 @@
+import asyncio
+import io
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from commerce.benchmarks import api_client
+from users.models import User
+from users.tokens import UserRefreshToken
+
+
+class InFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = self.peak = self.peak_threads = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.current -= 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive sync and async views with many slow clients and report throughput, peak "
+        "concurrency, threads and memory per in-flight request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=16, help="WSGI worker threads.")
+        parser.add_argument('--client-delay', type=float, default=0.2,
+                            help="Seconds each client takes to read the response.")
+        parser.add_argument('--sync-path', default='/products/get/')
+        parser.add_argument('--async-path', default='/products/async/get/')
+        parser.add_argument('--username', help="User to authenticate as; defaults to the first user.")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        user = users.filter(username=options['username']).first() if options['username'] else users.first()
+        if user is None:
+            raise CommandError("No user to authenticate as.")
+        api_client()  # lets the 'testserver' host through ALLOWED_HOSTS
+        self.token = f'Bearer {UserRefreshToken.for_user(user).access_token}'
+        self.delay = options['client_delay']
+
+        runs = (
+            ('WSGI', 'sync view', options['sync_path'], lambda path: self.run_wsgi(path, options)),
+            ('ASGI', 'sync view', options['sync_path'], lambda path: self.run_asgi(path, options)),
+            ('ASGI', 'async view', options['async_path'], lambda path: self.run_asgi(path, options)),
+        )
+        for server, kind, path, run in runs:
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            statuses, in_flight = run(path)
+            elapsed = time.perf_counter() - started
+            peak_memory = tracemalloc.get_traced_memory()[1] - baseline
+            tracemalloc.stop()
+            self.stdout.write(
+                f"{server} {kind:<10} {path:<22} {options['clients'] / elapsed:7.1f} req/s  "
+                f"peak in-flight {in_flight.peak:<4} threads {in_flight.peak_threads:<4} "
+                f"{peak_memory / max(in_flight.peak, 1) / 1024:7.1f} KiB/in-flight  status {sorted(statuses)}"
+            )
+
+    def run_wsgi(self, path, options):
+        application = get_wsgi_application()
+        in_flight = InFlight()
+        statuses = set()
+
+        def client(_):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': self.token,
+                'wsgi.input': io.BytesIO(b''), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            with in_flight:
+                result = application(environ, lambda status, headers: statuses.add(int(status[:3])))
+                # A slow client keeps the worker thread busy while it reads.
+                time.sleep(self.delay)
+                b''.join(result)
+                result.close()
+
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(client, range(options['clients'])))
+        return statuses, in_flight
+
+    def run_asgi(self, path, options):
+        application = get_asgi_application()
+        in_flight = InFlight()
+        statuses = set()
+
+        async def client():
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+                'root_path': '', 'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+                'headers': [(b'host', b'testserver'), (b'authorization', self.token.encode())],
+            }
+            received = asyncio.Event()
+
+            async def receive():
+                if not received.is_set():
+                    received.set()
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await asyncio.Future()  # the client never disconnects early
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.add(message['status'])
+                elif not message.get('more_body'):
+                    # A slow client only awaits the socket; no thread is held.
+                    await asyncio.sleep(self.delay)
+
+            with in_flight:
+                await application(scope, receive, send)
+
+        async def main():
+            await asyncio.gather(*(client() for _ in range(options['clients'])))
+
+        asyncio.run(main())
+        return statuses, in_flight
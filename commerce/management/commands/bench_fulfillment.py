@@ -0,0 +1,56 @@
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from commerce import fulfillment
+from commerce.benchmarks import timed
+from commerce.models import Order, OrderStatusChange
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a batch of pending orders through every fulfillment status and report orders per second. "
+        "Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=20_000)
+        parser.add_argument('--chunk-size', type=int, default=fulfillment.CHUNK_SIZE,
+                            help="Orders per transaction.")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.bench(**options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def bench(self, orders, chunk_size, **options):
+        buyer = User.objects.create_user(username='fulfil-buyer', email='buyer@fulfil.local')
+        created = Order.objects.bulk_create([
+            Order(user=buyer, total_price=100, payment_method='card', user_location='fulfil', status='pending')
+            for _ in range(orders)
+        ], batch_size=5000)
+        order_ids = [order.pk for order in created]
+        move = partial(fulfillment.transition, order_ids, chunk_size=chunk_size)
+
+        status = 'pending'
+        while fulfillment.TRANSITIONS.get(status):
+            status = fulfillment.TRANSITIONS[status][0]
+            elapsed, (moved, skipped) = timed(move, status)
+            self.stdout.write(
+                f"-> {status:<10} {len(moved)} orders in {elapsed:.2f}s ({len(moved) / elapsed:,.0f} orders/s), "
+                f"{len(skipped)} skipped"
+            )
+            if len(moved) != len(order_ids):
+                raise CommandError(f"Only {len(moved)} of {len(order_ids)} orders moved to {status}.")
+
+        elapsed, (moved, skipped) = timed(move, status)
+        self.stdout.write(f"-> {status:<10} again: {len(moved)} moved, {len(skipped)} skipped in {elapsed:.2f}s")
+        history = OrderStatusChange.objects.filter(order__user=buyer).count()
+        if moved or history != len(order_ids) * len(fulfillment.TRANSITIONS):
+            raise CommandError(f"Status history has {history} rows; expected one per order per transition.")
+        self.stdout.write(self.style.SUCCESS("Every transition was applied once and recorded."))
@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from commerce import reservations
+from commerce.benchmarks import summarize, timed
+from commerce.checkout import InsufficientStock
+from commerce.models import Cart, Category, Product, SubCategory
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Run hundreds of concurrent add-to-cart holds against a single hot SKU, report their latency "
+        "and verify stock is never over-reserved, then expire the holds and time the sweeper. "
+        "Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--adders', type=int, default=300)
+        parser.add_argument('--stock', type=int, default=100)
+        parser.add_argument('--quantity', type=int, default=1)
+        parser.add_argument('--workers', type=int, default=32)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.bench(**options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def bench(self, adders, stock, quantity, workers, **options):
+        seller = User.objects.create_user(username='hold-seller', email='seller@hold.local')
+        category = Category.objects.create(name='hold')
+        subcategory = SubCategory.objects.create(name='hold', category=category)
+        product = Product.objects.create(
+            name='hold', description='hold', price=100, count=stock, category=subcategory, user=seller,
+        )
+        users = User.objects.bulk_create([
+            User(username=f'hold-buyer-{i}', email=f'buyer-{i}@hold.local') for i in range(adders)
+        ])
+
+        barrier = threading.Barrier(min(workers, adders))
+        results = {'ok': 0, 'out_of_stock': 0, 'error': 0}
+        latencies = []
+        lock = threading.Lock()
+
+        def run(user):
+            try:
+                try:
+                    barrier.wait(timeout=5)
+                except threading.BrokenBarrierError:
+                    pass
+                elapsed, _ = timed(reservations.hold, user, product, quantity)
+                outcome = 'ok'
+            except InsufficientStock:
+                elapsed, outcome = None, 'out_of_stock'
+            except Exception as e:
+                self.stderr.write(f"{type(e).__name__}: {e}")
+                elapsed, outcome = None, 'error'
+            finally:
+                connection.close()
+            with lock:
+                results[outcome] += 1
+                if elapsed is not None:
+                    latencies.append(elapsed)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, users))
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        held = Cart.objects.filter(product=product).aggregate(total=Sum('reserved'))['total'] or 0
+        stats = summarize(latencies)
+        self.stdout.write(
+            f"{adders} adders in {elapsed:.2f}s ({adders / elapsed:.0f}/s): {results['ok']} held, "
+            f"{results['out_of_stock']} out of stock, {results['error']} errors; "
+            f"hold p50 {stats['p50_ms']}ms p95 {stats['p95_ms']}ms p99 {stats['p99_ms']}ms; "
+            f"stock {stock}, reserved {product.reserved}"
+        )
+        expected_ok = min(adders, stock // quantity)
+        if product.reserved != held or held != results['ok'] * quantity or held > stock \
+                or results['ok'] != expected_ok or results['error']:
+            raise CommandError("Reserved stock is inconsistent after concurrent holds.")
+
+        Cart.objects.filter(product=product).update(reserved_until=timezone.now() - timedelta(seconds=1))
+        elapsed, released = timed(reservations.release_expired)
+        product.refresh_from_db()
+        self.stdout.write(f"Swept {released} expired holds in {elapsed * 1000:.1f}ms; reserved {product.reserved}")
+        if product.reserved != 0 or released < results['ok']:
+            raise CommandError("Expired holds were not all returned to stock.")
+        self.stdout.write(self.style.SUCCESS("No over-reservation detected."))
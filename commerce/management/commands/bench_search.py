@@ -0,0 +1,41 @@
+import random
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from commerce import search
+from commerce.benchmarks import summarize, timed
+from commerce.models import Product
+
+
+class Command(BaseCommand):
+    help = "Compare full-text search latency against an icontains scan on the current database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("Full-text search needs SQLite (FTS5) or PostgreSQL.")
+
+        rng = random.Random(options['seed'])
+        names = list(Product.objects.order_by('?').values_list('name', flat=True)[:1000])
+        terms = [re.findall(r'\w{3,}', name) for name in names]
+        terms = [name_terms for name_terms in terms if name_terms]
+        if not terms:
+            raise CommandError("No products to sample search terms from.")
+        # One- and two-term queries drawn from real product names.
+        queries = []
+        for _ in range(options['queries']):
+            name_terms = rng.choice(terms)
+            queries.append(' '.join(rng.sample(name_terms, min(len(name_terms), rng.randint(1, 2)))))
+
+        self.stdout.write(f"{Product.objects.count()} products, {len(queries)} queries")
+        for label, func in (('fts', search.search), ('icontains', search.scan)):
+            samples = [timed(func, query, limit=options['limit'])[0] for query in queries]
+            stats = summarize(samples)
+            self.stdout.write(
+                f"{label:>10}: p50 {stats['p50_ms']}ms  p95 {stats['p95_ms']}ms  p99 {stats['p99_ms']}ms"
+            )
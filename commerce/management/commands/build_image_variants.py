@@ -0,0 +1,50 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.core.management.base import BaseCommand
+
+from commerce.signals import stored_product_image
+from commerce.models import ProductImage
+from root import images
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Build the WebP/JPEG srcset variants for product images and profile pictures that don't have them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Rebuild variants that already exist too.")
+        parser.add_argument('--in-flight', type=int, default=32, help="Images queued on the process pool at once.")
+
+    def handle(self, *args, **options):
+        products = ProductImage.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+        users = User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True).order_by('pk')
+        if not options['all']:
+            products = products.filter(variants={})
+            users = users.filter(profile_picture_variants={})
+
+        jobs = [
+            (products.only('pk', 'image', 'product_id'), 'image', 'variants',
+             lambda instance: lambda: stored_product_image(instance.product_id)),
+            (users.only('pk', 'profile_picture'), 'profile_picture', 'profile_picture_variants',
+             lambda instance: None),
+        ]
+        for queryset, field, variants_field, on_stored in jobs:
+            pending, results = set(), {'built': 0, 'failed': 0}
+
+            def collect(finished):
+                for future in finished:
+                    results['failed' if future.exception() else 'built'] += 1
+
+            for instance in queryset.iterator(chunk_size=500):
+                if len(pending) >= options['in_flight']:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                try:
+                    pending.add(images.build_variants(instance, field, variants_field, on_stored(instance)))
+                except OSError as e:
+                    results['failed'] += 1
+                    self.stderr.write(f"{queryset.model._meta.label} {instance.pk}: {e}")
+            collect(wait(pending).done)
+            self.stdout.write(
+                f"{queryset.model._meta.verbose_name_plural}: {results['built']} built, {results['failed']} failed"
+            )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from commerce import listings
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the denormalized product listing with the product, category, user and image tables "
+        "and report rows that drifted; --fix rewrites them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Refresh or remove every drifted row.")
+        parser.add_argument('--show', type=int, default=20, help="Problems printed before summarizing.")
+
+    def handle(self, *args, **options):
+        drifted = []
+        for product_id, problem in listings.diff():
+            if len(drifted) < options['show']:
+                self.stdout.write(f"  product {product_id}: {problem}")
+            drifted.append(product_id)
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("The product listing matches the source tables."))
+            return
+        if not options['fix']:
+            raise CommandError(f"{len(drifted)} listing row(s) drifted; rerun with --fix to rewrite them.")
+        listings.refresh(drifted)
+        self.stdout.write(self.style.SUCCESS(f"Rewrote {len(drifted)} listing row(s)."))
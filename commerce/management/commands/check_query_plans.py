@@ -0,0 +1,164 @@
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import resolve
+from django.test.utils import CaptureQueriesContext
+
+from commerce import seeding
+from commerce.benchmarks import api_client
+from commerce.instrumentation import budget_for
+from commerce.models import Cart, Comment, Product, SubCategory
+
+# Tables that stay small however large the catalog grows; a full scan of
+# them is expected and cheap.
+SMALL_TABLES = {'commerce_category', 'commerce_subcategory', 'commerce_productfacet'}
+
+# (label, path template). Templates are filled from the seeded fixtures; each
+# endpoint's budget is the query_budget its view declares.
+ENDPOINTS = (
+    ('catalog', '/products/get/'),
+    ('catalog page 2', '/products/get/?cursor={cursor}'),
+    ('catalog by subcategory', '/products/get/?subcategory={subcategory}'),
+    ('catalog in stock', '/products/get/?subcategory={subcategory}&in_stock=true'),
+    ('catalog by category', '/products/get/?category={category}'),
+    ('category tree', '/products/categories/'),
+    ('category', '/products/category/{category}/'),
+    ('category in stock', '/products/category/{category}/?in_stock=true'),
+    ('product detail', '/products/get/{product}/'),
+    ('cart', '/products/cart/get/'),
+    ('cart summary', '/products/cart/summary/'),
+    ('orders', '/products/order/'),
+    ('orders by status', '/products/order/?status=pending'),
+    ('orders in range', '/products/order/?since=2000-01-01T00:00:00Z&until=2100-01-01T00:00:00Z'),
+    ('stock', '/products/stock/?ids={products}'),
+    ('seller dashboard', '/products/seller/dashboard/'),
+    ('comments', '/products/comments/?id={product}'),
+    ('comments batch', '/products/comments/batch/?ids={products}'),
+    ('search', '/products/search/?q={term}'),
+    ('facets', '/products/facets/?subcategory={subcategory}'),
+    ('current user', '/auth/get-me/'),
+)
+
+# Endpoints whose sort is bounded by an indexed filter rather than the table:
+# search orders by rank over the matched rows only, and order history sorts
+# just the line items of the orders on the page. The category tree only
+# sorts the small category tables.
+SORT_ALLOWED = {'search', 'orders', 'orders by status', 'orders in range', 'category tree'}
+
+
+def explain(sql, allow_sort=False):
+    """Return the plan problems for one SELECT: full scans of large tables and sorts on them."""
+    problems = []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            # A derived table (e.g. a window-function subquery) only holds the
+            # rows its own, separately checked, plan steps produced.
+            derived = set()
+            for _, _, _, detail in cursor.fetchall():
+                words = detail.split()
+                if words[0] == 'CO-ROUTINE':
+                    derived.add(words[1])
+                elif detail.startswith('USE TEMP B-TREE FOR ORDER BY') and not allow_sort:
+                    problems.append(detail)
+                elif words[0] == 'SCAN' and 'USING' not in words and 'VIRTUAL' not in words \
+                        and words[1] not in SMALL_TABLES and words[1] not in derived:
+                    problems.append(detail)
+            return problems
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') not in SMALL_TABLES:
+            problems.append(f"Seq Scan on {node.get('Relation Name')}")
+        elif node['Node Type'] == 'Sort' and not allow_sort and node.get('Plan Rows', 0) > 1000:
+            problems.append(f"Sort of {node['Plan Rows']} rows")
+        nodes.extend(node.get('Plans', ()))
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database, hit the hot endpoints, EXPLAIN every SELECT they run and "
+        "fail on full scans of large tables or on query counts over budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--keepdb', action='store_true', help="Keep and reuse the seeded test database.")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            if Product.objects.count() < options['products']:
+                self.stdout.write(f"Seeding {options['products']} products...")
+                seeding.seed(
+                    users=options['users'], categories=20, subcategories=10, products=options['products'],
+                    log=lambda message: self.stdout.write(f"  {message}"),
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            failures = self.check_endpoints()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        if failures:
+            raise CommandError(f"{len(failures)} query plan regression(s):\n" + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS("All query plans use indexes and stay within budget."))
+
+    def fixtures(self):
+        cart = Cart.objects.select_related('user').order_by('id').first()
+        comment = Comment.objects.order_by('id').first()
+        subcategory = SubCategory.objects.order_by('id').first()
+        product = Product.objects.filter(pk=comment.product_id).first() if comment else Product.objects.first()
+        if cart is None or product is None or subcategory is None:
+            raise CommandError("The seeded database has no carts, products or subcategories.")
+        client = api_client(cart.user)
+        first_page = client.get('/products/get/').json()
+        cursor = (first_page.get('next') or '').split('cursor=')[-1].split('&')[0]
+        return client, {
+            'product': product.pk,
+            'products': ','.join(str(pk) for pk in Product.objects.order_by('-id').values_list('pk', flat=True)[:20]),
+            'subcategory': subcategory.pk,
+            'category': subcategory.category_id,
+            'term': product.name.split()[0],
+            'cursor': cursor,
+        }
+
+    def check_endpoints(self):
+        client, values = self.fixtures()
+        cache = caches[getattr(settings, 'PRODUCT_CACHE_ALIAS', 'default')]
+        failures = []
+        for label, template in ENDPOINTS:
+            path = template.format(**values)
+            budget = budget_for(resolve(path.split('?')[0]).func)
+            if budget is None:
+                failures.append(f"{label}: its view declares no query_budget")
+                continue
+            # Measure the cold path so cached endpoints still show their queries.
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                response = client.get(path)
+            queries = [query['sql'] for query in captured.captured_queries]
+            problems = []
+            if response.status_code != 200:
+                problems.append(f"status {response.status_code}")
+            if len(queries) > budget:
+                problems.append(f"{len(queries)} queries, budget {budget}")
+            for sql in queries:
+                if sql.lstrip().upper().startswith('SELECT'):
+                    problems.extend(f"{plan}  <- {sql[:160]}" for plan in explain(sql, label in SORT_ALLOWED))
+            status = self.style.ERROR('FAIL') if problems else self.style.SUCCESS('ok')
+            self.stdout.write(f"{status:>4} {label:<24} {len(queries)}/{budget} queries  {path}")
+            for problem in problems:
+                self.stdout.write(f"       {problem}")
+            failures.extend(f"{label}: {problem}" for problem in problems)
+        return failures
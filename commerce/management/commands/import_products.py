@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from commerce.importer import DEFAULT_BATCH_SIZE, detect_format, import_products
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Bulk create or update a seller's products from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--seller', required=True, help="Username that will own the imported products.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            seller = User.objects.get(username=options['seller'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown seller {options['seller']!r}.")
+        fmt = options['format'] or detect_format(options['path'])
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            report = import_products(stream, fmt, seller, batch_size=options['batch_size'])
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['created']} created, {report['updated']} updated, {report['error_count']} errors "
+            f"in {report['seconds']}s ({report['rows_per_sec']} rows/sec)"
+        ))
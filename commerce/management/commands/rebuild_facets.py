@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from commerce import facets
+from commerce.models import ProductFacet
+
+
+class Command(BaseCommand):
+    help = "Recompute product facet counts from the product table."
+
+    def handle(self, *args, **options):
+        facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {ProductFacet.objects.count()} facet buckets."))
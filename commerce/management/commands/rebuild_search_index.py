@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from commerce import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full-text search index from the product tables."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("Full-text search needs SQLite (FTS5) or PostgreSQL.")
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from commerce import sellers
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount every seller's products, stock, comments and sales from the source tables and report "
+        "counters that drifted; --fix rewrites them. Run it periodically, e.g. nightly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Rewrite the counters of every drifted seller.")
+        parser.add_argument('--show', type=int, default=20, help="Problems printed before summarizing.")
+
+    def handle(self, *args, **options):
+        drifted, shown = set(), 0
+        for seller_id, counter, stored, actual in sellers.diff():
+            if shown < options['show']:
+                self.stdout.write(f"  seller {seller_id}: {counter} is {stored}, expected {actual}")
+                shown += 1
+            drifted.add(seller_id)
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("The seller counters match the source tables."))
+            return
+        if not options['fix']:
+            raise CommandError(f"{len(drifted)} seller(s) drifted; rerun with --fix to rewrite them.")
+        sellers.rebuild(sorted(drifted))
+        self.stdout.write(self.style.SUCCESS(f"Rewrote the counters of {len(drifted)} seller(s)."))
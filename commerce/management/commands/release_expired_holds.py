@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from commerce import reservations
+
+
+class Command(BaseCommand):
+    help = "Return expired cart stock holds to stock in batches. Run it periodically, e.g. every minute from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=reservations.SWEEP_BATCH_SIZE,
+                            help="Cart lines released per transaction.")
+        parser.add_argument('--recount', action='store_true',
+                            help="Afterwards recompute every product's reserved units from the cart lines.")
+
+    def handle(self, *args, **options):
+        released = reservations.release_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired hold(s)."))
+        if options['recount']:
+            reservations.recount()
+            self.stdout.write(self.style.SUCCESS("Recounted reserved stock."))
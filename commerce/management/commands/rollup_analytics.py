@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from commerce import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold orders placed since the last run into the daily sales rollups and snapshot today's stock. "
+        "Run it periodically, e.g. every few minutes from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=analytics.BATCH_SIZE,
+                            help="Orders folded in per transaction.")
+        parser.add_argument('--settle-seconds', type=int, default=None,
+                            help="Leave orders younger than this for the next run (default ANALYTICS_SETTLE_SECONDS).")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Empty the sales rollups and rebuild them from the whole order history.")
+
+    def handle(self, *args, **options):
+        run = analytics.rebuild if options['rebuild'] else analytics.rollup
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        folded = run(batch_size=options['batch_size'], settle=options['settle_seconds'], log=log)
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {folded} order(s)."))
+        analytics.snapshot_inventory()
+        self.stdout.write(self.style.SUCCESS("Snapshotted inventory."))
@@ -0,0 +1,291 @@
+import io
+import json
+import logging
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import override_settings
+from django.urls import URLResolver, get_resolver, resolve
+from PIL import Image
+
+from commerce import reservations
+from commerce.benchmarks import api_client, measure
+from commerce.models import Cart, Comment, Order, Product, SubCategory
+from users.models import User
+from users.tokens import UserRefreshToken
+
+URLCONFS = ('commerce.urls', 'users.urls')
+PASSWORD = 'benchmark-password-1'
+# p95 changes smaller than this are noise on any machine.
+NOISE_MS = 1.0
+# Units kept available on the products the cart endpoints add.
+RESTOCK_UNITS = 10
+
+BULK_CSV = 'name,description,price,count,category_id\n' + ''.join(
+    f'Benchmark import {i},imported,{100 + i},5,{{subcategory}}\n' for i in range(100)
+)
+
+# (label, method, path template, body template, client). Templates are filled
+# from the fixtures; 'bulk', 'image' and 'fulfillment' bodies are fixtures
+# themselves. Writes are rolled back after every request.
+ENDPOINTS = (
+    ('catalog', 'get', '/products/get/', None, 'buyer'),
+    ('catalog by subcategory', 'get', '/products/get/?subcategory={subcategory}', None, 'buyer'),
+    ('category tree', 'get', '/products/categories/', None, 'buyer'),
+    ('category', 'get', '/products/category/{category}/', None, 'buyer'),
+    ('product detail', 'get', '/products/get/{product}/', None, 'buyer'),
+    ('search', 'get', '/products/search/?q={term}', None, 'buyer'),
+    ('facets', 'get', '/products/facets/?subcategory={subcategory}', None, 'buyer'),
+    ('export', 'get', '/products/export/', None, 'buyer'),
+    ('create product', 'post', '/products/create/', {
+        'name': 'Benchmark product', 'description': 'benchmark', 'price': 100, 'count': 5,
+        'category': '{subcategory}',
+    }, 'buyer'),
+    ('bulk import', 'post', '/products/bulk/', 'bulk', 'buyer'),
+    ('image upload', 'post', '/products/images/{own_product}/', 'image', 'buyer'),
+    ('update product', 'patch', '/products/update/{product}/', {'price': 150}, 'buyer'),
+    ('delete product', 'delete', '/products/delete/{product}/', None, 'buyer'),
+    ('add to cart', 'post', '/products/cart/add/', {'product_id': '{product}', 'quantity': 1}, 'buyer'),
+    ('cart batch', 'post', '/products/cart/batch/', {'operations': [
+        {'action': 'set', 'product_id': '{product}', 'quantity': 1},
+        {'action': 'add', 'product_id': '{other_product}', 'quantity': 2},
+        {'action': 'remove', 'product_id': '{cart_product}'},
+    ]}, 'buyer'),
+    ('cart', 'get', '/products/cart/get/', None, 'buyer'),
+    ('cart summary', 'get', '/products/cart/summary/', None, 'buyer'),
+    ('stock', 'get', '/products/stock/?ids={products}', None, 'buyer'),
+    ('orders', 'get', '/products/order/', None, 'buyer'),
+    ('checkout', 'post', '/products/order/create/', {
+        'payment_method': 'card', 'user_location': 'Benchmark street',
+    }, 'buyer'),
+    ('order status batch', 'post', '/products/order/status/', 'fulfillment', 'admin'),
+    ('seller dashboard', 'get', '/products/seller/dashboard/', None, 'buyer'),
+    ('comments', 'get', '/products/comments/?id={product}', None, 'buyer'),
+    ('comments (post)', 'post', '/products/comments/', {'id': '{product}'}, 'buyer'),
+    ('comments batch', 'get', '/products/comments/batch/?ids={products}&limit=5', None, 'buyer'),
+    ('cache stats', 'get', '/products/cache/stats/', None, 'admin'),
+    ('sales analytics', 'get', '/products/analytics/sales/?by=subcategory', None, 'admin'),
+    ('top sales', 'get', '/products/analytics/top/?by=seller&limit=10', None, 'admin'),
+    ('inventory analytics', 'get', '/products/analytics/inventory/?subcategory={subcategory}', None, 'admin'),
+    ('async catalog', 'get', '/products/async/get/', None, 'buyer'),
+    ('async product detail', 'get', '/products/async/get/{product}/', None, 'buyer'),
+    ('async cart', 'get', '/products/async/cart/get/', None, 'buyer'),
+    ('async add to cart', 'post', '/products/async/cart/add/', {'product_id': '{product}', 'quantity': 1}, 'buyer'),
+    ('async comments', 'get', '/products/async/comments/?id={product}', None, 'buyer'),
+    ('register', 'post', '/auth/register/', {
+        'username': 'benchmark-new', 'email': 'benchmark-new@bench.local', 'password': PASSWORD,
+    }, 'anonymous'),
+    ('login', 'post', '/auth/login/', {'username_or_email': '{email}', 'password': PASSWORD}, 'anonymous'),
+    ('token refresh', 'post', '/auth/token/refresh/', {'refresh': '{refresh}'}, 'anonymous'),
+    ('current user', 'get', '/auth/get-me/', None, 'buyer'),
+    ('async register', 'post', '/auth/async/register/', {
+        'username': 'benchmark-new', 'email': 'benchmark-new@bench.local', 'password': PASSWORD,
+    }, 'anonymous'),
+    ('async login', 'post', '/auth/async/login/', {'username_or_email': '{email}', 'password': PASSWORD},
+     'anonymous'),
+)
+
+
+def app_routes():
+    """Every route defined in URLCONFS, with its include prefix."""
+    routes = set()
+    for resolver in get_resolver().url_patterns:
+        if isinstance(resolver, URLResolver) and resolver.urlconf_name in URLCONFS:
+            routes.update(f'{resolver.pattern}{pattern.pattern}' for pattern in resolver.url_patterns)
+    return routes
+
+
+def covered_routes():
+    # Any id resolves; only the route matters here.
+    placeholders = defaultdict(lambda: '1')
+    return {resolve(path.format_map(placeholders).split('?')[0]).route for _, _, path, _, _ in ENDPOINTS}
+
+
+def restock(product, units):
+    """Make sure ``units`` more of ``product`` can be held, through save() so the counters follow."""
+    product.refresh_from_db(fields=['count', 'reserved'])
+    if product.count - product.reserved < units:
+        product.count = product.reserved + units
+        product.save()
+
+
+def fill(template, values):
+    if isinstance(template, dict):
+        return {key: fill(value, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [fill(value, values) for value in template]
+    if isinstance(template, str):
+        return template.format(**values)
+    return template
+
+
+def regressions(results, baseline, tolerance):
+    """Compare endpoint stats against a baseline: more queries, a slower p95 or a changed status."""
+    problems = []
+    for label, stats in results.items():
+        before = baseline.get(label)
+        if before is None:
+            continue
+        if stats['queries'] > before['queries']:
+            problems.append(f"{label}: {stats['queries']} queries, baseline {before['queries']}")
+        if stats['p95_ms'] > before['p95_ms'] * (1 + tolerance) and stats['p95_ms'] - before['p95_ms'] > NOISE_MS:
+            problems.append(f"{label}: p95 {stats['p95_ms']}ms, baseline {before['p95_ms']}ms")
+        if stats['status'] != before['status']:
+            problems.append(f"{label}: status {stats['status']}, baseline {before['status']}")
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with seed_benchmark, drive every commerce and users endpoint "
+        "through the test client and report p50/p95/p99 latency and queries, optionally against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help="seed_benchmark scale (1 = 10k products).")
+        parser.add_argument('--requests', type=int, default=50, help="Measured requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per endpoint.")
+        parser.add_argument('--only', action='append', default=[], help="Run only endpoints with this label.")
+        parser.add_argument('--baseline', help="Baseline JSON to compare against.")
+        parser.add_argument('--save-baseline', help="Write the results to this JSON file.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed p95 slowdown over the baseline, as a fraction.")
+        parser.add_argument('--keepdb', action='store_true', help="Keep and reuse the seeded test database.")
+
+    def handle(self, *args, **options):
+        missing = app_routes() - covered_routes()
+        if missing:
+            raise CommandError("No benchmark for: " + ', '.join(sorted(missing)))
+        unknown = set(options['only']) - {label for label, *_ in ENDPOINTS}
+        if unknown:
+            raise CommandError("Unknown endpoint: " + ', '.join(sorted(unknown)))
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read the baseline: {e}")
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            if not Product.objects.exists():
+                call_command('seed_benchmark', scale=options['scale'], stdout=self.stdout)
+            # Uploads are written somewhere that goes away with the test database.
+            with override_settings(STORAGES={
+                **settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            }):
+                results = self.run_endpoints(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        # Timing an error response says nothing about the endpoint.
+        failed = [
+            f"{label}: status {stats['status']}" for label, stats in results.items()
+            if any(not 200 <= code < 300 for code in stats['status'])
+        ]
+        if failed:
+            raise CommandError(f"{len(failed)} endpoint(s) answered with an error:\n" + '\n'.join(failed))
+
+        report = {'scale': options['scale'], 'requests': options['requests'], 'endpoints': results}
+        if options['save_baseline']:
+            Path(options['save_baseline']).write_text(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(f"Saved results to {options['save_baseline']}")
+        if baseline is not None:
+            if (baseline.get('scale'), baseline.get('requests')) != (options['scale'], options['requests']):
+                self.stdout.write(self.style.WARNING(
+                    f"The baseline was recorded with scale {baseline.get('scale')} and "
+                    f"{baseline.get('requests')} requests; the comparison may not be meaningful."
+                ))
+            problems = regressions(results, baseline.get('endpoints', {}), options['tolerance'])
+            if problems:
+                raise CommandError(f"{len(problems)} regression(s) against the baseline:\n" + '\n'.join(problems))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def fixtures(self):
+        comment = Comment.objects.order_by('id').first()
+        product = Product.objects.filter(pk=comment.product_id).first() if comment else Product.objects.first()
+        cart = Cart.objects.order_by('id').first()
+        subcategory = SubCategory.objects.order_by('id').first()
+        if cart is None or product is None or subcategory is None:
+            raise CommandError("The seeded database has no carts, products or subcategories.")
+
+        member = User.objects.create(
+            username='benchmark-member', email='benchmark-member@bench.local', password=make_password(PASSWORD),
+        )
+        admin = User.objects.create(username='benchmark-admin', email='benchmark-admin@bench.local', is_staff=True)
+        clients = {'buyer': api_client(cart.user), 'admin': api_client(admin), 'anonymous': api_client()}
+        for client in clients.values():
+            # Record server errors as a status instead of aborting the run.
+            client.raise_request_exception = False
+
+        # Seeded products may be sold out. Restock what the cart endpoints add
+        # and hold the buyer's lines, so add to cart and checkout can succeed.
+        other_product = Product.objects.exclude(pk=product.pk).order_by('id').first()
+        for extra in (product, other_product):
+            restock(extra, RESTOCK_UNITS)
+        for line in Cart.objects.filter(user=cart.user).select_related('product'):
+            restock(line.product, line.quantity)
+            reservations.hold(cart.user, line.product, line.quantity)
+
+        upload = SimpleUploadedFile('products.csv', BULK_CSV.format(subcategory=subcategory.pk).encode())
+        photo = io.BytesIO()
+        Image.new('RGB', (1600, 1200), 'teal').save(photo, 'JPEG')
+        own_product = Product.objects.filter(user=cart.user).first() or Product.objects.create(
+            name='Benchmark own product', description='benchmark', price=100, count=5,
+            category=subcategory, user=cart.user,
+        )
+        return clients, {
+            'product': product.pk,
+            'other_product': other_product.pk,
+            'cart_product': cart.product_id,
+            'products': ','.join(str(pk) for pk in Product.objects.order_by('-id').values_list('pk', flat=True)[:20]),
+            'subcategory': subcategory.pk,
+            'category': subcategory.category_id,
+            'term': product.name.split()[0],
+            'email': member.email,
+            'refresh': str(UserRefreshToken.for_user(member)),
+            'own_product': own_product.pk,
+            'fulfillment': {
+                'order_ids': list(Order.objects.filter(status='pending').values_list('pk', flat=True)[:1000]),
+                'status': 'delivering',
+            },
+            'bulk': encode_multipart(BOUNDARY, {'file': upload}),
+            'image': encode_multipart(BOUNDARY, {'image': SimpleUploadedFile('photo.jpg', photo.getvalue())}),
+        }
+
+    def run_endpoints(self, options):
+        clients, values = self.fixtures()
+        # Error statuses are reported in the results; skip the per-request log lines.
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        results = {}
+        for label, method, template, body, client_name in ENDPOINTS:
+            if options['only'] and label not in options['only']:
+                continue
+            path = template.format(**values)
+            if body in ('bulk', 'image'):
+                kwargs = {'data': values[body], 'content_type': MULTIPART_CONTENT}
+            elif body == 'fulfillment':
+                kwargs = {'data': values[body], 'format': 'json'}
+            elif body is not None:
+                kwargs = {'data': fill(body, values), 'format': 'json'}
+            else:
+                kwargs = {}
+            client = clients[client_name]
+            write = method != 'get'
+            measure(client, path, requests=options['warmup'], method=method, rollback=write, **kwargs)
+            stats = results[label] = measure(
+                client, path, requests=options['requests'], method=method, rollback=write, **kwargs
+            )
+            self.stdout.write(
+                f"{label:<24} queries {stats['queries']:<6} p50 {stats['p50_ms']:>8}ms  "
+                f"p95 {stats['p95_ms']:>8}ms  p99 {stats['p99_ms']:>8}ms  status {stats['status']}"
+            )
+        return results
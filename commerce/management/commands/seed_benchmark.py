@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from commerce import seeding
+
+# Volumes at --scale 1. The scale multiplies the row counts; the per-product
+# and per-user densities stay as they are unless overridden.
+BASE_VOLUMES = {'users': 100, 'categories': 10, 'products': 10_000}
+DENSITIES = {'subcategories': 5, 'comments': 2, 'images': 1, 'cart_lines': 3, 'orders': 2}
+DENSITY_UNITS = {'subcategories': 'category', 'comments': 'product', 'images': 'product', 'cart_lines': 'user',
+                 'orders': 'user'}
+
+
+def scaled_volumes(scale, **overrides):
+    """Keyword arguments for seeding.seed at ``scale``; non-None ``overrides`` win."""
+    volumes = {name: max(1, round(count * scale)) for name, count in BASE_VOLUMES.items()}
+    volumes.update(DENSITIES)
+    volumes.update({name: value for name, value in overrides.items() if value is not None})
+    return volumes
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate users, categories, subcategories, products, images, comments, carts and orders "
+        "for benchmarking."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help="Multiplies the user, category and product counts (1 = 10k products).")
+        for name in BASE_VOLUMES:
+            parser.add_argument(f'--{name}', type=int, help=f"Total {name}; overrides --scale.")
+        for name, unit in DENSITY_UNITS.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int,
+                                help=f"{name.replace('_', ' ').capitalize()} per {unit} (default {DENSITIES[name]}).")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for repeatable datasets.")
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0:
+            raise CommandError("--scale must be positive.")
+        volumes = scaled_volumes(options['scale'], **{
+            name: options[name] for name in (*BASE_VOLUMES, *DENSITIES)
+        })
+        counts = seeding.seed(
+            **volumes, batch_size=options['batch_size'], random_seed=options['seed'],
+            log=lambda message: self.stdout.write(f"  {message}"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded " + ', '.join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items())
+        ))
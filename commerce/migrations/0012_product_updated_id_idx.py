@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0011_product_created_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='product_updated_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0012_product_updated_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=50)),
+                ('unit_price', models.IntegerField()),
+                ('quantity', models.IntegerField()),
+                ('price', models.IntegerField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='commerce.order')),
+                ('product', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='commerce.product')),
+            ],
+        ),
+    ]
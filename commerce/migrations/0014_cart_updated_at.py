@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0013_orderitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# A frozen copy of commerce.search as it stood when this migration was written;
+# later changes to that module must not change what this migration does.
+FTS_TABLE = 'commerce_product_fts'
+SEARCH_TABLE = 'commerce_product_search'
+SOURCE_SQL = (
+    'FROM commerce_product p '
+    'JOIN commerce_subcategory s ON s.id = p.category_id '
+    'JOIN commerce_category c ON c.id = s.category_id'
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            'name, description, subcategory, category, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(f'DELETE FROM {FTS_TABLE}')
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, subcategory, category) '
+            f'SELECT p.id, p.name, p.description, s.name, c.name {SOURCE_SQL}'
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+            'product_id bigint PRIMARY KEY REFERENCES commerce_product (id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_gin ON {SEARCH_TABLE} USING GIN (document)'
+        )
+        schema_editor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        schema_editor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (product_id, document) '
+            "SELECT p.id, setweight(to_tsvector('english', p.name), 'A') || "
+            "setweight(to_tsvector('english', s.name), 'B') || "
+            "setweight(to_tsvector('english', c.name), 'C') || "
+            f"setweight(to_tsvector('english', p.description), 'D') {SOURCE_SQL}"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0014_cart_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
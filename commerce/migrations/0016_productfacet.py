@@ -0,0 +1,55 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import BooleanField, Case, Count, IntegerField, Value, When
+
+
+def populate_facets(apps, schema_editor):
+    Product = apps.get_model('commerce', 'Product')
+    ProductFacet = apps.get_model('commerce', 'ProductFacet')
+    # Band i covers [bounds[i], bounds[i + 1]); the default is frozen from commerce.facets.
+    bounds = tuple(getattr(settings, 'PRODUCT_PRICE_BANDS', (0, 50, 100, 500, 1000, 5000)))
+    rows = (
+        Product.objects
+        .annotate(band=Case(
+            *[When(price__lt=bound, then=Value(band - 1)) for band, bound in enumerate(bounds) if band > 0],
+            default=Value(len(bounds) - 1), output_field=IntegerField(),
+        ), stocked=Case(
+            When(count__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField(),
+        ))
+        .values('category_id', 'band', 'stocked')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    ProductFacet.objects.bulk_create([
+        ProductFacet(
+            subcategory_id=row['category_id'], price_band=row['band'], in_stock=row['stocked'], count=row['total'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0015_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_band', models.PositiveSmallIntegerField()),
+                ('in_stock', models.BooleanField()),
+                ('count', models.IntegerField(default=0)),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='commerce.subcategory')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('subcategory', 'price_band', 'in_stock'), name='unique_product_facet')],
+            },
+        ),
+        migrations.RunPython(populate_facets, migrations.RunPython.noop),
+    ]
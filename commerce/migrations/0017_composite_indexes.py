@@ -0,0 +1,49 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:59
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_cart_lines(apps, schema_editor):
+    # Keep the most recent line for each (user, product) so the unique constraint applies cleanly.
+    Cart = apps.get_model('commerce', 'Cart')
+    duplicates = (
+        Cart.objects.values('user_id', 'product_id')
+        .annotate(lines=Count('id'), keep=Max('id'))
+        .filter(lines__gt=1)
+    )
+    for row in duplicates:
+        Cart.objects.filter(user_id=row['user_id'], product_id=row['product_id']).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0016_productfacet'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['product', '-created_at', '-id'], name='comment_product_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-ordered_at', '-id'], name='order_user_ordered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='product_sub_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('count__gt', 0)), fields=['category', '-created_at', '-id'], name='product_in_stock_sub_idx'),
+        ),
+        migrations.RunPython(drop_duplicate_cart_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_cart_user_product'),
+        ),
+    ]
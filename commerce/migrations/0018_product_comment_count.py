@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_comment_counts(apps, schema_editor):
+    Product = apps.get_model('commerce', 'Product')
+    Comment = apps.get_model('commerce', 'Comment')
+    counts = (
+        Comment.objects.filter(product_id=OuterRef('pk'))
+        .order_by().values('product_id').annotate(total=Count('id')).values('total')
+    )
+    Product.objects.update(comment_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0017_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_comment_counts, migrations.RunPython.noop),
+    ]
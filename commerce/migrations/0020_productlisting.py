@@ -0,0 +1,75 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:55
+
+from django.db import migrations, models
+from django.db.models import F, JSONField, OuterRef, Subquery
+
+
+def populate_listings(apps, schema_editor):
+    Product = apps.get_model('commerce', 'Product')
+    ProductImage = apps.get_model('commerce', 'ProductImage')
+    ProductListing = apps.get_model('commerce', 'ProductListing')
+    first_image = ProductImage.objects.filter(product_id=OuterRef('pk')).exclude(image='').exclude(image=None) \
+        .order_by('id')
+    rows = Product.objects.annotate(
+        subcategory_name=F('category__name'),
+        listing_category_id=F('category__category_id'),
+        category_name=F('category__category__name'),
+        user_username=F('user__username'),
+        first_image=Subquery(first_image.values('image')[:1]),
+        first_image_variants=Subquery(first_image.values('variants')[:1], output_field=JSONField()),
+    ).order_by('id').values(
+        'id', 'name', 'description', 'price', 'count', 'comment_count', 'category_id', 'subcategory_name',
+        'listing_category_id', 'category_name', 'user_id', 'user_username', 'first_image', 'first_image_variants',
+        'created_at', 'updated_at',
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        batch.append(ProductListing(
+            id=row['id'], name=row['name'], description=row['description'], price=row['price'],
+            count=row['count'], comment_count=row['comment_count'],
+            subcategory_id=row['category_id'], subcategory_name=row['subcategory_name'],
+            category_id=row['listing_category_id'], category_name=row['category_name'],
+            user_id=row['user_id'], user_username=row['user_username'],
+            image=row['first_image'] or '', image_variants=row['first_image_variants'] or {},
+            created_at=row['created_at'], updated_at=row['updated_at'],
+        ))
+        if len(batch) >= 1000:
+            ProductListing.objects.bulk_create(batch)
+            batch = []
+    ProductListing.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0019_productimage_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+                ('description', models.TextField()),
+                ('price', models.IntegerField()),
+                ('count', models.IntegerField()),
+                ('comment_count', models.IntegerField(default=0)),
+                ('subcategory_id', models.BigIntegerField()),
+                ('subcategory_name', models.CharField(max_length=100)),
+                ('category_id', models.BigIntegerField()),
+                ('category_name', models.CharField(max_length=100)),
+                ('user_id', models.BigIntegerField()),
+                ('user_username', models.CharField(max_length=150)),
+                ('image', models.CharField(blank=True, max_length=100)),
+                ('image_variants', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-created_at', '-id'], name='listing_created_idx'), models.Index(fields=['subcategory_id', '-created_at', '-id'], name='listing_sub_created_idx'), models.Index(condition=models.Q(('count__gt', 0)), fields=['subcategory_id', '-created_at', '-id'], name='listing_in_stock_sub_idx'), models.Index(fields=['category_id', '-created_at', '-id'], name='listing_cat_created_idx'), models.Index(fields=['user_id'], name='listing_user_idx'), models.Index(fields=['refreshed_at', 'id'], name='listing_refreshed_id_idx')],
+            },
+        ),
+        migrations.RunPython(populate_listings, migrations.RunPython.noop),
+    ]
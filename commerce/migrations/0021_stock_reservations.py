@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-18 16:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0020_productlisting'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='reserved',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='reserved_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reserved',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(condition=models.Q(('reserved__gt', 0)), fields=['reserved_until', 'id'], name='cart_hold_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-18 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0021_stock_reservations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'status', '-ordered_at', '-id'], name='order_user_status_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.1.15 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0023_orderstatuschange'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_order_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('products', models.IntegerField(default=0)),
+                ('products_in_stock', models.IntegerField(default=0)),
+                ('units', models.BigIntegerField(default=0)),
+                ('reserved', models.BigIntegerField(default=0)),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='commerce.subcategory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['subcategory', 'day'], name='inventory_snapshot_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'subcategory'), name='unique_inventory_snapshot')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='commerce.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'day'], name='product_daily_sales_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='unique_product_daily_sales')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SellerDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['seller', 'day'], name='seller_daily_sales_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'seller'), name='unique_seller_daily_sales')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SubCategoryDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='commerce.subcategory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['subcategory', 'day'], name='subcategory_daily_sales_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'subcategory'), name='unique_subcategory_daily_sales')],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.1.15 on 2026-10-18 17:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+COUNTERS = ('products', 'units', 'low_stock', 'comments', 'orders', 'units_sold', 'revenue')
+
+
+def populate_seller_stats(apps, schema_editor):
+    Product = apps.get_model('commerce', 'Product')
+    Comment = apps.get_model('commerce', 'Comment')
+    OrderItem = apps.get_model('commerce', 'OrderItem')
+    SellerStats = apps.get_model('commerce', 'SellerStats')
+    OrderItem.objects.filter(product__isnull=False).update(
+        seller_id=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('user_id')[:1]),
+    )
+    # The default threshold is frozen from commerce.sellers.
+    threshold = getattr(settings, 'SELLER_LOW_STOCK_THRESHOLD', 5)
+    totals = {}
+    for row in Product.objects.order_by().values('user_id').annotate(
+        products=Count('id'), units=Coalesce(Sum('count'), Value(0)),
+        low_stock=Count('id', filter=Q(count__lte=threshold)),
+    ):
+        totals.setdefault(row.pop('user_id'), dict.fromkeys(COUNTERS, 0)).update(row)
+    for row in Comment.objects.order_by().values('product__user_id').annotate(comments=Count('id')):
+        totals.setdefault(row.pop('product__user_id'), dict.fromkeys(COUNTERS, 0)).update(row)
+    for row in OrderItem.objects.filter(seller__isnull=False).order_by().values('seller_id').annotate(
+        orders=Count('order_id', distinct=True), units_sold=Sum('quantity'), revenue=Sum('price'),
+    ):
+        totals.setdefault(row.pop('seller_id'), dict.fromkeys(COUNTERS, 0)).update(row)
+    SellerStats.objects.bulk_create([
+        SellerStats(seller_id=seller_id, **counters) for seller_id, counters in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0024_analytics_rollups'),
+        ('users', '0004_user_profile_picture_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerStats',
+            fields=[
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='seller_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('products', models.IntegerField(default=0)),
+                ('units', models.BigIntegerField(default=0)),
+                ('low_stock', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('orders', models.IntegerField(default=0)),
+                ('units_sold', models.BigIntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='seller',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sold_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['user', 'count', 'id'], name='product_user_count_idx'),
+        ),
+        migrations.RunPython(populate_seller_stats, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,18 @@
-from django.db import models
+from django.db import models, transaction
 from users.models import User
 
+# Largest value an id column holds; bigger ids overflow the database driver.
+MAX_PK = 2 ** 63 - 1
+
+
+def parse_pk(value):
+    """``value`` as a positive id, or None when it isn't one (non-digits, zero or out of range)."""
+    value = str(value).strip()
+    if not value.isdigit() or not value.isascii():
+        return None
+    pk = int(value)
+    return pk if 0 < pk <= MAX_PK else None
+
 
 class BaseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -31,13 +43,98 @@ class Product(BaseModel):
     category = models.ForeignKey(SubCategory, on_delete=models.CASCADE)
     count = models.IntegerField(default=0)
     user = models.ForeignKey(User, related_name='user_products', on_delete=models.CASCADE)
+    # Kept current by signals so listings don't COUNT comments per row.
+    comment_count = models.IntegerField(default=0, editable=False)
+    # Units held by cart lines (the sum of Cart.reserved); count - reserved is
+    # what can still be added to a cart. Maintained by commerce.reservations.
+    reserved = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='product_updated_id_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='product_sub_created_idx'),
+            models.Index(
+                fields=['category', '-created_at', '-id'], condition=models.Q(count__gt=0),
+                name='product_in_stock_sub_idx',
+            ),
+            models.Index(fields=['user', 'count', 'id'], name='product_user_count_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The facet, listing and seller counters are kept by signal receivers;
+        # commit them together with the row, whose previous values the
+        # pre_save receiver reads under a row lock.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+class ProductFacet(models.Model):
+    """Number of products per (subcategory, price band, in stock) bucket, kept current by signals."""
+    subcategory = models.ForeignKey(SubCategory, related_name='facets', on_delete=models.CASCADE)
+    price_band = models.PositiveSmallIntegerField()
+    in_stock = models.BooleanField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['subcategory', 'price_band', 'in_stock'], name='unique_product_facet'),
+        ]
+
+    def __str__(self):
+        return f"{self.subcategory} / band {self.price_band} / {'in stock' if self.in_stock else 'sold out'}"
+
+
+class ProductListing(models.Model):
+    """
+    One flattened catalog row per product, kept current by commerce.listings.
+
+    Carries everything the listing endpoints show, so a page is a single
+    indexed range scan with no joins. ``id`` is the product's id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=50)
+    description = models.TextField()
+    price = models.IntegerField()
+    count = models.IntegerField()
+    comment_count = models.IntegerField(default=0)
+    subcategory_id = models.BigIntegerField()
+    subcategory_name = models.CharField(max_length=100)
+    category_id = models.BigIntegerField()
+    category_name = models.CharField(max_length=100)
+    user_id = models.BigIntegerField()
+    user_username = models.CharField(max_length=150)
+    image = models.CharField(max_length=100, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    # When this row last changed, for the catalog's ETag.
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='listing_created_idx'),
+            models.Index(fields=['subcategory_id', '-created_at', '-id'], name='listing_sub_created_idx'),
+            models.Index(
+                fields=['subcategory_id', '-created_at', '-id'], condition=models.Q(count__gt=0),
+                name='listing_in_stock_sub_idx',
+            ),
+            models.Index(fields=['category_id', '-created_at', '-id'], name='listing_cat_created_idx'),
+            models.Index(fields=['user_id'], name='listing_user_idx'),
+            models.Index(fields=['refreshed_at', 'id'], name='listing_refreshed_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+
 class ProductImage(models.Model):
     image = models.ImageField(upload_to='products/', blank=True, null=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
+    # {format: {width: storage name}}, filled in by the image pipeline after upload.
+    variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.product.name
@@ -47,6 +144,11 @@ class Comment(BaseModel):
     product = models.ForeignKey(Product, related_name='comments', on_delete=models.CASCADE)
     user = models.ForeignKey(User, related_name='comments', on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', '-created_at', '-id'], name='comment_product_created_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -57,7 +159,22 @@ class Cart(models.Model):
     quantity = models.IntegerField()
     price = models.IntegerField()
     added_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Units of the product held for this line until reserved_until; released
+    # by the release_expired_holds sweeper once that passes.
+    reserved = models.IntegerField(default=0, editable=False)
+    reserved_until = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_cart_user_product'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['reserved_until', 'id'], condition=models.Q(reserved__gt=0), name='cart_hold_expiry_idx',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         self.price = self.product.price * self.quantity
@@ -82,11 +199,135 @@ class Order(models.Model):
         ('delivered', 'Delivered')
     ], default='pending', max_length=20)
 
-    def save(self, *args, **kwargs):
-        self.total_price = Cart.objects.filter(user=self.user).aggregate(
-            total=models.Sum('total_price')
-        )['total'] or 0
-        super().save(*args, **kwargs)
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-ordered_at', '-id'], name='order_user_ordered_idx'),
+            models.Index(fields=['user', 'status', '-ordered_at', '-id'], name='order_user_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}'s Order"
+
+
+class OrderStatusChange(models.Model):
+    """Append-only record of every status an order moved through, written by commerce.fulfillment."""
+    order = models.ForeignKey(Order, related_name='status_changes', on_delete=models.CASCADE)
+    from_status = models.CharField(max_length=20)
+    to_status = models.CharField(max_length=20)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    changed_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'changed_at'], name='order_status_change_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status} -> {self.to_status}"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='order_items', null=True, on_delete=models.SET_NULL)
+    # The product's seller when it was sold, so seller sales outlive the product.
+    seller = models.ForeignKey(User, related_name='sold_items', null=True, on_delete=models.SET_NULL)
+    product_name = models.CharField(max_length=50)
+    unit_price = models.IntegerField()
+    quantity = models.IntegerField()
+    price = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+
+class DailySales(models.Model):
+    """Orders, units and revenue for one day and one key, rolled up from OrderItem by commerce.analytics."""
+    day = models.DateField()
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ProductDailySales(DailySales):
+    product = models.ForeignKey(Product, related_name='daily_sales', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_product_daily_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'day'], name='product_daily_sales_idx'),
+        ]
+
+
+class SubCategoryDailySales(DailySales):
+    subcategory = models.ForeignKey(SubCategory, related_name='daily_sales', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'subcategory'], name='unique_subcategory_daily_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['subcategory', 'day'], name='subcategory_daily_sales_idx'),
+        ]
+
+
+class SellerDailySales(DailySales):
+    seller = models.ForeignKey(User, related_name='daily_sales', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'seller'], name='unique_seller_daily_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'day'], name='seller_daily_sales_idx'),
+        ]
+
+
+class InventorySnapshot(models.Model):
+    """Stock per subcategory as of the last rollup run on ``day``."""
+    day = models.DateField()
+    subcategory = models.ForeignKey(SubCategory, related_name='inventory_snapshots', on_delete=models.CASCADE)
+    products = models.IntegerField(default=0)
+    products_in_stock = models.IntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    reserved = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'subcategory'], name='unique_inventory_snapshot'),
+        ]
+        indexes = [
+            models.Index(fields=['subcategory', 'day'], name='inventory_snapshot_idx'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """The last order id a rollup has folded in, so each run only reads newer orders."""
+    name = models.CharField(max_length=50, unique=True)
+    last_order_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ order {self.last_order_id}"
+
+
+class SellerStats(models.Model):
+    """Per-seller catalog, stock, comment and sales counters, kept current by commerce.sellers."""
+    seller = models.OneToOneField(User, primary_key=True, related_name='seller_stats', on_delete=models.CASCADE)
+    products = models.IntegerField(default=0)
+    # Sum of Product.count over the seller's products.
+    units = models.BigIntegerField(default=0)
+    # Products with at most SELLER_LOW_STOCK_THRESHOLD units.
+    low_stock = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    units_sold = models.BigIntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.user.username}'s Order"
\ No newline at end of file
+        return f"{self.seller_id}: {self.products} products, {self.revenue} revenue"
@@ -0,0 +1,141 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset (seek) pagination over a composite ordering.
+
+    The cursor stores the ordering values of the last row on the page, so the
+    next page is fetched with a ``WHERE (a, b) < (x, y)`` style filter that can
+    use an index on the ordering columns no matter how deep the client pages.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.finish_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in self.ordering
+        ]
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position))
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = (
+            [getattr(rows[-1], name) for name, _ in self.fields] if self.has_next else None
+        )
+        return rows
+
+    def seek_filter(self, position):
+        # (a, b, c) after (x, y, z) == a > x OR (a = x AND b > y) OR ...
+        condition = Q()
+        for index, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending else 'gt'
+            branch = Q(**{f'{name}__{lookup}': position[index]})
+            for prev_index, (prev_name, _) in enumerate(self.fields[:index]):
+                branch &= Q(**{prev_name: position[prev_index]})
+            condition |= branch
+        return condition
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, position):
+        # DjangoJSONEncoder truncates datetimes to milliseconds, which would
+        # skip rows that share the same millisecond, so keep full precision.
+        position = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        payload = json.dumps(position, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            values = json.loads(urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ProductKeysetPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class OrderKeysetPagination(KeysetPagination):
+    ordering = ('-ordered_at', '-id')
+    page_size = 20
+    max_page_size = 100
+
+
+class CommentKeysetPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    max_page_size = 100
+
+
+class AnalyticsKeysetPagination(KeysetPagination):
+    """Newest day first; views set the second column to the rollup's key."""
+    ordering = ('-day', '-id')
+    page_size = 100
+    max_page_size = 1000
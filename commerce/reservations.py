@@ -0,0 +1,234 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
+
+from commerce.cache import invalidate_carts
+from commerce.checkout import InsufficientStock
+from commerce.models import Cart, Product
+
+DEFAULT_HOLD_SECONDS = 15 * 60
+SWEEP_BATCH_SIZE = 500
+
+
+class _Renewed(Exception):
+    """A line in the batch was held again while it was being released."""
+
+
+def hold_seconds():
+    return getattr(settings, 'CART_HOLD_SECONDS', DEFAULT_HOLD_SECONDS)
+
+
+def adjust_reserved(deltas):
+    """Add ``{product_id: delta}`` to Product.reserved with one UPDATE."""
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if deltas:
+        Product.objects.filter(id__in=deltas).update(reserved=Case(
+            *[When(id=product_id, then=F('reserved') + delta) for product_id, delta in deltas.items()],
+            default=F('reserved'),
+        ))
+
+
+def available(product_id):
+    return Product.objects.filter(pk=product_id).values_list(F('count') - F('reserved'), flat=True).first() or 0
+
+
+def hold(user, product, quantity):
+    """
+    Set the user's cart line for ``product`` to ``quantity`` units and hold them for CART_HOLD_SECONDS.
+
+    Only the difference from the line's current hold touches Product.reserved,
+    through a conditional UPDATE that matches no row rather than reserving
+    more than is in stock, so concurrent adders never need to read the count
+    first. Raises InsufficientStock with the units this line could hold.
+    """
+    try:
+        return _hold(user, product, quantity)
+    except IntegrityError:
+        # A concurrent first add inserted the line after this one found none;
+        # its reservation was rolled back, and the retry locks that line.
+        return _hold(user, product, quantity)
+
+
+def _hold(user, product, quantity):
+    with transaction.atomic():
+        line = Cart.objects.select_for_update().filter(user_id=user.pk, product=product).first()
+        held = line.reserved if line else 0
+        delta = quantity - held
+        if delta > 0:
+            grabbed = Product.objects.filter(pk=product.pk, count__gte=F('reserved') + delta).update(
+                reserved=F('reserved') + delta,
+            )
+            if not grabbed:
+                raise InsufficientStock({product.pk: max(available(product.pk) + held, 0)})
+        elif delta < 0:
+            adjust_reserved({product.pk: delta})
+
+        if line is None:
+            line = Cart(user_id=user.pk)
+        line.product = product
+        line.quantity = line.reserved = quantity
+        line.reserved_until = timezone.now() + timedelta(seconds=hold_seconds())
+        line.save()
+        invalidate_carts([user.pk])
+    return line
+
+
+def apply(user, operations):
+    """
+    Apply a batch of cart line ``operations`` for ``user`` in one transaction.
+
+    Each operation is ``{'action': 'add' | 'set' | 'remove', 'product_id', 'quantity'}``;
+    operations on the same product fold in order. Products and the user's
+    lines are read with one query each, every hold changes in one guarded
+    UPDATE, and the lines are written with one DELETE and one upsert, so the
+    cost doesn't grow with the batch. Returns ``{index: error}`` for the
+    operations that couldn't be applied; the rest are.
+    """
+    product_ids = list(dict.fromkeys(operation['product_id'] for operation in operations))
+    errors = {}
+    with transaction.atomic():
+        # Locked in id order, like checkout, so concurrent batches can't deadlock.
+        products = Product.objects.select_for_update().order_by('id') \
+            .only('id', 'price', 'count', 'reserved').in_bulk(product_ids)
+        lines, held = {}, {}
+        for product_id, quantity, reserved in Cart.objects.select_for_update().filter(
+            user_id=user.pk, product_id__in=products,
+        ).values_list('product_id', 'quantity', 'reserved'):
+            lines[product_id], held[product_id] = quantity, reserved
+
+        targets, last_index = {}, {}
+        for index, operation in enumerate(operations):
+            product_id = operation['product_id']
+            if product_id not in products:
+                errors[index] = {'detail': 'Product not found.'}
+                continue
+            current = targets.get(product_id, lines.get(product_id, 0))
+            if operation['action'] == 'remove':
+                targets[product_id] = 0
+            elif operation['action'] == 'add':
+                targets[product_id] = current + operation['quantity']
+            else:
+                targets[product_id] = operation['quantity']
+            last_index[product_id] = index
+
+        deltas, guarded = {}, Q()
+        for product_id, quantity in targets.items():
+            product, own = products[product_id], held.get(product_id, 0)
+            if quantity > product.count - product.reserved + own:
+                errors[last_index[product_id]] = {
+                    'detail': 'Not enough stock to hold this quantity.',
+                    'available': max(product.count - product.reserved + own, 0),
+                }
+                continue
+            delta = quantity - own
+            if delta:
+                deltas[product_id] = delta
+                guarded |= Q(id=product_id, count__gte=F('reserved') + delta) if delta > 0 else Q(id=product_id)
+        for product_id in [product_id for product_id in targets if last_index[product_id] in errors]:
+            del targets[product_id]
+
+        if deltas:
+            # Holds were checked against locked rows; the WHERE re-checks them
+            # for backends without row locks.
+            updated = Product.objects.filter(guarded).update(reserved=Case(
+                *[When(id=product_id, then=F('reserved') + delta) for product_id, delta in deltas.items()],
+                default=F('reserved'),
+            ))
+            if updated != len(deltas):
+                raise InsufficientStock({
+                    product_id: count - reserved + held.get(product_id, 0) for product_id, count, reserved in
+                    Product.objects.filter(id__in=deltas).values_list('id', 'count', 'reserved')
+                })
+
+        removed = [product_id for product_id, quantity in targets.items() if not quantity and product_id in lines]
+        if removed:
+            Cart.objects.filter(user_id=user.pk, product_id__in=removed).delete()
+        until = timezone.now() + timedelta(seconds=hold_seconds())
+        kept = [
+            Cart(user_id=user.pk, product_id=product_id, quantity=quantity,
+                 price=products[product_id].price * quantity, reserved=quantity, reserved_until=until)
+            for product_id, quantity in targets.items() if quantity
+        ]
+        if kept:
+            # Prices come from the products read above, so Cart.save() isn't needed.
+            Cart.objects.bulk_create(
+                kept, update_conflicts=True, unique_fields=['user', 'product'],
+                update_fields=['quantity', 'price', 'reserved', 'reserved_until', 'updated_at'],
+            )
+        if removed or kept:
+            invalidate_carts([user.pk])
+    return errors
+
+
+def _returned(lines):
+    deltas = {}
+    for _, product_id, reserved in lines:
+        deltas[product_id] = deltas.get(product_id, 0) - reserved
+    return deltas
+
+
+def release_lines(queryset):
+    """Return the holds of the cart lines in ``queryset`` to stock, e.g. before deleting them."""
+    with transaction.atomic():
+        lines = list(queryset.select_for_update().filter(reserved__gt=0).values_list('id', 'product_id', 'reserved'))
+        if not lines:
+            return
+        Cart.objects.filter(pk__in=[line_id for line_id, _, _ in lines]).update(
+            reserved=0, reserved_until=None, updated_at=Now(),
+        )
+        adjust_reserved(_returned(lines))
+
+
+def _release_batch(now, batch_size):
+    with transaction.atomic():
+        lines = list(
+            Cart.objects.select_for_update()
+            .filter(reserved__gt=0, reserved_until__lt=now)
+            .order_by('reserved_until', 'id')
+            .values_list('id', 'product_id', 'reserved')[:batch_size]
+        )
+        if not lines:
+            return 0
+        # Re-checks the expiry: a line held again since it was read keeps its
+        # hold. updated_at moves with reserved_until, which the cart's ETag covers.
+        released = Cart.objects.filter(
+            pk__in=[line_id for line_id, _, _ in lines], reserved__gt=0, reserved_until__lt=now,
+        ).update(reserved=0, reserved_until=None, updated_at=Now())
+        if released != len(lines):
+            raise _Renewed()
+        adjust_reserved(_returned(lines))
+    return len(lines)
+
+
+def release_expired(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Return holds that expired before ``now`` to stock, ``batch_size`` lines per transaction.
+
+    Each batch is read off the partial (reserved_until, id) index and costs
+    three statements however many products it spans. Returns the number of
+    lines released.
+    """
+    now = now or timezone.now()
+    total = 0
+    while True:
+        try:
+            released = _release_batch(now, batch_size)
+        except _Renewed:
+            continue
+        total += released
+        if released < batch_size:
+            return total
+
+
+def recount():
+    """Recompute every product's reserved units from its cart lines in one UPDATE."""
+    held = (
+        Cart.objects.filter(product_id=OuterRef('pk'))
+        .order_by().values('product_id').annotate(total=Sum('reserved')).values('total')
+    )
+    with transaction.atomic():
+        Product.objects.update(reserved=Coalesce(Subquery(held), Value(0)))
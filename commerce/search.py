@@ -0,0 +1,158 @@
+import re
+
+from django.db import connection, transaction
+
+FTS_TABLE = 'commerce_product_fts'
+SEARCH_TABLE = 'commerce_product_search'
+
+# Column weights: name, description, subcategory name, category name.
+SQLITE_WEIGHTS = (10.0, 1.0, 4.0, 2.0)
+
+SOURCE_SQL = (
+    'FROM commerce_product p '
+    'JOIN commerce_subcategory s ON s.id = p.category_id '
+    'JOIN commerce_category c ON c.id = s.category_id'
+)
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('english', p.name), 'A') || "
+    "setweight(to_tsvector('english', s.name), 'B') || "
+    "setweight(to_tsvector('english', c.name), 'C') || "
+    "setweight(to_tsvector('english', p.description), 'D')"
+)
+
+
+def is_supported(conn=None):
+    return (conn or connection).vendor in ('sqlite', 'postgresql')
+
+
+def create_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            'name, description, subcategory, category, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+            'product_id bigint PRIMARY KEY REFERENCES commerce_product (id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_gin ON {SEARCH_TABLE} USING GIN (document)'
+        )
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+def _reindex(where='', params=(), conn=None):
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+    where = f' WHERE {where}' if where else ''
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT p.id {SOURCE_SQL}{where})', params
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description, subcategory, category) '
+                f'SELECT p.id, p.name, p.description, s.name, c.name {SOURCE_SQL}{where}', params
+            )
+        else:
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (product_id, document) '
+                f'SELECT p.id, {POSTGRES_DOCUMENT} {SOURCE_SQL}{where} '
+                'ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document', params
+            )
+
+
+def index_products(product_ids):
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), 500):
+        chunk = product_ids[start:start + 500]
+        _reindex(f"p.id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def index_subcategory(subcategory_id):
+    _reindex('p.category_id = %s', [subcategory_id])
+
+
+def index_category(category_id):
+    _reindex('s.category_id = %s', [category_id])
+
+
+def remove_products(product_ids):
+    if connection.vendor != 'sqlite':
+        # Postgres rows go away with the product through ON DELETE CASCADE.
+        return
+    product_ids = list(product_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(product_ids), 500):
+            chunk = product_ids[start:start + 500]
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def rebuild(conn=None):
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE if conn.vendor == "sqlite" else SEARCH_TABLE}')
+        _reindex(conn=conn)
+
+
+def _fts5_query(text):
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return None
+    # Quote every term so user input can't inject FTS5 syntax; prefix-match the
+    # last one so results show up while the user is still typing.
+    return ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+
+
+def search(text, limit=20):
+    """Return [(product_id, score)] best match first; higher score is better."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            query = _fts5_query(text)
+            if query is None:
+                return []
+            weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+            cursor.execute(
+                f'SELECT rowid, -bm25({FTS_TABLE}, {weights}) AS score FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+                [query, limit],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"SELECT product_id, ts_rank_cd(document, query, 32) AS score "
+                f"FROM {SEARCH_TABLE}, websearch_to_tsquery('english', %s) query "
+                'WHERE document @@ query ORDER BY score DESC LIMIT %s',
+                [text, limit],
+            )
+        else:
+            return scan(text, limit)
+        return cursor.fetchall()
+
+
+def scan(text, limit=20):
+    """Unindexed icontains fallback, also used as the benchmark baseline."""
+    from django.db.models import Q
+
+    from commerce.models import Product
+
+    condition = Q()
+    for term in re.findall(r'\w+', text):
+        condition &= (
+            Q(name__icontains=term) | Q(description__icontains=term)
+            | Q(category__name__icontains=term) | Q(category__category__name__icontains=term)
+        )
+    return [(pk, 0) for pk in Product.objects.filter(condition).values_list('pk', flat=True)[:limit]]
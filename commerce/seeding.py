@@ -0,0 +1,151 @@
+import random
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from commerce import analytics, facets, listings, search, sellers
+from commerce.comments import rebuild_counts as rebuild_comment_counts
+from commerce.models import Cart, Category, Comment, Order, OrderItem, Product, ProductImage, SubCategory
+from users.models import User
+
+WORDS = (
+    'wireless', 'leather', 'steel', 'organic', 'cotton', 'smart', 'portable', 'vintage', 'compact', 'ultra',
+    'classic', 'premium', 'eco', 'ergonomic', 'waterproof', 'bluetooth', 'ceramic', 'bamboo', 'carbon', 'silk',
+    'phone', 'case', 'charger', 'lamp', 'chair', 'desk', 'bottle', 'jacket', 'sneaker', 'watch', 'backpack',
+    'speaker', 'headphones', 'mug', 'blender', 'kettle', 'pillow', 'blanket', 'camera', 'tripod', 'keyboard',
+)
+CATEGORY_NAMES = (
+    'Electronics', 'Home', 'Kitchen', 'Fashion', 'Sports', 'Books', 'Toys', 'Garden', 'Beauty', 'Automotive',
+    'Health', 'Office', 'Music', 'Outdoors', 'Pets', 'Baby', 'Grocery', 'Tools', 'Jewelry', 'Games',
+)
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(users=100, categories=10, subcategories=5, products=10_000, comments=2, images=1, cart_lines=3, orders=2,
+         batch_size=5000, random_seed=0, log=None):
+    """
+    Bulk-generate a synthetic catalog.
+
+    ``products`` is the total product count; ``subcategories`` is per category;
+    ``comments`` and ``images`` are per product; ``cart_lines`` and ``orders`` are per user.
+    Everything is written with bulk_create, after which the search index,
+    facet counts, comment counts, product listing, seller counters and
+    analytics rollups are rebuilt once.
+    """
+    rng = random.Random(random_seed)
+    tag = uuid.uuid4().hex[:6]
+    log = log or (lambda message: None)
+    password = make_password(None)
+
+    with transaction.atomic():
+        user_ids = [
+            user.pk for batch in _batches(
+                (User(username=f'seed-{tag}-{i}', email=f'seed-{tag}-{i}@seed.local', password=password)
+                 for i in range(users)), batch_size)
+            for user in User.objects.bulk_create(batch)
+        ]
+        log(f"{len(user_ids)} users")
+
+        category_objects = Category.objects.bulk_create([
+            Category(name=f'{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]} {tag}-{i}') for i in range(categories)
+        ])
+        subcategory_ids = [sub.pk for sub in SubCategory.objects.bulk_create([
+            SubCategory(name=f'{category.name.split()[0]} {rng.choice(WORDS)} {j}', category=category)
+            for category in category_objects for j in range(subcategories)
+        ])]
+        log(f"{len(category_objects)} categories, {len(subcategory_ids)} subcategories")
+
+        def product_rows():
+            for i in range(products):
+                name = ' '.join(rng.sample(WORDS, 3))
+                yield Product(
+                    name=f'{name} {i}'[:50],
+                    description=' '.join(rng.choices(WORDS, k=rng.randint(8, 30))),
+                    price=rng.randint(1, 8000),
+                    count=rng.choice((0, 0, 1, 5, 10, 50, 200)),
+                    category_id=rng.choice(subcategory_ids),
+                    user_id=rng.choice(user_ids),
+                )
+
+        product_ids = []
+        for batch in _batches(product_rows(), batch_size):
+            product_ids.extend(product.pk for product in Product.objects.bulk_create(batch))
+            log(f"{len(product_ids)} products")
+
+        prices, owners = {}, {}
+        for product_id, price, user_id in Product.objects.filter(pk__in=product_ids[:50_000]).values_list(
+            'pk', 'price', 'user_id',
+        ):
+            prices[product_id], owners[product_id] = price, user_id
+        hot_products = list(prices)
+
+        def comment_rows():
+            for product_id in product_ids:
+                for _ in range(rng.randint(0, comments * 2)):
+                    yield Comment(text=' '.join(rng.choices(WORDS, k=6)), product_id=product_id,
+                                  user_id=rng.choice(user_ids))
+
+        comment_count = 0
+        for batch in _batches(comment_rows(), batch_size):
+            comment_count += len(Comment.objects.bulk_create(batch))
+        log(f"{comment_count} comments")
+
+        # Image rows only; the file names point at nothing in storage.
+        image_count = 0
+        for batch in _batches(
+                (ProductImage(image=f'products/seed-{product_id}-{n}.jpg', product_id=product_id)
+                 for product_id in product_ids for n in range(rng.randint(0, images * 2))), batch_size):
+            image_count += len(ProductImage.objects.bulk_create(batch))
+        log(f"{image_count} images")
+
+        carts = []
+        for user_id in user_ids:
+            for product_id in rng.sample(hot_products, min(cart_lines, len(hot_products))):
+                quantity = rng.randint(1, 3)
+                carts.append(Cart(user_id=user_id, product_id=product_id, quantity=quantity,
+                                  price=prices[product_id] * quantity))
+        for batch in _batches(carts, batch_size):
+            Cart.objects.bulk_create(batch)
+        log(f"{len(carts)} cart lines")
+
+        order_count = 0
+        for batch in _batches(
+                (Order(user_id=user_id, total_price=0, payment_method=rng.choice(('card', 'cash')),
+                       user_location='Seed street', status=rng.choice(('pending', 'delivering', 'delivered')))
+                 for user_id in user_ids for _ in range(orders)), batch_size):
+            items = []
+            for order in Order.objects.bulk_create(batch):
+                for product_id in rng.sample(hot_products, min(rng.randint(1, 4), len(hot_products))):
+                    quantity = rng.randint(1, 3)
+                    items.append(OrderItem(order_id=order.pk, product_id=product_id, seller_id=owners[product_id],
+                                           product_name='seeded', unit_price=prices[product_id], quantity=quantity,
+                                           price=prices[product_id] * quantity))
+                    order.total_price += prices[product_id] * quantity
+            OrderItem.objects.bulk_create(items)
+            Order.objects.bulk_update(batch, ['total_price'])
+            order_count += len(batch)
+        log(f"{order_count} orders")
+
+    search.rebuild()
+    facets.rebuild()
+    rebuild_comment_counts()
+    listings.rebuild()
+    sellers.rebuild()
+    analytics.rebuild(settle=0)
+    analytics.snapshot_inventory()
+    log("search index, facet, comment and seller counts, product listing and analytics rollups rebuilt")
+    return {
+        'users': len(user_ids), 'categories': len(category_objects), 'subcategories': len(subcategory_ids),
+        'products': len(product_ids), 'comments': comment_count, 'images': image_count, 'cart_lines': len(carts), 'orders': order_count,
+    }
@@ -0,0 +1,143 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Now
+
+DEFAULT_LOW_STOCK_THRESHOLD = 5
+# Low-stock products listed on the dashboard, fewest units first.
+LOW_STOCK_SHOWN = 20
+COUNTERS = ('products', 'units', 'low_stock', 'comments', 'orders', 'units_sold', 'revenue')
+
+
+def low_stock_threshold():
+    return getattr(settings, 'SELLER_LOW_STOCK_THRESHOLD', DEFAULT_LOW_STOCK_THRESHOLD)
+
+
+def stock_counters(count):
+    """What one product with ``count`` units adds to its seller's counters."""
+    return Counter(products=1, units=count, low_stock=int(count <= low_stock_threshold()))
+
+
+def apply_deltas(deltas):
+    """Add ``{seller_id: {counter: delta}}`` to the sellers' counters with one UPDATE."""
+    from commerce.models import SellerStats
+
+    deltas = {
+        seller_id: {field: delta for field, delta in counters.items() if delta}
+        for seller_id, counters in deltas.items()
+    }
+    deltas = {seller_id: counters for seller_id, counters in deltas.items() if counters}
+    if not deltas:
+        return
+    # Only increments create rows, as with facets: during a cascade delete the
+    # seller may already be gone.
+    SellerStats.objects.bulk_create([
+        SellerStats(seller_id=seller_id) for seller_id, counters in deltas.items()
+        if any(delta > 0 for delta in counters.values())
+    ], ignore_conflicts=True)
+    fields = {field for counters in deltas.values() for field in counters}
+    SellerStats.objects.filter(seller_id__in=deltas).update(updated_at=Now(), **{
+        field: Case(
+            *[When(seller_id=seller_id, then=F(field) + counters[field])
+              for seller_id, counters in deltas.items() if field in counters],
+            default=F(field),
+            output_field=SellerStats._meta.get_field(field),
+        )
+        for field in fields
+    })
+
+
+def move(old, new):
+    """Move one product's stock counters; ``old`` and ``new`` are ``(seller_id, count)`` or None."""
+    deltas = defaultdict(Counter)
+    if old:
+        deltas[old[0]].subtract(stock_counters(old[1]))
+    if new:
+        deltas[new[0]].update(stock_counters(new[1]))
+    apply_deltas(deltas)
+
+
+def count_comments(deltas):
+    """Add ``{product_id: delta}`` comments to the products' sellers."""
+    from commerce.models import Product
+
+    counts = defaultdict(Counter)
+    for product_id, seller_id in Product.objects.filter(
+        pk__in=[product_id for product_id, delta in deltas.items() if delta],
+    ).values_list('id', 'user_id'):
+        counts[seller_id]['comments'] += deltas[product_id]
+    apply_deltas(counts)
+
+
+def remove_sales(items):
+    """Take the order items in ``items`` off their sellers' sales counters, e.g. before deleting them."""
+    deltas = {
+        row['seller_id']: {'orders': -row['orders'], 'units_sold': -row['units_sold'], 'revenue': -row['revenue']}
+        for row in items.filter(seller__isnull=False).order_by().values('seller_id').annotate(
+            orders=Count('order_id', distinct=True), units_sold=Sum('quantity'), revenue=Sum('price'),
+        )
+    }
+    apply_deltas(deltas)
+
+
+def recount(seller_ids=None, product_model=None, comment_model=None, item_model=None):
+    """``{seller_id: {counter: value}}`` recomputed with one GROUP BY each over products, comments and order items."""
+    if product_model is None:
+        from commerce.models import Product as product_model
+    if comment_model is None:
+        from commerce.models import Comment as comment_model
+    if item_model is None:
+        from commerce.models import OrderItem as item_model
+
+    def scoped(queryset, field):
+        return queryset.filter(**{f'{field}__in': seller_ids}) if seller_ids is not None else queryset
+
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for row in scoped(product_model.objects.order_by(), 'user_id').values('user_id').annotate(
+        products=Count('id'),
+        units=Coalesce(Sum('count'), Value(0)),
+        low_stock=Count('id', filter=Q(count__lte=low_stock_threshold())),
+    ):
+        totals[row.pop('user_id')].update(row)
+    for row in scoped(comment_model.objects.order_by(), 'product__user_id').values('product__user_id').annotate(
+        comments=Count('id'),
+    ):
+        totals[row.pop('product__user_id')].update(row)
+    for row in scoped(item_model.objects.filter(seller__isnull=False).order_by(), 'seller_id').values(
+        'seller_id',
+    ).annotate(orders=Count('order_id', distinct=True), units_sold=Sum('quantity'), revenue=Sum('price')):
+        totals[row.pop('seller_id')].update(row)
+    return totals
+
+
+def diff():
+    """Yield ``(seller_id, counter, stored, actual)`` for every counter that drifted from the source tables."""
+    from commerce.models import SellerStats
+
+    actual = recount()
+    stored = {row.pop('seller_id'): row for row in SellerStats.objects.values('seller_id', *COUNTERS)}
+    for seller_id in sorted(actual.keys() | stored.keys()):
+        now, then = actual.get(seller_id), stored.get(seller_id)
+        for field in COUNTERS:
+            expected = now[field] if now else 0
+            current = then[field] if then else 0
+            if expected != current:
+                yield seller_id, field, current, expected
+
+
+def rebuild(seller_ids=None, product_model=None, comment_model=None, item_model=None, stats_model=None):
+    """Rewrite the counters of ``seller_ids`` (every seller by default) from the source tables."""
+    if stats_model is None:
+        from commerce.models import SellerStats as stats_model
+
+    with transaction.atomic():
+        totals = recount(seller_ids, product_model, comment_model, item_model)
+        stale = stats_model.objects.all()
+        if seller_ids is not None:
+            stale = stale.filter(seller_id__in=seller_ids)
+        stale.delete()
+        stats_model.objects.bulk_create([
+            stats_model(seller_id=seller_id, **counters) for seller_id, counters in totals.items()
+        ], batch_size=1000)
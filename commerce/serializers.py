@@ -1,6 +1,12 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
-from commerce.models import Product, Cart, Order, Comment
+from commerce import analytics, reservations
+from commerce.facets import price_bands
+from commerce.importer import DEFAULT_BATCH_SIZE
+from commerce.models import Product, ProductImage, ProductListing, Cart, Order, OrderItem, Comment, InventorySnapshot, \
+    SellerStats, parse_pk
+from root import images
 
 
 class CreateProductsSerializers(serializers.ModelSerializer):
@@ -9,14 +15,52 @@ class CreateProductsSerializers(serializers.ModelSerializer):
         fields = ('name', 'description', 'price', 'count', 'category')
 
 
+class BulkImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv', 'ndjson'], required=False)
+    batch_size = serializers.IntegerField(min_value=1, max_value=10000, default=DEFAULT_BATCH_SIZE)
+
+
 class GetProductsSerializers(serializers.ModelSerializer):
     user_username = serializers.CharField(source='user.username')
     category_name = serializers.CharField(source='category.name')
     class Meta:
         model = Product
-        fields = ('name', 'description', 'price', 'count', 'category_name', 'user_username')
+        fields = ('name', 'description', 'price', 'count', 'comment_count', 'category_name', 'user_username')
+
+
+class ProductListingSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='subcategory_name')
+    image = serializers.SerializerMethodField()
+    class Meta:
+        model = ProductListing
+        fields = ('id', 'name', 'description', 'price', 'count', 'comment_count', 'category_name', 'user_username',
+                  'image')
+
+    def get_image(self, obj) -> dict | None:
+        if not obj.image:
+            return None
+        return {'url': default_storage.url(obj.image), 'srcset': images.srcset(obj.image_variants)}
+
+
+class ProductFilterSerializer(serializers.Serializer):
+    category = serializers.IntegerField(required=False)
+    subcategory = serializers.IntegerField(required=False)
+    price_band = serializers.IntegerField(required=False, min_value=0)
+    in_stock = serializers.BooleanField(allow_null=True, default=None)
+
+    def validate_price_band(self, value):
+        if value >= len(price_bands()):
+            raise serializers.ValidationError("Unknown price band.")
+        return value
 
 
+class SearchProductsSerializer(GetProductsSerializers):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(GetProductsSerializers.Meta):
+        fields = ('id', ) + GetProductsSerializers.Meta.fields + ('score', )
+
 
 class AddCartItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -29,6 +73,9 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ('product_id','product_name','quantity', 'price', 'user')
         read_only_fields = ['price']
+        # Adding a product already in the cart sets its quantity (and hold)
+        # instead of failing the (user, product) unique check.
+        validators = []
 
     def validate_quantity(self, value):
         if value < 1:
@@ -41,36 +88,84 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        user = validated_data['user']
-        product = validated_data['product']
-        quantity = validated_data['quantity']
-        price = validated_data['price']
+        # Raises InsufficientStock when the units can't be held.
+        return reservations.hold(validated_data['user'], validated_data['product'], validated_data['quantity'])
+
+class CartOperationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=('add', 'set', 'remove'), default='set')
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs['action'] != 'remove' and 'quantity' not in attrs:
+            raise serializers.ValidationError({'quantity': "Required to add or set a line."})
+        return attrs
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
 
-        cart, created = Cart.objects.update_or_create(
-            user=user, product=product,
-            defaults={'quantity': quantity, 'price': price}
-        )
-        return cart
+class CartSummarySerializer(serializers.Serializer):
+    lines = serializers.IntegerField()
+    items = serializers.IntegerField()
+    subtotal = serializers.IntegerField()
 
 class GetCartSerializer(serializers.ModelSerializer):
     user = serializers.CharField(source='user.username', read_only=True)
     product = serializers.CharField(source='product.name', read_only=True)
     class Meta:
         model = Cart
-        fields = ('added_at','product', 'quantity', 'price', 'user')
+        fields = ('added_at','product', 'quantity', 'price', 'user', 'reserved_until')
+
+class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductImage
+        fields = ('id', 'image', 'srcset')
+
+    def get_srcset(self, obj) -> dict:
+        return images.srcset(obj.variants)
+
+class ProductImageUploadSerializer(serializers.Serializer):
+    image = serializers.ImageField()
 
 class ProductSerializer(serializers.ModelSerializer):
+    images = ProductImageSerializer(many=True, read_only=True)
+
     class Meta:
         model = Product
-        fields = ('name', 'description', 'price', 'count', 'category')
+        fields = ('name', 'description', 'price', 'count', 'category', 'images')
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ('product_id', 'product_name', 'unit_price', 'quantity', 'price')
 
 
 class OrdersSerializer(serializers.ModelSerializer):
-    user = serializers.CharField(source='user.username', read_only=True)
-    product = serializers.CharField(source='product.name', read_only=True)
+    items = OrderItemSerializer(many=True, read_only=True)
     class Meta:
-        model = Cart
-        fields = ('added_at','product', 'quantity', 'price', 'user')
+        model = Order
+        fields = ('id', 'ordered_at', 'status', 'payment_method', 'user_location', 'total_price', 'items')
+
+
+class OrderStatusBatchSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=10_000,
+    )
+    status = serializers.ChoiceField(choices=Order._meta.get_field('status').choices)
+
+
+class OrderFilterSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Order._meta.get_field('status').choices, required=False)
+    since = serializers.DateTimeField(required=False, help_text='Orders placed at or after this time')
+    until = serializers.DateTimeField(required=False, help_text='Orders placed before this time')
+
+    def validate(self, attrs):
+        if 'since' in attrs and 'until' in attrs and attrs['since'] >= attrs['until']:
+            raise serializers.ValidationError({'until': "Must be later than since."})
+        return attrs
 
 
 class OrderUserInfoSerializer(serializers.ModelSerializer):
@@ -89,7 +184,116 @@ class CommentSerializer(serializers.ModelSerializer):
 class PostCommentsSerializer(serializers.Serializer):
     id = serializers.IntegerField()
 
+class ProductIdsSerializer(serializers.Serializer):
+    ids = serializers.CharField(help_text='Comma-separated product IDs')
+
+    def validate_ids(self, value):
+        ids = list(dict.fromkeys(parse_pk(part) for part in value.split(',') if part.strip()))
+        if None in ids:
+            raise serializers.ValidationError("Product IDs must be positive integers.")
+        if not ids:
+            raise serializers.ValidationError("At least one product ID is required.")
+        if len(ids) > 100:
+            raise serializers.ValidationError("At most 100 product IDs per request.")
+        return ids
+
+class CommentsBatchSerializer(ProductIdsSerializer):
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=5)
+
+class ProductCommentsSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    comment_count = serializers.IntegerField()
+    comments = CommentSerializer(many=True)
+
+class ProductStockSerializer(serializers.ModelSerializer):
+    available = serializers.IntegerField()
+    class Meta:
+        model = Product
+        fields = ('id', 'count', 'reserved', 'available')
+
 class UpdateProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ('name', 'description', 'price', 'count', 'category')
\ No newline at end of file
+        fields = ('name', 'description', 'price', 'count', 'category')
+
+
+class AnalyticsRangeSerializer(serializers.Serializer):
+    since = serializers.DateField(required=False, help_text='First day to report, inclusive')
+    until = serializers.DateField(required=False, help_text='Last day to report, inclusive')
+
+    def validate(self, attrs):
+        if 'since' in attrs and 'until' in attrs and attrs['since'] > attrs['until']:
+            raise serializers.ValidationError({'until': "Must not be earlier than since."})
+        return attrs
+
+
+class SalesFilterSerializer(AnalyticsRangeSerializer):
+    by = serializers.ChoiceField(choices=list(analytics.ROLLUPS), default='product')
+    id = serializers.IntegerField(min_value=1, required=False, help_text='Only this product, subcategory or seller')
+
+
+class TopSalesFilterSerializer(AnalyticsRangeSerializer):
+    by = serializers.ChoiceField(choices=list(analytics.ROLLUPS), default='product')
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class InventoryFilterSerializer(AnalyticsRangeSerializer):
+    subcategory = serializers.IntegerField(min_value=1, required=False)
+
+
+class DailySalesSerializer(serializers.Serializer):
+    day = serializers.DateField()
+    id = serializers.SerializerMethodField()
+    orders = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.IntegerField()
+
+    def get_id(self, obj) -> int:
+        return getattr(obj, self.context['key'])
+
+
+class SalesTotalSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='key')
+    orders = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.IntegerField()
+
+
+class InventorySnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = InventorySnapshot
+        fields = ('day', 'subcategory_id', 'products', 'products_in_stock', 'units', 'reserved')
+
+
+class LowStockProductSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+    reserved = serializers.IntegerField()
+
+
+class SellerDashboardSerializer(serializers.ModelSerializer):
+    low_stock_threshold = serializers.IntegerField()
+    low_stock_products = LowStockProductSerializer(many=True)
+
+    class Meta:
+        model = SellerStats
+        fields = ('products', 'units', 'low_stock', 'low_stock_threshold', 'low_stock_products', 'comments',
+                  'orders', 'units_sold', 'revenue', 'updated_at')
+
+
+class SubCategoryNodeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    product_count = serializers.IntegerField()
+    in_stock_count = serializers.IntegerField()
+
+
+class CategoryTreeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    product_count = serializers.SerializerMethodField()
+    subcategories = SubCategoryNodeSerializer(many=True)
+
+    def get_product_count(self, obj) -> int:
+        return sum(subcategory.product_count for subcategory in obj.subcategories.all())
@@ -0,0 +1,184 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from commerce import comments, facets, instrumentation, listings, reservations, search, sellers
+from commerce.cache import invalidate_carts, invalidate_category_tree, invalidate_products
+from commerce.models import Cart, Category, Comment, Order, OrderItem, Product, ProductImage, SubCategory
+from root import images
+from users.models import User
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    invalidate_products([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_product_relation(sender, instance, **kwargs):
+    invalidate_products([instance.product_id])
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        comments.adjust_counts({instance.product_id: 1})
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, origin=None, **kwargs):
+    if not comments.deleted_with_parent(origin):
+        comments.adjust_counts({instance.product_id: -1})
+
+
+@receiver(pre_delete, sender=Product)
+def uncount_product_comments(sender, instance, origin=None, **kwargs):
+    # Under a user cascade the seller's counters are deleted with the seller.
+    if comments.deleted_with(origin, Product):
+        comments.uncount_deleted_product(instance)
+
+
+@receiver(pre_delete, sender=User)
+def uncount_user_comments(sender, instance, **kwargs):
+    comments.uncount_deleted_user(instance)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=SubCategory)
+def invalidate_categories(sender, instance, **kwargs):
+    # Product writes reach the tree through the facet counts it is built from.
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=SubCategory)
+def reindex_subcategory(sender, instance, created, **kwargs):
+    if not created:
+        search.index_subcategory(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, **kwargs):
+    if not created:
+        search.index_category(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def refresh_listing(sender, instance, **kwargs):
+    listings.refresh([instance.pk if sender is Product else instance.product_id])
+
+
+@receiver(post_delete, sender=Product)
+def remove_listing(sender, instance, **kwargs):
+    listings.remove([instance.pk])
+
+
+@receiver(post_save, sender=SubCategory)
+def rename_listing_subcategory(sender, instance, created, **kwargs):
+    if not created:
+        listings.rename_subcategory(instance)
+
+
+@receiver(post_save, sender=Category)
+def rename_listing_category(sender, instance, created, **kwargs):
+    if not created:
+        listings.rename_category(instance)
+
+
+@receiver(post_save, sender=User)
+def rename_listing_user(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or 'username' in update_fields):
+        listings.rename_user(instance)
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        # Product.save runs inside a transaction; locking the row until it
+        # commits stops a concurrent save of the same product from reading the
+        # same previous values and moving the counters twice.
+        previous = Product.objects.select_for_update().filter(pk=instance.pk).values_list(
+            'category_id', 'price', 'count', 'user_id',
+        ).first()
+    instance._previous_facet = facets.facet_key(*previous[:3]) if previous else None
+    instance._previous_stock = (previous[3], previous[2]) if previous else None
+
+
+@receiver(post_save, sender=Product)
+def update_facet(sender, instance, **kwargs):
+    new_key = facets.facet_key(instance.category_id, instance.price, instance.count)
+    facets.move(getattr(instance, '_previous_facet', None), new_key)
+
+
+@receiver(post_delete, sender=Product)
+def remove_facet(sender, instance, **kwargs):
+    facets.move(facets.facet_key(instance.category_id, instance.price, instance.count), None)
+
+
+@receiver(post_save, sender=Product)
+def count_seller_stock(sender, instance, **kwargs):
+    sellers.move(getattr(instance, '_previous_stock', None), (instance.user_id, instance.count))
+
+
+@receiver(post_delete, sender=Product)
+def uncount_seller_stock(sender, instance, **kwargs):
+    sellers.move((instance.user_id, instance.count), None)
+
+
+@receiver(pre_delete, sender=Order)
+def uncount_seller_sales(sender, instance, **kwargs):
+    # The cascade deletes the order's items without touching their sellers' counters.
+    sellers.remove_sales(OrderItem.objects.filter(order_id=instance.pk))
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrumentation.install(connection)
+
+
+@receiver(pre_save, sender=ProductImage)
+def clean_product_image(sender, instance, **kwargs):
+    if instance.image and not instance.image._committed:
+        if images.needs_cleaning(instance.image):
+            instance.image = images.clean_upload(instance.image)
+        instance.variants = {}
+        instance._build_variants = True
+
+
+@receiver(post_save, sender=ProductImage)
+def build_product_image_variants(sender, instance, **kwargs):
+    if getattr(instance, '_build_variants', False):
+        instance._build_variants = False
+        images.schedule_variants(
+            instance, 'image', 'variants', on_stored=lambda: stored_product_image(instance.product_id),
+        )
+
+
+def stored_product_image(product_id):
+    invalidate_products([product_id])
+    listings.refresh([product_id])
+
+
+@receiver(pre_delete, sender=User)
+def release_user_holds(sender, instance, **kwargs):
+    # The cascade deletes the user's cart lines without returning their holds.
+    reservations.release_lines(Cart.objects.filter(user_id=instance.pk))
+
+
+@receiver(pre_delete, sender=Product)
+def invalidate_product_carts(sender, instance, **kwargs):
+    # The cascade removes the product's cart lines without touching their summaries.
+    invalidate_carts(Cart.objects.filter(product_id=instance.pk).values_list('user_id', flat=True))
@@ -0,0 +1,852 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from commerce.benchmarks import api_client
+from commerce.checkout import checkout, InsufficientStock
+from commerce.models import Cart, Category, Comment, Product, ProductImage, SubCategory
+from users.models import User
+
+
+# Over-budget requests fail the tests instead of only being logged.
+_raise_over_budget = override_settings(QUERY_BUDGET_RAISE=True)
+
+
+def setUpModule():
+    _raise_over_budget.enable()
+
+
+def tearDownModule():
+    _raise_over_budget.disable()
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Buyers racing for the last units of one product must never oversell it."""
+    buyers = 30
+    stock = 10
+    workers = 8
+
+    def setUp(self):
+        seller = User.objects.create_user(username='stress-seller', email='seller@stress.local')
+        category = Category.objects.create(name='stress')
+        subcategory = SubCategory.objects.create(name='stress', category=category)
+        self.product = Product.objects.create(
+            name='stress', description='stress', price=100, count=self.stock, category=subcategory, user=seller,
+        )
+        self.users = User.objects.bulk_create([
+            User(username=f'stress-buyer-{i}', email=f'buyer-{i}@stress.local') for i in range(self.buyers)
+        ])
+        Cart.objects.bulk_create([
+            Cart(user=user, product=self.product, quantity=1, price=self.product.price) for user in self.users
+        ])
+
+    def test_hot_product_is_never_oversold(self):
+        barrier = threading.Barrier(self.workers)
+
+        def run(user):
+            try:
+                try:
+                    barrier.wait(timeout=5)
+                except threading.BrokenBarrierError:
+                    pass
+                checkout(user, payment_method='card', user_location='stress')
+                return 'ok'
+            except InsufficientStock:
+                return 'out_of_stock'
+            except Exception as e:
+                return f"{type(e).__name__}: {e}"
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            outcomes = list(pool.map(run, self.users))
+
+        self.product.refresh_from_db()
+        sold = self.product.order_items.aggregate(total=Sum('quantity'))['total'] or 0
+        self.assertEqual(sorted(set(outcomes)), ['ok', 'out_of_stock'])
+        self.assertEqual(outcomes.count('ok'), self.stock)
+        self.assertEqual(self.product.count, 0)
+        self.assertEqual(sold, self.stock)
+        # Buyers who missed out keep their cart line.
+        self.assertEqual(Cart.objects.filter(product=self.product).count(), self.buyers - self.stock)
+
+
+class ConcurrentProductSaveTests(TransactionTestCase):
+    """Sellers saving one product at once must move its facet and stock counters exactly once each."""
+    workers = 8
+
+    def setUp(self):
+        self.seller = User.objects.create_user(username='race-seller', email='seller@race.local')
+        subcategory = SubCategory.objects.create(name='race', category=Category.objects.create(name='race'))
+        self.product = Product.objects.create(
+            name='race', description='race', price=10, count=1, category=subcategory, user=self.seller,
+        )
+
+    def test_counters_follow_the_last_save(self):
+        from commerce import facets, sellers
+        from commerce.models import ProductFacet
+
+        barrier = threading.Barrier(self.workers)
+
+        def run(i):
+            try:
+                product = Product.objects.get(pk=self.product.pk)
+                product.price, product.count = (10, 0) if i % 2 else (700, 20 + i)
+                try:
+                    barrier.wait(timeout=5)
+                except threading.BrokenBarrierError:
+                    pass
+                product.save()
+                return 'ok'
+            except Exception as e:
+                return f"{type(e).__name__}: {e}"
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            outcomes = list(pool.map(run, range(self.workers)))
+
+        self.assertEqual(set(outcomes), {'ok'})
+        self.product.refresh_from_db()
+        self.assertEqual(
+            list(ProductFacet.objects.filter(count__gt=0).values_list('subcategory_id', 'price_band', 'in_stock')),
+            [facets.facet_key(self.product.category_id, self.product.price, self.product.count)],
+        )
+        self.assertEqual(ProductFacet.objects.filter(count__gt=0).get().count, 1)
+        self.assertFalse(ProductFacet.objects.filter(count__lt=0).exists())
+        self.assertEqual(list(sellers.diff()), [])
+
+
+class CatalogKeysetTests(TestCase):
+    """Walking the catalog by cursor sees every product once, in order, whatever is inserted meanwhile."""
+
+    def setUp(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from commerce import listings
+
+        self.seller = User.objects.create_user(username='keyset-seller', email='seller@keyset.local')
+        self.subcategory = SubCategory.objects.create(
+            name='keyset', category=Category.objects.create(name='keyset'),
+        )
+        products = [self.product(f'keyset-{i}') for i in range(7)]
+        # Four products share a timestamp, so only the id tells them apart.
+        start = timezone.now() - timedelta(days=1)
+        for i, product in enumerate(products):
+            Product.objects.filter(pk=product.pk).update(created_at=start - timedelta(seconds=max(i - 3, 0)))
+        listings.refresh([product.pk for product in products])
+        self.expected = list(
+            Product.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.client = api_client(self.seller)
+
+    def product(self, name):
+        return Product.objects.create(
+            name=name, description=name, price=10, count=1, category=self.subcategory, user=self.seller,
+        )
+
+    def test_cursor_is_stable_across_inserts(self):
+        response = self.client.get('/products/get/?page_size=3')
+        seen = [row['id'] for row in response.json()['results']]
+        pages = 1
+        while response.json()['next']:
+            # Newer products land ahead of the cursor and never shift the pages behind it.
+            self.product(f'keyset-new-{pages}')
+            with self.assertNumQueries(2):
+                response = self.client.get(response.json()['next'])
+            seen += [row['id'] for row in response.json()['results']]
+            pages += 1
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(pages, 3)
+
+    def test_tampered_cursor_is_rejected(self):
+        self.assertEqual(self.client.get('/products/get/?cursor=not-a-cursor').status_code, 404)
+        self.assertEqual(self.client.get('/products/get/?cursor=WzFd').status_code, 404)
+
+
+class ProductCacheTests(TransactionTestCase):
+    """Concurrent misses on one product fill the cache once; a write moves every reader to a fresh copy."""
+    workers = 8
+
+    def setUp(self):
+        from commerce import cache
+
+        cache.get_cache().clear()
+        seller = User.objects.create_user(username='cache-seller', email='seller@cache.local')
+        subcategory = SubCategory.objects.create(name='cache', category=Category.objects.create(name='cache'))
+        self.product = Product.objects.create(
+            name='cache', description='cache', price=10, count=1, category=subcategory, user=seller,
+        )
+
+    def test_concurrent_misses_fill_once(self):
+        from commerce import cache
+
+        compute = cache._compute
+        calls = []
+
+        def slow_compute(pk):
+            calls.append(pk)
+            # Long enough for every other miss to find the fill in progress.
+            time.sleep(0.3)
+            return compute(pk)
+
+        barrier = threading.Barrier(self.workers)
+
+        def run(_):
+            try:
+                barrier.wait(timeout=5)
+                return cache.get_product_payload(self.product.pk)
+            finally:
+                connection.close()
+
+        with mock.patch.object(cache, '_compute', slow_compute):
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                payloads = list(pool.map(run, range(self.workers)))
+        self.assertEqual(calls, [self.product.pk])
+        self.assertEqual([payload['name'] for payload in payloads], ['cache'] * self.workers)
+
+    def test_write_invalidates(self):
+        from commerce import cache
+
+        self.assertEqual(cache.get_product_payload(self.product.pk)['name'], 'cache')
+        with self.assertNumQueries(0):
+            cache.get_product_payload(self.product.pk)
+        self.product.name = 'renamed'
+        self.product.save()
+        self.assertEqual(cache.get_product_payload(self.product.pk)['name'], 'renamed')
+
+
+class SearchTests(TestCase):
+    """Ranked full-text search over product, subcategory and category names, safe for any input."""
+
+    def setUp(self):
+        seller = User.objects.create_user(username='search-seller', email='seller@search.local')
+        self.subcategory = SubCategory.objects.create(
+            name='lighting', category=Category.objects.create(name='home'),
+        )
+        self.in_name = Product.objects.create(
+            name='brass lamp', description='a lamp for the desk', price=10, count=1,
+            category=self.subcategory, user=seller,
+        )
+        self.in_description = Product.objects.create(
+            name='side table', description='oak top on brass legs', price=10, count=1,
+            category=self.subcategory, user=seller,
+        )
+        self.client = api_client(seller)
+
+    def search(self, query):
+        response = self.client.get('/products/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()]
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.search('brass'), [self.in_name.pk, self.in_description.pk])
+        # The last term is a prefix, for search-as-you-type.
+        self.assertEqual(self.search('lam'), [self.in_name.pk])
+
+    def test_category_renames_are_indexed(self):
+        self.subcategory.name = 'chandeliers'
+        self.subcategory.save()
+        self.assertEqual(sorted(self.search('chandeliers')), sorted([self.in_name.pk, self.in_description.pk]))
+        self.assertEqual(self.search('lighting'), [])
+
+    def test_punctuation_and_query_syntax(self):
+        self.assertEqual(self.search('!!!'), [])
+        self.assertEqual(self.search('"'), [])
+        # FTS5 operators are searched for as plain words.
+        self.assertEqual(self.search('brass" (lamp*'), [self.in_name.pk])
+        self.assertEqual(self.search('brass OR oak'), [])
+        self.assertEqual(self.client.get('/products/search/', {'q': '   '}).status_code, 400)
+
+
+class ProductConditionalTests(TransactionTestCase):
+    """A cached product detail must stop matching its ETag whenever the payload changes."""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(username='etag-seller', email='seller@etag.local')
+        self.buyer = User.objects.create_user(username='etag-buyer', email='buyer@etag.local')
+        subcategory = SubCategory.objects.create(name='etag', category=Category.objects.create(name='etag'))
+        self.product = Product.objects.create(
+            name='etag', description='etag', price=100, count=5, category=subcategory, user=self.seller,
+        )
+        self.client = api_client(self.buyer)
+        self.path = f'/products/get/{self.product.pk}/'
+
+    def assertChanged(self, etag):
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_checkout_changes_etag(self):
+        etag = self.client.get(self.path)['ETag']
+        self.assertEqual(self.client.get(self.path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Cart.objects.create(user=self.buyer, product=self.product, quantity=2)
+        checkout(self.buyer, payment_method='card', user_location='etag')
+        self.assertEqual(self.assertChanged(etag).json()['count'], 3)
+
+    @override_settings(STORAGES={**settings.STORAGES, 'default': {
+        'BACKEND': 'django.core.files.storage.InMemoryStorage',
+    }})
+    def test_image_upload_and_variants_change_etag(self):
+        photo = io.BytesIO()
+        Image.new('RGB', (400, 300), 'teal').save(photo, 'JPEG')
+        etag = self.client.get(self.path)['ETag']
+        response = api_client(self.seller).post(
+            f'/products/images/{self.product.pk}/', {'image': SimpleUploadedFile('photo.jpg', photo.getvalue())},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 201)
+        etag = self.assertChanged(etag)['ETag']
+
+        # Variants are stored in the background; they change the payload's srcset again.
+        deadline = time.monotonic() + 30
+        while not ProductImage.objects.get(pk=response.json()['id']).variants:
+            self.assertLess(time.monotonic(), deadline, "The image variants were never stored.")
+            time.sleep(0.05)
+        self.assertTrue(self.assertChanged(etag).json()['images'][0]['srcset'])
+
+    def test_async_detail_matches_sync(self):
+        sync = self.client.get(self.path)
+        path = f'/products/async/get/{self.product.pk}/'
+        # The validators' query only; the payload comes from the cache the sync view filled.
+        with self.assertNumQueries(1):
+            response = self.client.get(path)
+        self.assertEqual(response.json(), sync.json())
+        for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+            self.assertEqual(response[header], sync[header], header)
+        self.assertEqual(response['Vary'], 'Authorization')
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=sync['ETag']).status_code, 304)
+        self.product.price = 90
+        self.product.save()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=sync['ETag'])
+        self.assertEqual((response.status_code, response.json()['price']), (200, 90))
+        self.assertEqual(self.client.get('/products/async/get/99999/').status_code, 404)
+
+
+class CommentCountTests(TransactionTestCase):
+    """Comment counters are batched into one UPDATE and must land on the right products."""
+
+    def test_adjust_counts_batches_products(self):
+        from commerce import comments
+        from commerce.models import SellerStats
+
+        seller = User.objects.create_user(username='count-seller', email='seller@count.local')
+        subcategory = SubCategory.objects.create(name='count', category=Category.objects.create(name='count'))
+        first, second, third = Product.objects.bulk_create([
+            Product(name=f'count-{i}', description='count', price=1, count=1, category=subcategory, user=seller,
+                    comment_count=comment_count)
+            for i, comment_count in enumerate((0, 2, 0))
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            comments.adjust_counts({first.pk: 3, second.pk: -1, third.pk: 0})
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "commerce_product"')]
+        self.assertEqual(len(updates), 1)
+        counts = dict(Product.objects.values_list('pk', 'comment_count'))
+        self.assertEqual(counts, {first.pk: 3, second.pk: 1, third.pk: 0})
+        self.assertEqual(SellerStats.objects.get(seller=seller).comments, 2)
+
+
+class ProductImporterTests(TransactionTestCase):
+    """Bulk imports bypass the model signals, so the counters they maintain must still add up."""
+
+    def test_repeated_id_in_batch_is_written_once(self):
+        from commerce import sellers
+        from commerce.importer import ProductImporter
+        from commerce.models import ProductFacet
+
+        seller = User.objects.create_user(username='import-seller', email='seller@import.local')
+        subcategory = SubCategory.objects.create(name='import', category=Category.objects.create(name='import'))
+        product = Product.objects.create(
+            name='import', description='import', price=10, count=1, category=subcategory, user=seller,
+        )
+        rows = [
+            {'id': product.pk, 'name': 'first', 'price': '20', 'count': '3', 'category_id': subcategory.pk},
+            {'id': product.pk, 'name': 'last', 'price': '30', 'count': '50', 'category_id': subcategory.pk},
+        ]
+        report = ProductImporter(seller).run(enumerate(rows, start=2))
+
+        product.refresh_from_db()
+        self.assertEqual((report['updated'], report['error_count']), (1, 0))
+        self.assertEqual((product.name, product.price, product.count), ('last', 30, 50))
+        self.assertEqual(sum(ProductFacet.objects.values_list('count', flat=True)), 1)
+        self.assertEqual(list(sellers.diff()), [])
+
+    def upload(self, content, name='products.csv'):
+        seller = User.objects.create_user(username='upload-seller', email='upload@import.local')
+        return api_client(seller).post(
+            '/products/bulk/', {'file': SimpleUploadedFile(name, content)}, format='multipart',
+        )
+
+    def test_undecodable_file_is_rejected(self):
+        response = self.upload(b'name,description,price,count,category_id\nCaf\xe9,latin-1,1,1,1\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], "The file is not UTF-8 encoded text.")
+
+    def test_file_without_rows_is_rejected(self):
+        response = self.upload(b'name,description,price,count,category_id\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], "The file has no product rows.")
+
+
+class QueryBudgetTests(TestCase):
+    """The hot endpoints stay within the query_budget their views declare and use indexed plans."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from commerce import seeding
+
+        seeding.seed(users=5, categories=2, subcategories=2, products=200)
+
+    def test_endpoints_within_budget(self):
+        from commerce.management.commands.check_query_plans import Command
+
+        command = Command(stdout=io.StringIO())
+        self.assertEqual(command.check_endpoints(), [])
+
+    def test_over_budget_raises_only_when_enabled(self):
+        from commerce.instrumentation import QueryBudgetExceeded
+        from commerce.views import GetProductsAPIView
+
+        client = api_client(User.objects.order_by('id').first())
+        with mock.patch.object(GetProductsAPIView, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                client.get('/products/get/')
+            with override_settings(QUERY_BUDGET_RAISE=False), self.assertLogs('commerce.instrumentation', 'WARNING'):
+                self.assertEqual(client.get('/products/get/').status_code, 200)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        from commerce import instrumentation
+
+        self.registry = instrumentation.registry
+        self.registry.reset()
+        self.user = User.objects.create_user(username='metrics', email='metrics@example.com')
+        subcategory = SubCategory.objects.create(name='metrics', category=Category.objects.create(name='metrics'))
+        Product.objects.create(name='metrics', description='metrics', price=1, count=1, category=subcategory,
+                               user=self.user)
+
+    def test_streamed_response_is_recorded_after_its_body(self):
+        response = api_client(self.user).get('/products/export/')
+        # Nothing is recorded until the body has been sent.
+        self.assertFalse(self.registry.histograms['http_response_size_bytes'])
+        body = b''.join(response.streaming_content)
+        [(_, size)] = self.registry.histograms['http_response_size_bytes'].items()
+        [(_, queries)] = self.registry.histograms['http_request_db_queries'].items()
+        self.assertEqual(size.sum, len(body))
+        # The export's SELECT runs while streaming, after the view returned.
+        self.assertGreaterEqual(queries.sum, 1)
+
+    def test_metrics_need_the_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics/').status_code, 401)
+            self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+            response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_request_duration_seconds', response.content)
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='hold-buyer', email='buyer@hold.local')
+        seller = User.objects.create_user(username='hold-seller', email='seller@hold.local')
+        subcategory = SubCategory.objects.create(name='hold', category=Category.objects.create(name='hold'))
+        self.product = Product.objects.create(
+            name='hold', description='hold', price=10, count=10, category=subcategory, user=seller,
+        )
+
+    def test_concurrent_first_add_is_retried(self):
+        from django.db.models.query import QuerySet
+
+        from commerce import reservations
+
+        reservations.hold(self.buyer, self.product, 1)
+        first = QuerySet.first
+        missed = []
+
+        def racing_first(queryset):
+            # The first lookup misses the line, as if another request inserted it meanwhile.
+            if not missed and queryset.model is Cart:
+                missed.append(True)
+                return None
+            return first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', racing_first):
+            line = reservations.hold(self.buyer, self.product, 2)
+        self.product.refresh_from_db()
+        self.assertTrue(missed)
+        self.assertEqual((line.quantity, line.reserved, self.product.reserved), (2, 2, 2))
+
+    def test_expired_release_changes_cart_etag(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from commerce import reservations
+
+        reservations.hold(self.buyer, self.product, 1)
+        client = api_client(self.buyer)
+        etag = client.get('/products/cart/get/')['ETag']
+        reservations.release_expired(now=timezone.now() + timedelta(days=1))
+        response = client.get('/products/cart/get/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()[0]['reserved_until'])
+
+
+class CartBatchTests(TestCase):
+    """A cart batch applies what it can, reports the rest per operation and holds exactly what it kept."""
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='batch-buyer', email='buyer@batch.local')
+        seller = User.objects.create_user(username='batch-seller', email='seller@batch.local')
+        subcategory = SubCategory.objects.create(name='batch', category=Category.objects.create(name='batch'))
+        self.lamp, self.desk, self.rare = (
+            Product.objects.create(name=name, description=name, price=price, count=count,
+                                   category=subcategory, user=seller)
+            for name, price, count in (('lamp', 10, 10), ('desk', 100, 5), ('rare', 50, 1))
+        )
+        self.client = api_client(self.buyer)
+
+    def batch(self, *operations):
+        response = self.client.post('/products/cart/batch/', {'operations': list(operations)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def held(self):
+        return dict(Product.objects.filter(
+            pk__in=[self.lamp.pk, self.desk.pk, self.rare.pk],
+        ).values_list('name', 'reserved'))
+
+    def test_partial_failures(self):
+        body = self.batch(
+            {'action': 'add', 'product_id': self.lamp.pk, 'quantity': 1},
+            {'action': 'add', 'product_id': self.lamp.pk, 'quantity': 2},
+            {'action': 'set', 'product_id': self.desk.pk, 'quantity': 2},
+            {'action': 'add', 'product_id': 99999, 'quantity': 1},
+            {'action': 'set', 'product_id': self.rare.pk, 'quantity': 3},
+        )
+        self.assertEqual(body['errors'], [
+            {'index': 3, 'product_id': 99999, 'detail': 'Product not found.'},
+            {'index': 4, 'product_id': self.rare.pk, 'detail': 'Not enough stock to hold this quantity.',
+             'available': 1},
+        ])
+        self.assertEqual(
+            sorted((line['product'], line['quantity'], line['price']) for line in body['cart']),
+            [('desk', 2, 200), ('lamp', 3, 30)],
+        )
+        self.assertEqual(self.held(), {'lamp': 3, 'desk': 2, 'rare': 0})
+
+    def test_remove_and_set_release_holds(self):
+        self.batch(
+            {'action': 'set', 'product_id': self.lamp.pk, 'quantity': 4},
+            {'action': 'set', 'product_id': self.desk.pk, 'quantity': 1},
+        )
+        body = self.batch(
+            {'action': 'remove', 'product_id': self.lamp.pk},
+            {'action': 'set', 'product_id': self.desk.pk, 'quantity': 6},
+        )
+        self.assertEqual(body['errors'], [
+            {'index': 1, 'product_id': self.desk.pk, 'detail': 'Not enough stock to hold this quantity.',
+             'available': 5},
+        ])
+        # The failed line keeps its earlier quantity.
+        self.assertEqual([(line['product'], line['quantity']) for line in body['cart']], [('desk', 1)])
+        self.assertEqual(self.held(), {'lamp': 0, 'desk': 1, 'rare': 0})
+
+    def test_invalid_operations_change_nothing(self):
+        response = self.client.post('/products/cart/batch/', {'operations': [
+            {'action': 'set', 'product_id': self.lamp.pk, 'quantity': 1},
+            {'action': 'add', 'product_id': self.desk.pk},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Cart.objects.filter(user=self.buyer).exists())
+
+
+class OrderHistoryTests(TestCase):
+    """Order history pages by (ordered_at, id) with its line items, filtered by status and date."""
+
+    def setUp(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from commerce.models import Order, OrderItem
+
+        self.buyer = User.objects.create_user(username='history-buyer', email='buyer@history.local')
+        other = User.objects.create_user(username='history-other', email='other@history.local')
+        self.now = timezone.now()
+        statuses = ['pending', 'delivered', 'delivering', 'delivered', 'pending', 'delivered']
+        self.orders = []
+        for i, status in enumerate(statuses):
+            order = Order.objects.create(
+                user=self.buyer, total_price=10 * (i + 1), payment_method='card', user_location='history',
+                status=status,
+            )
+            # Two orders share a timestamp, so the id breaks the tie.
+            Order.objects.filter(pk=order.pk).update(ordered_at=self.now - timedelta(days=min(i, 4)))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_name=f'item-{i}-{n}', unit_price=10, quantity=1, price=10)
+                for n in range(2)
+            ])
+            self.orders.append(order)
+        Order.objects.create(user=other, total_price=1, payment_method='cash', user_location='elsewhere')
+        self.client = api_client(self.buyer)
+
+    def walk(self, query):
+        response = self.client.get(f'/products/order/?{query}')
+        self.assertEqual(response.status_code, 200)
+        rows = response.json()['results']
+        while response.json()['next']:
+            with self.assertNumQueries(2):
+                response = self.client.get(response.json()['next'])
+            rows += response.json()['results']
+        return rows
+
+    def ids(self, *indexes):
+        return [self.orders[index].pk for index in indexes]
+
+    def test_pages_carry_their_items(self):
+        rows = self.walk('page_size=2')
+        # Newest first; orders 4 and 5 share a timestamp.
+        self.assertEqual([row['id'] for row in rows], self.ids(0, 1, 2, 3, 5, 4))
+        self.assertEqual(
+            [item['product_name'] for item in rows[0]['items']], ['item-0-0', 'item-0-1'],
+        )
+
+    def test_status_and_date_filters(self):
+        from datetime import timedelta
+
+        self.assertEqual([row['id'] for row in self.walk('status=delivered&page_size=1')], self.ids(1, 3, 5))
+        since = (self.now - timedelta(days=3, hours=1)).isoformat()
+        until = (self.now - timedelta(hours=1)).isoformat()
+        rows = self.walk(f'since={since.replace("+", "%2B")}&until={until.replace("+", "%2B")}')
+        self.assertEqual([row['id'] for row in rows], self.ids(1, 2, 3))
+
+    def test_invalid_filters(self):
+        self.assertEqual(self.client.get('/products/order/?status=lost').status_code, 400)
+        self.assertEqual(
+            self.client.get('/products/order/?since=2026-01-02T00:00:00Z&until=2026-01-01T00:00:00Z').status_code,
+            400,
+        )
+
+
+class OrderStatusTransitionTests(TestCase):
+    """Fulfillment moves orders only along allowed transitions and records each move once."""
+
+    def setUp(self):
+        from commerce.models import Order
+
+        self.staff = User.objects.create_user(username='fulfil-staff', email='staff@fulfil.local', is_staff=True)
+        buyer = User.objects.create_user(username='fulfil-buyer', email='buyer@fulfil.local')
+        self.pending, self.delivering, self.delivered = (
+            Order.objects.create(user=buyer, total_price=10, payment_method='card', user_location='fulfil',
+                                 status=status)
+            for status in ('pending', 'delivering', 'delivered')
+        )
+        self.client = api_client(self.staff)
+
+    def move(self, order_ids, status):
+        return self.client.post('/products/order/status/', {'order_ids': order_ids, 'status': status}, format='json')
+
+    def history(self):
+        from commerce.models import OrderStatusChange
+
+        return list(OrderStatusChange.objects.order_by('id').values_list(
+            'order_id', 'from_status', 'to_status', 'changed_by_id',
+        ))
+
+    def test_allowed_transitions_are_applied_and_recorded(self):
+        response = self.move([self.pending.pk, self.delivering.pk, self.delivered.pk, 99999], 'delivering')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'status': 'delivering', 'updated': 1,
+            'skipped': [
+                {'id': self.delivering.pk, 'status': 'delivering'},
+                {'id': self.delivered.pk, 'status': 'delivered'},
+                {'id': 99999, 'status': None},
+            ],
+        })
+        response = self.move([self.pending.pk, self.delivering.pk], 'delivered')
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(self.history(), [
+            (self.pending.pk, 'pending', 'delivering', self.staff.pk),
+            (self.pending.pk, 'delivering', 'delivered', self.staff.pk),
+            (self.delivering.pk, 'delivering', 'delivered', self.staff.pk),
+        ])
+
+    def test_rejected_transitions_change_nothing(self):
+        from commerce.models import Order
+
+        # Nothing moves back to pending.
+        response = self.move([self.delivering.pk], 'pending')
+        self.assertEqual(response.status_code, 400)
+        # Pending orders can't skip delivering.
+        response = self.move([self.pending.pk], 'delivered')
+        self.assertEqual(response.json(), {
+            'status': 'delivered', 'updated': 0, 'skipped': [{'id': self.pending.pk, 'status': 'pending'}],
+        })
+        self.assertEqual(self.move([self.pending.pk], 'shipped').status_code, 400)
+        self.assertEqual(Order.objects.get(pk=self.pending.pk).status, 'pending')
+        self.assertEqual(self.history(), [])
+
+    def test_only_staff_can_move_orders(self):
+        client = api_client(User.objects.create_user(username='fulfil-other', email='other@fulfil.local'))
+        response = client.post(
+            '/products/order/status/', {'order_ids': [self.pending.pk], 'status': 'delivering'}, format='json',
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.history(), [])
+
+
+class CategoryTreeTests(TransactionTestCase):
+    """The cached category tree carries per-subcategory counts and a version ETag that moves on writes."""
+
+    def setUp(self):
+        from commerce import cache
+
+        cache.get_cache().clear()
+        self.seller = User.objects.create_user(username='tree-seller', email='seller@tree.local')
+        home, office = Category.objects.create(name='home'), Category.objects.create(name='office')
+        self.lamps = SubCategory.objects.create(name='lamps', category=home)
+        SubCategory.objects.create(name='rugs', category=home)
+        self.desks = SubCategory.objects.create(name='desks', category=office)
+        for subcategory, count in ((self.lamps, 3), (self.lamps, 0), (self.desks, 1)):
+            self.product(subcategory, count)
+        self.client = api_client(self.seller)
+
+    def product(self, subcategory, count):
+        return Product.objects.create(
+            name='tree', description='tree', price=10, count=count, category=subcategory, user=self.seller,
+        )
+
+    def tree(self):
+        response = self.client.get('/products/categories/')
+        self.assertEqual(response.status_code, 200)
+        return response, [
+            (category['name'], category['product_count'], [
+                (subcategory['name'], subcategory['product_count'], subcategory['in_stock_count'])
+                for subcategory in category['subcategories']
+            ])
+            for category in response.json()
+        ]
+
+    def test_counts(self):
+        _, tree = self.tree()
+        self.assertEqual(tree, [
+            ('home', 2, [('lamps', 2, 1), ('rugs', 0, 0)]),
+            ('office', 1, [('desks', 1, 1)]),
+        ])
+
+    def test_etag_moves_on_writes(self):
+        response, _ = self.tree()
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/products/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.product(self.desks, 2)
+        response, tree = self.tree()
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(tree[1], ('office', 2, [('desks', 2, 2)]))
+
+        etag = response['ETag']
+        self.desks.name = 'tables'
+        self.desks.save()
+        response = self.client.get('/products/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[1]['subcategories'][0]['name'], 'tables')
+
+
+class SalesRollupTests(TestCase):
+    def test_sales_of_deleted_products_stay_with_their_seller(self):
+        from commerce import analytics
+        from commerce.models import ProductDailySales, SellerDailySales
+
+        seller = User.objects.create_user(username='rollup-seller', email='seller@rollup.local')
+        buyer = User.objects.create_user(username='rollup-buyer', email='buyer@rollup.local')
+        subcategory = SubCategory.objects.create(name='rollup', category=Category.objects.create(name='rollup'))
+        kept, deleted = (
+            Product.objects.create(name=name, description='rollup', price=10, count=5, category=subcategory,
+                                   user=seller)
+            for name in ('kept', 'deleted')
+        )
+        Cart.objects.create(user=buyer, product=kept, quantity=1)
+        Cart.objects.create(user=buyer, product=deleted, quantity=2)
+        checkout(buyer, payment_method='card', user_location='rollup')
+        deleted.delete()
+
+        self.assertEqual(analytics.rollup(settle=0), 1)
+        seller_row = SellerDailySales.objects.get(seller=seller)
+        self.assertEqual((seller_row.orders, seller_row.units, seller_row.revenue), (1, 3, 30))
+        self.assertEqual(list(ProductDailySales.objects.values_list('product_id', 'units')), [(kept.pk, 1)])
+
+
+class CommentCascadeTests(TestCase):
+    """Deleting a product or a user settles the comment counters once, not once per comment."""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(username='cascade-seller', email='seller@cascade.local')
+        self.author = User.objects.create_user(username='cascade-author', email='author@cascade.local')
+        self.subcategory = SubCategory.objects.create(
+            name='cascade', category=Category.objects.create(name='cascade'),
+        )
+
+    def product(self, comments):
+        product = Product.objects.create(
+            name='cascade', description='cascade', price=1, count=1, category=self.subcategory, user=self.seller,
+        )
+        for _ in range(comments):
+            Comment.objects.create(product=product, user=self.author, text='cascade')
+        return product
+
+    def delete_queries(self, instance):
+        with CaptureQueriesContext(connection) as queries:
+            instance.delete()
+        return len(queries.captured_queries)
+
+    def test_product_delete_cost_does_not_grow_with_comments(self):
+        from commerce import sellers
+
+        few = self.delete_queries(self.product(comments=2))
+        many = self.delete_queries(self.product(comments=40))
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 14)
+        self.assertEqual(list(sellers.diff()), [])
+
+    def test_user_delete_uncounts_their_comments_elsewhere(self):
+        from commerce import sellers
+
+        product = self.product(comments=3)
+        own = Product.objects.create(
+            name='own', description='own', price=1, count=1, category=self.subcategory, user=self.author,
+        )
+        Comment.objects.create(product=own, user=self.seller, text='cascade')
+        self.author.delete()
+        product.refresh_from_db()
+        self.assertEqual(product.comment_count, 0)
+        self.assertEqual(list(sellers.diff()), [])
+
+
+class OversizedIdTests(TestCase):
+    """Ids past the 64-bit range are answered like any unknown id instead of overflowing the driver."""
+
+    def test_comment_endpoints(self):
+        client = api_client(User.objects.create_user(username='overflow', email='overflow@example.com'))
+        huge = '99999999999999999999999'
+        self.assertEqual(client.get(f'/products/comments/?id={huge}').status_code, 404)
+        self.assertEqual(client.get(f'/products/async/comments/?id={huge}').status_code, 404)
+        self.assertEqual(client.get(f'/products/comments/batch/?ids=1,{huge}').status_code, 400)
+        self.assertEqual(client.get(f'/products/stock/?ids={huge}').status_code, 400)
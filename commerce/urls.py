@@ -1,17 +1,45 @@
 from django.urls import path
 
+from commerce import async_views
 from commerce.views import CreateProductAPIView, GetProductsAPIView, AddCartItemAPIView, GetCartAPIView, OrdersAPIView, \
-    CreateOrderAPIView, ProductsCommentAPIView, ProductsUpdateAPIView, ProductsDeleteAPIView, RetrieveProductAPIView
+    CreateOrderAPIView, ProductsCommentAPIView, ProductsUpdateAPIView, ProductsDeleteAPIView, RetrieveProductAPIView, \
+    ExportProductsAPIView, ProductCacheStatsAPIView, SearchProductsAPIView, \
+    ProductFacetsAPIView, BulkCreateProductsAPIView, ProductCommentsBatchAPIView, ProductImageUploadAPIView, \
+    CategoryProductsAPIView, ProductStockAPIView, CartBatchAPIView, CartSummaryAPIView, OrderStatusBatchAPIView, \
+    SalesAnalyticsAPIView, TopSalesAnalyticsAPIView, InventoryAnalyticsAPIView, SellerDashboardAPIView, \
+    CategoryTreeAPIView
 
 urlpatterns = [
     path('create/', CreateProductAPIView.as_view()),
+    path('bulk/', BulkCreateProductsAPIView.as_view()),
     path('get/', GetProductsAPIView.as_view()),
+    path('categories/', CategoryTreeAPIView.as_view()),
+    path('category/<int:pk>/', CategoryProductsAPIView.as_view()),
+    path('export/', ExportProductsAPIView.as_view()),
+    path('search/', SearchProductsAPIView.as_view()),
+    path('facets/', ProductFacetsAPIView.as_view()),
     path('cart/add/', AddCartItemAPIView.as_view()),
     path('cart/get/', GetCartAPIView.as_view()),
+    path('cart/batch/', CartBatchAPIView.as_view()),
+    path('cart/summary/', CartSummaryAPIView.as_view()),
+    path('stock/', ProductStockAPIView.as_view()),
     path('order/', OrdersAPIView.as_view()),
     path('order/create/', CreateOrderAPIView.as_view()),
+    path('order/status/', OrderStatusBatchAPIView.as_view()),
+    path('seller/dashboard/', SellerDashboardAPIView.as_view()),
     path('comments/', ProductsCommentAPIView.as_view()),
+    path('comments/batch/', ProductCommentsBatchAPIView.as_view()),
     path('update/<int:pk>/', ProductsUpdateAPIView.as_view()),
     path('delete/<int:pk>/', ProductsDeleteAPIView.as_view()),
     path('get/<int:pk>/', RetrieveProductAPIView.as_view()),
+    path('images/<int:pk>/', ProductImageUploadAPIView.as_view()),
+    path('cache/stats/', ProductCacheStatsAPIView.as_view()),
+    path('analytics/sales/', SalesAnalyticsAPIView.as_view()),
+    path('analytics/top/', TopSalesAnalyticsAPIView.as_view()),
+    path('analytics/inventory/', InventoryAnalyticsAPIView.as_view()),
+    path('async/get/', async_views.products),
+    path('async/get/<int:pk>/', async_views.product_detail),
+    path('async/cart/get/', async_views.cart),
+    path('async/cart/add/', async_views.add_cart_item),
+    path('async/comments/', async_views.comments),
 ]
\ No newline at end of file
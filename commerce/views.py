@@ -1,15 +1,42 @@
-from django.db.models import Sum
-from drf_spectacular.utils import extend_schema, OpenApiExample, inline_serializer
+import io
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Prefetch, Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, inline_serializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, serializers
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 
 
-from commerce.models import Product, Cart, Order, Comment
-from commerce.serializers import CreateProductsSerializers, GetProductsSerializers, AddCartItemSerializer, \
+from commerce import analytics, comments, facets, fulfillment, listings, reservations, search, sellers
+from commerce.cache import get_product_payload, get_cart_summary, cache_stats, get_category_tree
+from commerce.checkout import checkout, EmptyCart, InsufficientStock
+from commerce.conditional import conditional, catalog_validators, product_validators, cart_validators, \
+    comments_validators, comments_batch_validators, category_listing_validators, category_tree_validators, \
+    category_tree_etag
+from commerce.exports import export_rows, stream_ndjson, stream_gzip_csv
+from commerce.fulfillment import InvalidTransition
+from commerce.importer import detect_format, import_products
+from commerce.models import Category, Product, ProductImage, ProductListing, Cart, Order, OrderItem, Comment, \
+    InventorySnapshot, SellerStats, parse_pk
+from commerce.pagination import ProductKeysetPagination, CommentKeysetPagination, OrderKeysetPagination, \
+    AnalyticsKeysetPagination
+from commerce.serializers import CreateProductsSerializers, ProductListingSerializer, AddCartItemSerializer, \
     GetCartSerializer, ProductSerializer, OrdersSerializer, OrderUserInfoSerializer, CommentSerializer, \
-    PostCommentsSerializer, UpdateProductSerializer
+    PostCommentsSerializer, UpdateProductSerializer, SearchProductsSerializer, ProductFilterSerializer, \
+    BulkImportSerializer, CommentsBatchSerializer, ProductCommentsSerializer, ProductImageSerializer, \
+    ProductImageUploadSerializer, ProductIdsSerializer, ProductStockSerializer, CartBatchSerializer, \
+    CartSummarySerializer, OrderFilterSerializer, OrderStatusBatchSerializer, SalesFilterSerializer, \
+    TopSalesFilterSerializer, InventoryFilterSerializer, DailySalesSerializer, SalesTotalSerializer, \
+    InventorySnapshotSerializer, SellerDashboardSerializer, CategoryTreeSerializer
+from root import images
+from users.permissions import IsActiveStaff
 
 
 class CreateProductAPIView(APIView):
@@ -24,15 +51,153 @@ class CreateProductAPIView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class BulkCreateProductsAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+    parser_classes = (MultiPartParser, )
+
+    @extend_schema(
+        request=BulkImportSerializer,
+        tags=["Import"]
+    )
+    def post(self, request):
+        serializer = BulkImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = serializer.validated_data['file']
+        fmt = serializer.validated_data.get('format') or detect_format(upload.name)
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        report = import_products(stream, fmt, request.user, batch_size=serializer.validated_data['batch_size'])
+        written = report['created'] or report['updated']
+        response_status = status.HTTP_400_BAD_REQUEST if 'error' in report or not written else status.HTTP_201_CREATED
+        return Response(report, status=response_status)
+
+
 class GetProductsAPIView(APIView):
     permission_classes = (IsAuthenticated, )
+    query_budget = 2
+    pagination_class = ProductKeysetPagination
+
     @extend_schema(
-        responses=GetProductsSerializers(many=True)
+        parameters=[ProductFilterSerializer],
+        responses=ProductListingSerializer(many=True)
     )
+    @conditional(catalog_validators)
     def get(self, request):
-        products = Product.objects.all()
-        serializer = GetProductsSerializers(products, many=True)
-        return Response(serializer.data)
+        filters = ProductFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        products = listings.filter_listings(ProductListing.objects.all(), filters.validated_data)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(products, request, view=self)
+        serializer = ProductListingSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class CategoryProductsAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+    query_budget = 3
+    pagination_class = ProductKeysetPagination
+
+    @extend_schema(
+        parameters=[ProductFilterSerializer],
+        responses=ProductListingSerializer(many=True)
+    )
+    @conditional(category_listing_validators)
+    def get(self, request, pk):
+        filters = ProductFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = {**filters.validated_data, 'category': None}
+        products = listings.filter_listings(ProductListing.objects.filter(category_id=pk), params)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(products, request, view=self)
+        if not page and not Category.objects.filter(pk=pk).exists():
+            return Response({"detail": "No Category matches the given query."}, status=status.HTTP_404_NOT_FOUND)
+        serializer = ProductListingSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ProductFacetsAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+    query_budget = 1
+
+    @extend_schema(
+        parameters=[ProductFilterSerializer],
+        tags=["Search"]
+    )
+    def get(self, request):
+        filters = ProductFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        return Response(facets.facet_counts(filters.validated_data), status=status.HTTP_200_OK)
+
+
+class SearchProductsAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+    query_budget = 2
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', str, required=True),
+            OpenApiParameter('limit', int, description='Maximum number of results (default 20, max 100)'),
+        ],
+        responses=SearchProductsSerializer(many=True),
+        tags=["Search"]
+    )
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "q is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranked = search.search(query, limit=limit)
+        products = Product.objects.select_related('user', 'category').in_bulk([pk for pk, _ in ranked])
+        results = []
+        for pk, score in ranked:
+            if pk in products:
+                products[pk].score = score
+                results.append(products[pk])
+        serializer = SearchProductsSerializer(results, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ExportProductsAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('output', str, enum=['ndjson', 'csv'], description='ndjson (default) or gzip-compressed csv'),
+            OpenApiParameter('since', str, description='Only products with updated_at after this ISO 8601 timestamp'),
+        ],
+        responses={(200, 'application/x-ndjson'): OpenApiTypes.STR},
+        tags=["Export"]
+    )
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in ('ndjson', 'csv'):
+            return Response({"error": "output must be 'ndjson' or 'csv'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        since = request.query_params.get('since')
+        if since:
+            try:
+                # None for a malformed value, ValueError for an impossible date like 2024-02-30.
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None:
+                return Response({"error": "since must be an ISO 8601 datetime."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = export_rows(since=since)
+        if output == 'csv':
+            # A gzip file rather than Content-Encoding: gzip, which clients
+            # would undo transparently and save plain CSV under a .gz name.
+            response = StreamingHttpResponse(stream_gzip_csv(rows), content_type='application/gzip')
+            response['Content-Disposition'] = 'attachment; filename="products.csv.gz"'
+        else:
+            response = StreamingHttpResponse(stream_ndjson(rows), content_type='application/x-ndjson')
+            response['Content-Disposition'] = 'attachment; filename="products.ndjson"'
+        return response
 
 
 class AddCartItemAPIView(APIView):
@@ -45,31 +210,85 @@ class AddCartItemAPIView(APIView):
     def post(self, request):
         serializer = AddCartItemSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            cart = serializer.save()
+            try:
+                cart = serializer.save()
+            except InsufficientStock as e:
+                return Response({
+                    'message': 'Not enough stock to hold this quantity',
+                    'available': e.shortages,
+                }, status=status.HTTP_409_CONFLICT)
             return Response(
                 {"detail": "Added to cart successfully.", "cart": AddCartItemSerializer(cart).data},
                 status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class CartBatchAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+    query_budget = 8
+
+    @extend_schema(
+        request=CartBatchSerializer,
+        tags=["Cart"]
+    )
+    def post(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        operations = serializer.validated_data['operations']
+        try:
+            errors = reservations.apply(request.user, operations)
+        except InsufficientStock as e:
+            return Response({
+                'message': 'Stock changed while the cart was being updated; retry',
+                'available': e.shortages,
+            }, status=status.HTTP_409_CONFLICT)
+        items = Cart.objects.filter(user=request.user).select_related('product', 'user')
+        return Response({
+            'cart': GetCartSerializer(items, many=True).data,
+            'errors': [
+                {'index': index, 'product_id': operations[index]['product_id'], **error}
+                for index, error in sorted(errors.items())
+            ],
+        }, status=status.HTTP_200_OK)
+
 class GetCartAPIView(APIView):
     permission_classes = (IsAuthenticated, )
+    query_budget = 2
     @extend_schema(
         tags=["cart"]
     )
+    @conditional(cart_validators)
     def get(self, request):
         user = request.user
-        data = Cart.objects.filter(user=user)
-        if not data.exists():
+        data = list(Cart.objects.filter(user=user).select_related('product', 'user'))
+        if not data:
             return Response({"detail": "No items in the cart."}, status=status.HTTP_404_NOT_FOUND)
         serializer = GetCartSerializer(data, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class CartSummaryAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+    query_budget = 1
+
+    @extend_schema(
+        responses=CartSummarySerializer,
+        tags=["Cart"]
+    )
+    def get(self, request):
+        return Response(CartSummarySerializer(get_cart_summary(request.user.pk)).data, status=status.HTTP_200_OK)
+
+
+class CachedProductRetrieveMixin:
+    def retrieve(self, request, *args, **kwargs):
+        return Response(get_product_payload(self.kwargs['pk']))
+
+
 @extend_schema(
         tags=["Product Detail, Get, Update, Destroy"]
     )
-class GetUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class GetUpdateDestroyAPIView(CachedProductRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = (IsAuthenticated, )
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
@@ -77,14 +296,57 @@ class GetUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
 
 class OrdersAPIView(APIView):
     permission_classes = (IsAuthenticated, )
+    query_budget = 2
+    pagination_class = OrderKeysetPagination
+
     @extend_schema(
-        request=OrdersSerializer,
+        parameters=[OrderFilterSerializer],
+        responses=OrdersSerializer(many=True),
         tags=["Orders"]
     )
     def get(self, request):
-        orders = Order.objects.filter(user=request.user)
-        serializer = OrdersSerializer(orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        filters = OrderFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+        # Every filter is a prefix or range of the (user, [status,] ordered_at, id)
+        # indexes, so a page costs the same however long the history is.
+        orders = Order.objects.filter(user_id=request.user.pk)
+        if 'status' in params:
+            orders = orders.filter(status=params['status'])
+        if 'since' in params:
+            orders = orders.filter(ordered_at__gte=params['since'])
+        if 'until' in params:
+            orders = orders.filter(ordered_at__lt=params['until'])
+        orders = orders.prefetch_related(Prefetch('items', queryset=OrderItem.objects.order_by('id')))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer = OrdersSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class OrderStatusBatchAPIView(APIView):
+    permission_classes = (IsActiveStaff, )
+
+    @extend_schema(
+        request=OrderStatusBatchSerializer,
+        tags=["Orders"]
+    )
+    def post(self, request):
+        serializer = OrderStatusBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            moved, skipped = fulfillment.transition(
+                serializer.validated_data['order_ids'], serializer.validated_data['status'],
+                changed_by=request.user.pk,
+            )
+        except InvalidTransition as e:
+            return Response({'status': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'status': serializer.validated_data['status'],
+            'updated': len(moved),
+            'skipped': [{'id': order_id, 'status': current} for order_id, current in skipped.items()],
+        }, status=status.HTTP_200_OK)
 
 
 @extend_schema(
@@ -117,74 +379,113 @@ class CreateOrderAPIView(APIView):
     permission_classes = (IsAuthenticated, )
 
     def post(self, request):
-        # Step 1: Retrieve all cart items for the user
-        cart_items = Cart.objects.filter(user=request.user)
-
-        if not cart_items.exists():
-            return Response({'message': 'You don\'t have any items in your cart'}, status=status.HTTP_404_NOT_FOUND)
-
-        # Step 2: Calculate total price from all cart items
-        total_price = sum(item.price for item in cart_items)
-
-        # Step 3: Get payment method and user location from the request data
         serializer = OrderUserInfoSerializer(data=request.data)
-        if serializer.is_valid():
-            # Save any relevant information (like payment method or user location)
-            payment_method = serializer.validated_data.get('payment_method')
-            user_location = serializer.validated_data.get('user_location')
-
-            # Step 4: Create the order
-            order = Order.objects.create(
-                user=request.user,
-                total_price=cart_items,  # The total price from the cart items
-                payment_method=payment_method,
-                user_location=user_location,
-                status='pending',  # Default status
-            )
-
-            # Optional: Link cart items to the order
-            # You can store the cart items in the order if you want to track them
-            order.cart_items.set(cart_items)
-
-            # Step 5: Clear the cart after placing the order
-            cart_items.delete()
+        if not serializer.is_valid():
+            return Response({'message': 'Invalid data', 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            order = checkout(
+                request.user,
+                payment_method=serializer.validated_data['payment_method'],
+                user_location=serializer.validated_data['user_location'],
+            )
+        except EmptyCart:
+            return Response({'message': 'You don\'t have any items in your cart'}, status=status.HTTP_404_NOT_FOUND)
+        except InsufficientStock as e:
             return Response({
-                'message': 'Order created successfully.',
-                'order': {
-                    'user': order.user.username,
-                    'total_price': order.total_price,
-                    'payment_method': order.payment_method,
-                    'user_location': order.user_location,
-                    'status': order.status
-                }
-            }, status=status.HTTP_201_CREATED)
-
-        return Response({'message': 'Invalid data', 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
-
+                'message': 'Not enough stock for some items in your cart',
+                'available': e.shortages,
+            }, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'message': 'Order created successfully.',
+            'order': {
+                'id': order.id,
+                'user': request.user.username,
+                'total_price': order.total_price,
+                'payment_method': order.payment_method,
+                'user_location': order.user_location,
+                'status': order.status
+            }
+        }, status=status.HTTP_201_CREATED)
 
 
 class ProductsCommentAPIView(APIView):
     permission_classes = (IsAuthenticated, )
+    query_budget = 3
+    pagination_class = CommentKeysetPagination
+
+    @extend_schema(
+        tags=["Comments"],
+        parameters=[OpenApiParameter('id', int, required=True, description='Product ID')],
+        responses=CommentSerializer(many=True)
+    )
+    @conditional(comments_validators)
+    def get(self, request):
+        return self.list_comments(request, request.query_params.get('id'))
 
     @extend_schema(
         tags=["Comments"],
-        request=PostCommentsSerializer
+        request=PostCommentsSerializer,
+        responses=CommentSerializer(many=True)
     )
     def post(self, request):
-        product_id = request.data.get('id')
+        return self.list_comments(request, request.data.get('id'))
+
+    def list_comments(self, request, product_id):
         if not product_id:
             return Response({"error": "Product ID is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
+        product_id = parse_pk(product_id)
+        if product_id is None or not Product.objects.filter(id=product_id).exists():
             return Response({"error": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        comments = Comment.objects.filter(product=product)
+        queryset = Comment.objects.filter(product_id=product_id).select_related('user', 'product')
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = CommentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class ProductCommentsBatchAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+    query_budget = 3
+
+    @extend_schema(
+        tags=["Comments"],
+        parameters=[CommentsBatchSerializer],
+        responses=ProductCommentsSerializer(many=True)
+    )
+    @conditional(comments_batch_validators)
+    def get(self, request):
+        params = CommentsBatchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ids = params.validated_data['ids']
+        counts = dict(Product.objects.filter(pk__in=ids).values_list('pk', 'comment_count'))
+        latest = comments.latest_comments([pk for pk in ids if pk in counts], params.validated_data['limit'])
+        serializer = ProductCommentsSerializer([
+            {'product_id': pk, 'comment_count': counts[pk], 'comments': latest[pk]}
+            for pk in ids if pk in counts
+        ], many=True)
+        return Response({'results': serializer.data}, status=status.HTTP_200_OK)
+
+
+class ProductStockAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+    query_budget = 1
+
+    @extend_schema(
+        tags=["Cart"],
+        parameters=[ProductIdsSerializer],
+        responses=ProductStockSerializer(many=True)
+    )
+    def get(self, request):
+        params = ProductIdsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        # Read uncached: holds change with every add to cart.
+        products = Product.objects.filter(pk__in=params.validated_data['ids']) \
+            .annotate(available=F('count') - F('reserved')).only('id', 'count', 'reserved').order_by('id')
+        return Response({'results': ProductStockSerializer(products, many=True).data}, status=status.HTTP_200_OK)
 
 
 @extend_schema(
@@ -200,11 +501,177 @@ class ProductsDeleteAPIView(generics.DestroyAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
 
-class RetrieveProductAPIView(generics.RetrieveAPIView):
+class RetrieveProductAPIView(CachedProductRetrieveMixin, generics.RetrieveAPIView):
     permission_classes = (IsAuthenticated, )
+    query_budget = 3
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
 
+    @conditional(product_validators)
+    def get(self, request, *args, **kwargs):
+        return self.retrieve(request, *args, **kwargs)
+
+
+class ProductImageUploadAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+    parser_classes = (MultiPartParser, )
 
+    @extend_schema(
+        request=ProductImageUploadSerializer,
+        responses=ProductImageSerializer,
+        tags=["Product Detail, Get, Update, Destroy"]
+    )
+    def post(self, request, pk):
+        serializer = ProductImageUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+        product = Product.objects.filter(pk=pk).only('user_id').first()
+        if product is None:
+            return Response({"error": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
+        if product.user_id != request.user.pk:
+            return Response({"error": "Only the seller can add images."}, status=status.HTTP_403_FORBIDDEN)
 
+        # Metadata is stripped before the row is saved, so pre_save doesn't wait
+        # on the image pool; the srcset fills in once the variants are built.
+        try:
+            upload = images.clean_upload(serializer.validated_data['image'])
+        except ValidationError as e:
+            return Response({"image": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        image = ProductImage.objects.create(product=product, image=upload)
+        return Response(ProductImageSerializer(image).data, status=status.HTTP_201_CREATED)
+
+
+class ProductCacheStatsAPIView(APIView):
+    permission_classes = (IsActiveStaff, )
+
+    @extend_schema(
+        tags=["Product Detail, Get, Update, Destroy"]
+    )
+    def get(self, request):
+        return Response(cache_stats(), status=status.HTTP_200_OK)
+
+
+def _day_range(queryset, params):
+    if 'since' in params:
+        queryset = queryset.filter(day__gte=params['since'])
+    if 'until' in params:
+        queryset = queryset.filter(day__lte=params['until'])
+    return queryset
+
+
+class SalesAnalyticsAPIView(APIView):
+    """Daily orders, units and revenue per product, subcategory or seller, read from the rollups only."""
+    permission_classes = (IsActiveStaff, )
+    # The staff check loads the user row.
+    query_budget = 2
+    pagination_class = AnalyticsKeysetPagination
+
+    @extend_schema(
+        parameters=[SalesFilterSerializer],
+        responses=DailySalesSerializer(many=True),
+        tags=["Analytics"]
+    )
+    def get(self, request):
+        filters = SalesFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+        model, key_field, _ = analytics.ROLLUPS[params['by']]
+        key = f'{key_field}_id'
+        # Served off the unique (day, key) index, or the (key, day) one for a single id.
+        rows = _day_range(model.objects.all(), params)
+        if 'id' in params:
+            rows = rows.filter(**{key: params['id']})
+        paginator = self.pagination_class()
+        paginator.ordering = ('-day', f'-{key}')
+        page = paginator.paginate_queryset(rows, request, view=self)
+        serializer = DailySalesSerializer(page, many=True, context={'key': key})
+        return paginator.get_paginated_response(serializer.data)
+
+
+class TopSalesAnalyticsAPIView(APIView):
+    """The products, subcategories or sellers with the most revenue over a range of days."""
+    permission_classes = (IsActiveStaff, )
+    query_budget = 2
+
+    @extend_schema(
+        parameters=[TopSalesFilterSerializer],
+        responses=SalesTotalSerializer(many=True),
+        tags=["Analytics"]
+    )
+    def get(self, request):
+        filters = TopSalesFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+        model, key_field, _ = analytics.ROLLUPS[params['by']]
+        totals = (
+            _day_range(model.objects.all(), params)
+            .values(key=F(f'{key_field}_id'))
+            .annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-revenue', 'key')[:params['limit']]
+        )
+        return Response(SalesTotalSerializer(totals, many=True).data, status=status.HTTP_200_OK)
+
+
+class InventoryAnalyticsAPIView(APIView):
+    """Daily stock snapshots per subcategory."""
+    permission_classes = (IsActiveStaff, )
+    query_budget = 2
+    pagination_class = AnalyticsKeysetPagination
+
+    @extend_schema(
+        parameters=[InventoryFilterSerializer],
+        responses=InventorySnapshotSerializer(many=True),
+        tags=["Analytics"]
+    )
+    def get(self, request):
+        filters = InventoryFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+        snapshots = _day_range(InventorySnapshot.objects.all(), params)
+        if 'subcategory' in params:
+            snapshots = snapshots.filter(subcategory_id=params['subcategory'])
+        paginator = self.pagination_class()
+        paginator.ordering = ('-day', '-subcategory_id')
+        page = paginator.paginate_queryset(snapshots, request, view=self)
+        return paginator.get_paginated_response(InventorySnapshotSerializer(page, many=True).data)
+
+
+class SellerDashboardAPIView(APIView):
+    """The signed-in seller's catalog, stock, comment and sales totals, read from their counters row."""
+    permission_classes = (IsAuthenticated, )
+    query_budget = 2
+
+    @extend_schema(
+        responses=SellerDashboardSerializer,
+        tags=["Seller"]
+    )
+    def get(self, request):
+        stats = SellerStats.objects.filter(seller_id=request.user.pk).first() or SellerStats(seller_id=request.user.pk)
+        stats.low_stock_threshold = sellers.low_stock_threshold()
+        # Read off the (user, count, id) index, and only when the counter says there is something to list.
+        stats.low_stock_products = list(
+            Product.objects.filter(user_id=request.user.pk, count__lte=stats.low_stock_threshold)
+            .order_by('count', 'id')
+            .values('id', 'name', 'count', 'reserved')[:sellers.LOW_STOCK_SHOWN]
+        ) if stats.low_stock else []
+        return Response(SellerDashboardSerializer(stats).data, status=status.HTTP_200_OK)
+
+
+class CategoryTreeAPIView(APIView):
+    """Every category with its subcategories and their product counts, served from one cached blob."""
+    permission_classes = (IsAuthenticated, )
+    query_budget = 2
+
+    @extend_schema(
+        responses=CategoryTreeSerializer(many=True),
+        tags=["Categories"]
+    )
+    @conditional(category_tree_validators)
+    def get(self, request):
+        version, body = get_category_tree()
+        response = HttpResponse(body, content_type='application/json')
+        # Tag the body with the version it was built under, in case the tree
+        # moved since the validators ran.
+        response['ETag'] = quote_etag(category_tree_etag(version))
+        return response
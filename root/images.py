@@ -0,0 +1,207 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VARIANT_WIDTHS = (160, 320, 640, 1280)
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+# Variant formats, best first; clients pick the first one they support.
+VARIANT_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+MAX_PIXELS = 40_000_000
+
+_pool = None
+_store_pool = None
+
+
+def _workers():
+    return getattr(settings, 'IMAGE_PROCESSING_WORKERS', None) or os.cpu_count() or 1
+
+
+def get_pool():
+    # Pillow holds the GIL while resizing and encoding, so variants are built
+    # in worker processes; the pool size caps the cores they can occupy.
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_workers())
+    return _pool
+
+
+def get_store_pool():
+    # Rendered variants are written to storage and recorded in the database
+    # on these threads. Done callbacks run on the process pool's management
+    # thread, which must not block on I/O.
+    global _store_pool
+    if _store_pool is None:
+        _store_pool = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix='image-variants')
+    return _store_pool
+
+
+def variant_widths():
+    return tuple(getattr(settings, 'IMAGE_VARIANT_WIDTHS', DEFAULT_VARIANT_WIDTHS))
+
+
+def _open(data):
+    image = Image.open(io.BytesIO(data))
+    if image.format not in ALLOWED_FORMATS:
+        raise ValueError(f"Unsupported image format {image.format}.")
+    if image.width * image.height > MAX_PIXELS:
+        raise ValueError("Image is too large.")
+    image.verify()
+    # verify() leaves the image unusable; reopen to decode it.
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def clean(data):
+    """
+    Decode an upload and re-encode it in its own format without EXIF, XMP or ICC metadata.
+
+    The EXIF orientation is applied to the pixels first so nothing turns
+    sideways once the tag is gone. Runs in a worker process.
+    """
+    image = _open(data)
+    fmt = image.format
+    image = ImageOps.exif_transpose(image)
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    options = {'quality': 90} if fmt in ('JPEG', 'WEBP') else {}
+    image.save(output, fmt, **options)
+    return output.getvalue(), fmt.lower()
+
+
+def render_variants(data, widths):
+    """
+    Resize ``data`` to each width no larger than the original, in every variant format.
+
+    Returns ``[(format, width, bytes), ...]``; an image narrower than every
+    width gets one variant at its own width. Runs in a worker process.
+    """
+    image = _open(data)
+    image = ImageOps.exif_transpose(image)
+    sizes = [width for width in sorted(widths) if width <= image.width] or [image.width]
+    variants = []
+    for width in sizes:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS) if width != image.width else image
+        for name, fmt, options in VARIANT_FORMATS:
+            frame = resized
+            if fmt == 'JPEG' and frame.mode not in ('RGB', 'L'):
+                frame = frame.convert('RGBA') if frame.mode == 'P' else frame
+                background = Image.new('RGB', frame.size, 'white')
+                if frame.mode in ('RGBA', 'LA'):
+                    background.paste(frame, mask=frame.getchannel('A'))
+                else:
+                    background.paste(frame.convert('RGB'))
+                frame = background
+            elif frame.mode not in ('RGB', 'RGBA', 'L'):
+                frame = frame.convert('RGBA')
+            output = io.BytesIO()
+            frame.save(output, fmt, **options)
+            variants.append((name, width, output.getvalue()))
+    return variants
+
+
+def hashed_name(data, extension, suffix=''):
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    return f'{digest}{suffix}.{"jpg" if extension == "jpeg" else extension}'
+
+
+def clean_upload(upload):
+    """
+    Validate and strip an upload; return a ContentFile under a content-hashed name.
+
+    The field's upload_to still decides the directory. Raises ValidationError
+    when the file isn't an image Pillow can decode. Call it before saving the
+    model, outside any transaction, so the wait on the pool doesn't happen in
+    pre_save; the pre_save receivers only clean files that weren't.
+    """
+    upload.open('rb')
+    data = upload.read()
+    try:
+        cleaned, extension = get_pool().submit(clean, data).result()
+    except (UnidentifiedImageError, ValueError, OSError, Image.DecompressionBombError) as e:
+        raise ValidationError(f"Invalid image: {e}")
+    content = ContentFile(cleaned, name=hashed_name(cleaned, extension))
+    content.cleaned = True
+    return content
+
+
+def needs_cleaning(field_file):
+    """Whether ``field_file`` holds a new upload that clean_upload hasn't processed."""
+    return bool(field_file) and not field_file._committed and not getattr(field_file.file, 'cleaned', False)
+
+
+def srcset(variants):
+    """``{'webp': 'url 320w, url 640w', 'jpeg': ...}`` from a stored variants mapping."""
+    return {
+        fmt: ', '.join(
+            f'{default_storage.url(by_width[width])} {width}w' for width in sorted(by_width, key=int)
+        )
+        for fmt, by_width in (variants or {}).items()
+    }
+
+
+def _store(model, pk, field, variants_field, source_name, on_stored, rendered, stored):
+    try:
+        variants = {}
+        for fmt, width, data in rendered.result():
+            name = hashed_name(data, fmt, suffix=f'-{width}w')
+            # Sharded by hash so no directory grows without bound.
+            name = f'{os.path.dirname(source_name)}/variants/{name[:2]}/{name}'
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(data))
+            variants.setdefault(fmt, {})[str(width)] = name
+        # Skipped if the image was replaced while its variants were being built.
+        updated = model._default_manager.filter(pk=pk, **{field: source_name}).update(**{variants_field: variants})
+        if updated and on_stored is not None:
+            on_stored()
+        stored.set_result(bool(updated))
+    except Exception as e:
+        logger.exception("Building image variants for %s %s failed.", model._meta.label, pk)
+        stored.set_exception(e)
+    finally:
+        close_old_connections()
+
+
+def build_variants(instance, field, variants_field, on_stored=None):
+    """
+    Render ``instance.<field>`` into variants on the process pool.
+
+    When they are ready the files are saved, on a thread of the store pool,
+    under content-hashed names next to the original, ``instance.<variants_field>`` is set to
+    ``{format: {width: name}}`` and ``on_stored()`` is called. Returns a Future
+    that resolves once that is done.
+    """
+    field_file = getattr(instance, field)
+    field_file.open('rb')
+    try:
+        data = field_file.read()
+    finally:
+        field_file.close()
+    stored = Future()
+    get_pool().submit(render_variants, data, variant_widths()).add_done_callback(
+        lambda rendered: get_store_pool().submit(
+            _store, type(instance), instance.pk, field, variants_field, field_file.name, on_stored, rendered, stored,
+        )
+    )
+    return stored
+
+
+def schedule_variants(instance, field, variants_field, on_stored=None):
+    """Build variants in the background once the current transaction commits."""
+    transaction.on_commit(lambda: build_variants(instance, field, variants_field, on_stored))
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'commerce.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,9 +77,52 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent checkouts queue up
+            # instead of failing with "database is locked" on lock upgrade.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # A file rather than SQLite's shared in-memory database, which fails
+        # concurrent writers with "table is locked" instead of queueing them,
+        # so the concurrency tests see the same locking as production.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Swap the backend for 'django.core.cache.backends.filebased.FileBasedCache'
+# or 'django.core.cache.backends.redis.RedisCache' (with LOCATION set to the
+# redis:// URL) to share the product cache across processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'commerce',
     }
 }
 
+PRODUCT_CACHE_ALIAS = 'default'
+PRODUCT_CACHE_TIMEOUT = 60 * 5
+# The category tree is invalidated on every write it depends on, so it can
+# stay cached for long.
+CATEGORY_TREE_CACHE_TIMEOUT = 60 * 60
+
+
+# Instrumentation
+# Views declare a query_budget; going over it is logged and counted on
+# /metrics/, and raises QueryBudgetExceeded with QUERY_BUDGET_RAISE (the test
+# modules turn it on).
+
+QUERY_BUDGET_RAISE = False
+# /metrics/ answers 404 until a token is set; scrapers send it as
+# `Authorization: Bearer <token>`.
+METRICS_TOKEN = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -99,6 +143,23 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# PASSWORD_HASH_ITERATIONS can override the PBKDF2 work factor (Django's
+# default when unset); existing hashes are upgraded on the next login.
+# PASSWORD_HASHING_WORKERS bounds how many hashes run at once (defaults to
+# the CPU count).
+
+PASSWORD_HASHERS = [
+    'users.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+PASSWORD_HASHING_WORKERS = None
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -116,6 +177,30 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files. Product images and profile pictures are stored stripped of
+# metadata under content-hashed names, so they can be served with far-future
+# cache headers.
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Widths of the WebP/JPEG variants built for every uploaded image, and how many
+# processes build them (defaults to the CPU count).
+IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1280)
+IMAGE_PROCESSING_WORKERS = None
+
+# Adding a product to a cart holds that many units for CART_HOLD_SECONDS;
+# release_expired_holds returns expired holds to stock.
+CART_HOLD_SECONDS = 15 * 60
+
+# rollup_analytics folds orders into the daily sales tables once they are
+# ANALYTICS_SETTLE_SECONDS old, so orders still being committed aren't skipped.
+ANALYTICS_SETTLE_SECONDS = 60
+
+# Products with at most this many units count as low stock on the seller
+# dashboard. After changing it, run reconcile_seller_stats --fix.
+SELLER_LOW_STOCK_THRESHOLD = 5
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -125,7 +210,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
     )
 }
 
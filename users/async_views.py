@@ -0,0 +1,76 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from users.hashing import acheck_password, ahash_password
+from users.models import User
+from users.tokens import UserRefreshToken
+
+# ASGI-native counterparts of UserRegisterAPIView / UserLoginAPIView. Sync
+# views under ASGI share one thread, so hashing there runs one login at a time;
+# these await the hashing pool instead and keep the event loop free.
+
+
+def _payload(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+@sync_to_async
+def _tokens(user):
+    # for_user records an OutstandingToken row for the blacklist app.
+    refresh = UserRefreshToken.for_user(user)
+    return str(refresh), str(refresh.access_token)
+
+
+@csrf_exempt
+@require_POST
+async def register(request):
+    data = _payload(request)
+    username, email, password = data.get('username'), data.get('email'), data.get('password')
+    if not username or not email or not password:
+        return JsonResponse({'message': 'all 3 columns are required'})
+
+    user = User.objects.build_user(username, email, await ahash_password(password))
+    try:
+        await user.asave()
+    except IntegrityError:
+        return JsonResponse({'message': 'User with this username or email already exists!'}, status=400)
+
+    refresh, access = await _tokens(user)
+    return JsonResponse({
+        'message': 'User Successfully registered!',
+        'refresh_token': refresh,
+        'access_token': access
+    }, status=201)
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    data = _payload(request)
+    username_or_email, password = data.get('username_or_email'), data.get('password')
+    if not username_or_email or not password:
+        return JsonResponse({'message': 'all 2 columns are required'})
+
+    user = await User.objects.for_login(username_or_email).afirst()
+    if user is not None and not user.is_active:
+        user = None
+    if not await acheck_password(user, password):
+        return JsonResponse({'message': 'Invalid username/email or password'}, status=401)
+
+    refresh, access = await _tokens(user)
+    return JsonResponse({
+        "message": "You are logged in Successfully",
+        "refresh_token": refresh,
+        "access_token": access
+    }, status=202)
@@ -0,0 +1,65 @@
+from asgiref.sync import sync_to_async
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import TokenUser
+from users.tokens import USER_CLAIMS
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the token's claims instead of loading the user.
+
+    request.user is a TokenUser with id, username and is_verified taken from
+    the token, so it can be used as a foreign key value and passes
+    IsAuthenticated without a query. Any other attribute loads the rest of
+    the row on first access. Tokens issued before these claims existed fall
+    back to the regular database lookup.
+
+    is_staff and is_active are never trusted from the token: staff-only views
+    use users.permissions.IsActiveStaff, which reads them from the row. For
+    other views, deactivating a user only takes effect once their current
+    access token expires.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+
+        claims = {claim: validated_token[claim] for claim in USER_CLAIMS}
+        # Tokens carry the id as a string; load it as the field's type so pk comparisons work.
+        user_id = TokenUser._meta.get_field(api_settings.USER_ID_FIELD).to_python(user_id)
+        claims[api_settings.USER_ID_FIELD] = user_id
+        # from_db expects the loaded fields in model field order.
+        field_names = [field.attname for field in TokenUser._meta.concrete_fields if field.attname in claims]
+        return TokenUser.from_db(
+            router.db_for_read(TokenUser), field_names, [claims[name] for name in field_names]
+        )
+
+
+async def aauthenticate(request):
+    """
+    Authenticate a plain Django async view's request the same way.
+
+    Returns the user or None; raises InvalidToken for a bad token. Only the
+    fallback for claim-less tokens touches the database, off the event loop.
+    """
+    authentication = StatelessJWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+    validated_token = authentication.get_validated_token(raw_token)
+    if all(claim in validated_token for claim in USER_CLAIMS):
+        return authentication.get_user(validated_token)
+    return await sync_to_async(authentication.get_user)(validated_token)
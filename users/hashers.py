@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher as BasePBKDF2PasswordHasher
+
+
+class PBKDF2PasswordHasher(BasePBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with the work factor taken from PASSWORD_HASH_ITERATIONS.
+
+    Stored hashes with a different iteration count are re-hashed on the next
+    successful login, so the setting can be raised or lowered at any time.
+    """
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', BasePBKDF2PasswordHasher.iterations)
@@ -0,0 +1,48 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import close_old_connections
+
+_pool = None
+
+
+def get_pool():
+    # hashlib releases the GIL while hashing, so threads give real parallelism
+    # and the pool size caps how many cores password hashing can occupy.
+    global _pool
+    if _pool is None:
+        workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count() or 1
+        _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+    return _pool
+
+
+def _check(user, raw_password):
+    if user is None:
+        # Pay for one hash anyway so response time doesn't reveal which users exist.
+        make_password(raw_password)
+        return False
+    try:
+        # May save an upgraded hash when PASSWORD_HASH_ITERATIONS changed.
+        return user.check_password(raw_password)
+    finally:
+        close_old_connections()
+
+
+def check_password(user, raw_password):
+    """Verify ``raw_password`` for ``user`` (which may be None) on the hashing pool."""
+    return get_pool().submit(_check, user, raw_password).result()
+
+
+def hash_password(raw_password):
+    return get_pool().submit(make_password, raw_password).result()
+
+
+async def acheck_password(user, raw_password):
+    return await asyncio.get_running_loop().run_in_executor(get_pool(), _check, user, raw_password)
+
+
+async def ahash_password(raw_password):
+    return await asyncio.get_running_loop().run_in_executor(get_pool(), make_password, raw_password)
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+
+from commerce.benchmarks import api_client
+from users.hashing import hash_password
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Measure login throughput (requests/sec and per core) for the sync and async login endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        password = uuid.uuid4().hex
+        user = User.objects.build_user(f'bench-{tag}', f'bench-{tag}@bench.local', hash_password(password))
+        user.save()
+        body = {'username_or_email': user.email, 'password': password}
+        total, concurrency = options['requests'], options['concurrency']
+        cores = os.cpu_count() or 1
+
+        try:
+            client = api_client()
+
+            def sync_login(_):
+                return client.post('/auth/login/', body, format='json').status_code
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                statuses = set(pool.map(sync_login, range(total)))
+            self.report('sync (WSGI threads)', total, time.perf_counter() - started, cores, statuses)
+
+            async def async_run():
+                async_client = AsyncClient()
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def one():
+                    async with semaphore:
+                        response = await async_client.post('/auth/async/login/', body, content_type='application/json')
+                        return response.status_code
+
+                return set(await asyncio.gather(*(one() for _ in range(total))))
+
+            started = time.perf_counter()
+            statuses = asyncio.run(async_run())
+            self.report('async (ASGI)', total, time.perf_counter() - started, cores, statuses)
+        finally:
+            user.delete()
+
+    def report(self, label, total, elapsed, cores, statuses):
+        rate = total / elapsed
+        self.stdout.write(
+            f"{label:>20}: {total} logins in {elapsed:.2f}s = {rate:.1f} req/s, "
+            f"{rate / cores:.1f} req/s/core ({cores} cores), status {sorted(statuses)}"
+        )
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:55
+
+import django.db.models.functions.text
+import users.models
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # Users own orders, products and comments, so duplicates can't simply be
+    # dropped; stop with the addresses to resolve instead of a bare IntegrityError.
+    User = apps.get_model('users', 'User')
+    duplicates = list(
+        User.objects.exclude(email='').annotate(normalized=Lower('email'))
+        .values('normalized').annotate(users=Count('id')).filter(users__gt=1)
+        .values_list('normalized', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Cannot add unique_user_email: these email addresses are used by more than one user "
+            f"(case-insensitively): {', '.join(sorted(duplicates))}. Merge or change those users' "
+            "emails, then run the migration again."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_tokenuser'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', users.models.UserManager()),
+            ],
+        ),
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='unique_user_email'),
+        ),
+    ]
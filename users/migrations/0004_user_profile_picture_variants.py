@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_unique_user_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -1,12 +1,59 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.db import models
+from django.db.models import CharField, Q
+from django.db.models.functions import Lower
+
+# Lets email lookups use the LOWER(email) unique index below.
+CharField.register_lookup(Lower)
 
 # Create your models here.
 
+class UserManager(BaseUserManager):
+    def build_user(self, username, email, password_hash):
+        """An unsaved user with an already hashed password, normalized like create_user."""
+        return self.model(
+            username=self.model.normalize_username(username),
+            email=self.normalize_email(email),
+            password=password_hash,
+        )
+
+    def for_login(self, username_or_email):
+        """Match a username or a case-insensitive email in a single indexed query."""
+        if '@' in username_or_email:
+            return self.filter(Q(email__lower=username_or_email.lower()) & ~Q(email=''))
+        return self.filter(username=username_or_email)
+
+
 class User(AbstractUser):
     profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # {format: {width: storage name}}, filled in by the image pipeline after upload.
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     date_of_birth = models.DateField(null=True, blank=True)
     is_verified = models.BooleanField(default=False)
 
+    objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            models.UniqueConstraint(Lower('email'), condition=~Q(email=''), name='unique_user_email'),
+        ]
+
     def __str__(self):
         return self.username
+
+
+class TokenUser(User):
+    """
+    A User built from JWT claims without a database query.
+
+    Only the fields carried in the token are loaded; the first access to any
+    other field fetches all of the remaining ones in a single query.
+    """
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
@@ -0,0 +1,15 @@
+from rest_framework.permissions import IsAdminUser
+
+
+class IsActiveStaff(IsAdminUser):
+    """
+    Allow active staff users only, as read from the database.
+
+    request.user's is_staff and is_active aren't taken from the token, so
+    checking them loads the user row: a demoted or deactivated user loses
+    staff access at once instead of when their access token expires.
+    """
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and user.is_active and user.is_staff)
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from root import images
+
 from users.models import User
 
 
@@ -13,7 +15,12 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField()
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_picture_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'email']
+        fields = ['id', 'username', 'email', 'profile_picture', 'profile_picture_srcset']
+
+    def get_profile_picture_srcset(self, obj) -> dict:
+        return images.srcset(obj.profile_picture_variants)
 
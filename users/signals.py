@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from root import images
+from users.models import User
+
+
+@receiver(pre_save, sender=User)
+def clean_profile_picture(sender, instance, **kwargs):
+    if instance.profile_picture and not instance.profile_picture._committed:
+        if images.needs_cleaning(instance.profile_picture):
+            instance.profile_picture = images.clean_upload(instance.profile_picture)
+        instance.profile_picture_variants = {}
+        instance._build_variants = True
+
+
+@receiver(post_save, sender=User)
+def build_profile_picture_variants(sender, instance, **kwargs):
+    if getattr(instance, '_build_variants', False):
+        instance._build_variants = False
+        images.schedule_variants(instance, 'profile_picture', 'profile_picture_variants')
@@ -1,3 +1,105 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.settings import api_settings
 
-# Create your tests here.
+from users.authentication import StatelessJWTAuthentication
+from users.models import User
+from users.tokens import UserRefreshToken
+
+
+# Over-budget requests fail the tests instead of only being logged.
+_raise_over_budget = override_settings(QUERY_BUDGET_RAISE=True)
+
+
+def setUpModule():
+    _raise_over_budget.enable()
+
+
+def tearDownModule():
+    _raise_over_budget.disable()
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='staff', email='staff@example.com', is_staff=True)
+        self.token = UserRefreshToken.for_user(self.user).access_token
+
+    def authenticate(self):
+        return StatelessJWTAuthentication().get_user(self.token)
+
+    def test_claims_load_without_a_query(self):
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user.username, 'staff')
+        # The id claim is a string in the token; the pk must compare as an int.
+        self.assertIsInstance(self.token[api_settings.USER_ID_CLAIM], str)
+        self.assertEqual(user, self.user)
+
+    def test_staff_flags_come_from_the_row(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=False, is_active=False)
+        user = self.authenticate()
+        with self.assertNumQueries(1):
+            self.assertFalse(user.is_staff)
+            self.assertFalse(user.is_active)
+
+    def test_demoted_staff_lose_admin_views(self):
+        from commerce.benchmarks import api_client
+
+        client = api_client(self.user)
+        self.assertEqual(client.get('/products/analytics/sales/').status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        self.assertEqual(client.get('/products/analytics/sales/').status_code, 403)
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class AuthViewTests(TransactionTestCase):
+    """Register and login, sync and async, resolve users in one query and lean on the unique constraints."""
+    prefixes = ('/auth/', '/auth/async/')
+
+    def register(self, prefix, username, email, password='secret-pass'):
+        return self.client.post(
+            f'{prefix}register/', {'username': username, 'email': email, 'password': password},
+            content_type='application/json',
+        )
+
+    def login(self, prefix, username_or_email, password='secret-pass'):
+        return self.client.post(
+            f'{prefix}login/', {'username_or_email': username_or_email, 'password': password},
+            content_type='application/json',
+        )
+
+    def test_register_then_login_by_username_or_email(self):
+        for i, prefix in enumerate(self.prefixes):
+            response = self.register(prefix, f'shopper{i}', f'Shopper{i}@Example.com')
+            self.assertEqual(response.status_code, 201)
+            self.assertIn('access_token', response.json())
+            for name in (f'shopper{i}', f'shopper{i}@example.COM'):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.login(prefix, name)
+                self.assertEqual(response.status_code, 202, name)
+                lookups = [query for query in queries.captured_queries if 'FROM "users_user"' in query['sql']]
+                self.assertEqual(len(lookups), 1, name)
+
+    def test_duplicates_are_rejected(self):
+        for i, prefix in enumerate(self.prefixes):
+            self.assertEqual(self.register(prefix, f'taken{i}', f'taken{i}@example.com').status_code, 201)
+            self.assertEqual(self.register(prefix, f'taken{i}', f'other{i}@example.com').status_code, 400)
+            self.assertEqual(self.register(prefix, f'other{i}', f'TAKEN{i}@example.com').status_code, 400)
+        self.assertEqual(User.objects.count(), len(self.prefixes))
+
+    def test_wrong_password_and_inactive_users_are_refused(self):
+        user = User.objects.create_user(username='shopper', email='shopper@example.com', password='secret-pass')
+        for prefix in self.prefixes:
+            self.assertEqual(self.login(prefix, 'shopper', 'wrong-pass').status_code, 401)
+            self.assertEqual(self.login(prefix, 'nobody@example.com').status_code, 401)
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        for prefix in self.prefixes:
+            self.assertEqual(self.login(prefix, 'shopper').status_code, 401)
+
+    def test_login_upgrades_the_work_factor(self):
+        User.objects.create_user(username='shopper', email='shopper@example.com', password='secret-pass')
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertEqual(self.login('/auth/', 'shopper').status_code, 202)
+        self.assertTrue(User.objects.get(username='shopper').password.startswith('pbkdf2_sha256$2000$'))
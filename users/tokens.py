@@ -0,0 +1,15 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# User fields copied into every token so requests can be authenticated
+# without loading the user row; see users.authentication. is_staff and
+# is_active are left out on purpose: staff checks read them from the row.
+USER_CLAIMS = ('username', 'is_verified')
+
+
+class UserRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in USER_CLAIMS:
+            token[field] = getattr(user, field)
+        return token
@@ -1,6 +1,7 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
+from users import async_views
 from users.views import UserRegisterAPIView, UserLoginAPIView, GetUserAPIView
 
 urlpatterns = [
@@ -8,4 +9,6 @@ urlpatterns = [
     path('login/', UserLoginAPIView.as_view()),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('get-me/', GetUserAPIView.as_view()),
+    path('async/register/', async_views.register),
+    path('async/login/', async_views.login),
 ]
\ No newline at end of file
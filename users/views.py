@@ -1,13 +1,14 @@
-from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
 from drf_spectacular.utils import extend_schema, OpenApiExample
 
+from users.hashing import check_password, hash_password
 from users.models import User
 from users.serializers import RegisterSerializer, LoginSerializer, UserSerializer
+from users.tokens import UserRefreshToken
 
 
 class UserRegisterAPIView(APIView):
@@ -33,13 +34,15 @@ class UserRegisterAPIView(APIView):
         if not username or not email or not password:
             return Response({'message': 'all 3 columns are required'})
 
-        if User.objects.filter(username=username).exists() or User.objects.filter(email=email).exists():
+        # The unique username / email constraints do the duplicate check in the INSERT itself.
+        user = User.objects.build_user(username, email, hash_password(password))
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
             return Response({'message': 'User with this username or email already exists!'}, status=status.HTTP_400_BAD_REQUEST)
 
-        user = User.objects.create_user(username=username, email=email, password=password)
-        user.save()
-
-        refresh = RefreshToken.for_user(user)
+        refresh = UserRefreshToken.for_user(user)
         access = refresh.access_token
 
         return Response({
@@ -69,21 +72,13 @@ class UserLoginAPIView(APIView):
         if not username_or_email or not password:
             return Response({'message': 'all 2 columns are required'})
 
-        if '@' in username_or_email:
-            try:
-                user = User.objects.get(email=username_or_email)
-                username = user.username
-            except:
-                return Response({"message": "Invalid email or password"}, status=status.HTTP_401_UNAUTHORIZED)
-
-        else:
-            username = username_or_email
-
-        user = authenticate(username=username, password=password)
-        if user is None:
+        user = User.objects.for_login(username_or_email).first()
+        if user is not None and not user.is_active:
+            user = None
+        if not check_password(user, password):
             return Response({'message': 'Invalid username/email or password'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        refresh = RefreshToken.for_user(user)
+        refresh = UserRefreshToken.for_user(user)
         access = refresh.access_token
 
 
@@ -95,6 +90,8 @@ class UserLoginAPIView(APIView):
 
 class GetUserAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    # The token carries only some fields; serializing the rest loads the row.
+    query_budget = 1
     def get(self, request):
         user = request.user
         return Response(UserSerializer(user).data, status=status.HTTP_200_OK)
\ No newline at end of file